@@ -1,10 +1,12 @@
+import contextlib
 import glob
 import logging
 import os
 import shutil
+import threading
 import uuid
 
-from xia2.Driver.DriverFactory import DriverFactory
+from xia2.Handlers.RunContext import bind_run_context
 from xia2.lib.bits import auto_logfiler
 from xia2.Wrappers.XIA.Integrate import Integrate as XIA2Integrate
 
@@ -23,9 +25,10 @@ def process_one_sweep(args):
     sweep_id = args.sweep_id
     failover = args.failover
     driver_type = args.driver_type
-
-    default_driver_type = DriverFactory.get_driver_type()
-    DriverFactory.set_driver_type(driver_type)
+    # optional CoreBudget from which the number of processors for each
+    # stage of the processing is taken, in which case nproc is unused
+    core_budget = getattr(args, "core_budget", None)
+    job_id = (crystal_id, wavelength_id, sweep_id)
 
     curdir = os.path.abspath(os.curdir)
 
@@ -34,21 +37,30 @@ def process_one_sweep(args):
         del command_line_args[idx + 1]
         del command_line_args[idx]
 
-    xia2_integrate = XIA2Integrate()
-
     # import tempfile
     # tmpdir = tempfile.mkdtemp(dir=curdir)
 
     tmpdir = os.path.join(curdir, str(uuid.uuid4()))
     os.makedirs(tmpdir)
-    xia2_integrate.set_working_directory(tmpdir)
-    xia2_integrate.add_command_line_args(args.command_line_args)
-    xia2_integrate.set_phil_file(os.path.join(curdir, "xia2-working.phil"))
-    xia2_integrate.add_command_line_args(["sweep.id=%s" % sweep_id])
-    xia2_integrate.set_nproc(nproc)
-    xia2_integrate.set_njob(1)
-    xia2_integrate.set_mp_mode("serial")
-    auto_logfiler(xia2_integrate)
+
+    def run_stage(stop_after, nproc, continue_from_previous_job=False):
+        # pass the driver type to the wrapper factory rather than through
+        # the global DriverFactory, as several sweeps may be processed at
+        # once from different threads
+        xia2_integrate = XIA2Integrate(driver_type)
+        xia2_integrate.set_stop_after(stop_after)
+        xia2_integrate.set_working_directory(tmpdir)
+        xia2_integrate.add_command_line_args(args.command_line_args)
+        xia2_integrate.set_phil_file(os.path.join(curdir, "xia2-working.phil"))
+        xia2_integrate.add_command_line_args(["sweep.id=%s" % sweep_id])
+        xia2_integrate.set_nproc(nproc)
+        xia2_integrate.set_njob(1)
+        xia2_integrate.set_mp_mode("serial")
+        xia2_integrate.set_continue_from_previous_job(continue_from_previous_job)
+        xia2_integrate.set_output_buffer(None)
+        auto_logfiler(xia2_integrate)
+        xia2_integrate.run()
+        return xia2_integrate.get_all_output()
 
     sweep_tmp_dir = os.path.join(tmpdir, crystal_id, wavelength_id, sweep_id)
     sweep_target_dir = os.path.join(curdir, crystal_id, wavelength_id, sweep_id)
@@ -58,8 +70,17 @@ def process_one_sweep(args):
     xsweep_dict = None
 
     try:
-        xia2_integrate.run()
-        output = get_sweep_output_only(xia2_integrate.get_all_output())
+        if core_budget is None:
+            output = get_sweep_output_only(run_stage("integrate", nproc))
+        else:
+            # index and integrate separately, so that the integration can
+            # make use of any cores freed up by other sweeps in the meantime
+            with core_budget.cores(job_id) as stage_nproc:
+                output = get_sweep_output_only(run_stage("index", stage_nproc))
+            with core_budget.cores(job_id) as stage_nproc:
+                output += get_sweep_output_only(
+                    run_stage("integrate", stage_nproc, continue_from_previous_job=True)
+                )
         success = True
     except Exception as e:
         logger.warning("Processing sweep %s failed: %s", sweep_id, str(e))
@@ -74,11 +95,14 @@ def process_one_sweep(args):
         if os.path.exists(xia2_json):
             json_files.append(xia2_json)
 
-        import fileinput
-
-        for line in fileinput.FileInput(files=json_files, inplace=1):
-            line = line.replace(sweep_tmp_dir, sweep_target_dir)
-            print(line)
+        # rewrite the files directly rather than with fileinput, which
+        # redirects sys.stdout for the whole process while other sweeps are
+        # being processed in other threads
+        for json_file in json_files:
+            with open(json_file) as fh:
+                content = fh.read()
+            with open(json_file, "w") as fh:
+                fh.write(content.replace(sweep_tmp_dir, sweep_target_dir))
 
         if os.path.exists(xia2_json):
             new_json = os.path.join(curdir, "xia2-%s.json" % sweep_id)
@@ -96,7 +120,6 @@ def process_one_sweep(args):
         shutil.rmtree(tmpdir, ignore_errors=True)
         if os.path.exists(tmpdir):
             shutil.rmtree(tmpdir, ignore_errors=True)
-        DriverFactory.set_driver_type(default_driver_type)
         return success, output, xsweep_dict
 
 
@@ -122,3 +145,84 @@ def move_output_folder(sweep_tmp_dir, sweep_target_dir):
         shutil.rmtree(sweep_target_dir)
     # print "Moving %s to %s" %(sweep_tmp_dir, sweep_target_dir)
     shutil.move(sweep_tmp_dir, sweep_target_dir)
+
+
+class CoreBudget:
+    """Share a fixed number of processor cores between sweeps which are
+    processed at the same time. Each sweep which has yet to finish is
+    entitled to a share of the cores in proportion to its weight (e.g.
+    the number of images), up to max_per_job, so as sweeps finish their
+    cores are handed on to the later stages of those still running. Jobs
+    should only be added once they have started, as the shares are worked
+    out between those added and not yet finished."""
+
+    def __init__(self, ncores, max_per_job=None):
+        self._ncores = ncores
+        self._max_per_job = max_per_job or ncores
+        self._free = ncores
+        self._weights = {}
+        self._condition = threading.Condition()
+
+    def add_job(self, job_id, weight):
+        with self._condition:
+            self._weights[job_id] = max(weight, 1)
+
+    def finish_job(self, job_id):
+        with self._condition:
+            self._weights.pop(job_id, None)
+            self._condition.notify_all()
+
+    def get_share(self, job_id):
+        """Return the number of cores job_id is entitled to at the moment."""
+        with self._condition:
+            total = sum(self._weights.values())
+            weight = self._weights.get(job_id, total)
+            share = int(round(self._ncores * weight / total)) if total else 0
+            return max(1, min(self._max_per_job, self._ncores, share))
+
+    @contextlib.contextmanager
+    def cores(self, job_id):
+        """Wait until at least one core is free, then hold up to the share of
+        the cores job_id is entitled to for the duration of the context."""
+        with self._condition:
+            while self._free < 1:
+                self._condition.wait()
+            nproc = min(self._free, self.get_share(job_id))
+            self._free -= nproc
+        logger.debug("Running %s with %d of %d cores", job_id, nproc, self._ncores)
+        try:
+            yield nproc
+        finally:
+            with self._condition:
+                self._free += nproc
+                self._condition.notify_all()
+
+
+def process_sweeps_with_core_budget(jobs, weights, njob, ncores, max_per_job):
+    """Process the sweeps in jobs (as for process_one_sweep) with up to njob
+    running at any one time, sharing ncores cores between them in proportion
+    to weights. The heaviest sweeps are started first. Returns the results
+    in the same order as jobs."""
+
+    core_budget = CoreBudget(ncores, max_per_job=max_per_job)
+
+    def process(args, weight):
+        # only those sweeps being processed share the cores, not those still
+        # waiting for one of the njob slots
+        (job,) = args
+        job.core_budget = core_budget
+        job_id = (job.crystal_id, job.wavelength_id, job.sweep_id)
+        core_budget.add_job(job_id, weight)
+        try:
+            return process_one_sweep(args)
+        finally:
+            core_budget.finish_job(job_id)
+
+    order = sorted(range(len(jobs)), key=lambda i: weights[i], reverse=True)
+
+    import concurrent.futures
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=njob) as pool:
+        process = bind_run_context(process)
+        futures = {i: pool.submit(process, jobs[i], weights[i]) for i in order}
+        return [futures[i].result() for i in range(len(jobs))]
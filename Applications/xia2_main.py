@@ -8,9 +8,6 @@ import os
 import platform
 import sys
 
-import h5py
-
-from dials.util import Sorry
 from xia2.Handlers.Citations import Citations
 from xia2.Handlers.Environment import df
 from xia2.XIA2Version import Version
@@ -71,6 +68,8 @@ def check_hdf5_master_files(master_files):
     files and not just the data files: if the latter then sys.exit() with a
     helpful message"""
 
+    import h5py
+
     bad = []
 
     for filename in master_files:
@@ -102,6 +101,7 @@ def check_hdf5_master_files(master_files):
 
 
 def get_command_line():
+    from dials.util import Sorry
     from xia2.Handlers.CommandLine import CommandLine
 
     CommandLine.print_command_line()
@@ -3,6 +3,70 @@ import os
 import xia2.Driver.DefaultDriver
 
 
+class LoggraphParser:
+    """An output parser collecting the CCP4 loggraph tables from the
+    standard output of a program as it arrives, as a dictionary of tables
+    each with a list of "columns" and a list of "data" records."""
+
+    def __init__(self):
+        self._tables = {}
+        self._broken = []
+
+        # the table being read, the number of "$$" seen so far in it and
+        # the text of it
+        self._current = None
+        self._n_dollar = 0
+        self._text = ""
+
+    def __call__(self, line):
+        if self._current is not None and self._n_dollar >= 4:
+            self._finish()
+
+        if self._current is None:
+            if "$TABLE" not in line:
+                return
+            self._current = line.split(":")[1].replace(">", "").strip()
+            self._tables[self._current] = {"columns": [], "data": []}
+            self._n_dollar = line.count("$$")
+            self._text = ""
+            if self._n_dollar >= 4:
+                return
+
+        self._n_dollar += line.count("$$")
+        self._text += line
+        if self._n_dollar == 4:
+            self._finish()
+
+    def _finish(self):
+        tokens = self._text.split("$$")
+        table = self._tables[self._current]
+        if len(tokens) < 4:
+            self._broken.append(self._current)
+        else:
+            table["columns"] = tokens[1].split()
+            columns = len(table["columns"])
+
+            # code around cases where columns merge together...
+            for record in tokens[3].split("\n"):
+                record = record.split()
+                if len(record) == columns:
+                    table["data"].append(record)
+
+        self._current = None
+        self._text = ""
+
+    def get_tables(self):
+        if self._current is not None:
+            if self._n_dollar >= 4:
+                self._finish()
+            else:
+                # the output ended part way through the table
+                self._broken.append(self._current)
+        if self._broken:
+            raise RuntimeError('loggraph "%s" broken' % self._broken[0])
+        return self._tables
+
+
 def CCP4DecoratorFactory(DriverInstance):
     """Create a CCP4 decorated Driver instance - based on the Driver
     instance which is passed in. This is an implementation of
@@ -34,8 +98,11 @@ def CCP4DecoratorFactory(DriverInstance):
             self._hklin = None
             self._hklout = None
 
-            # somewhere to store the loggraph output
+            # somewhere to store the loggraph output, collected as the
+            # program runs
             self._loggraph = {}
+            self._loggraph_parser = LoggraphParser()
+            self.add_output_parser(self._loggraph_parser)
 
             # put the CCP4 library directory at the start of the
             # LD_LIBRARY_PATH in case it mashes CCP4 programs...
@@ -198,68 +265,10 @@ def CCP4DecoratorFactory(DriverInstance):
             raise RuntimeError("could not find status")
 
         def parse_ccp4_loggraph(self):
-            """Look through the standard output of the program for
-            CCP4 loggraph text. When this is found store it in a
-            local dictionary to allow exploration."""
-
-            # reset the loggraph store
-            self._loggraph = {}
-
-            output = self.get_all_output()
-
-            for i in range(len(output)):
-                line = output[i]
-                if "$TABLE" in line:
-
-                    n_dollar = line.count("$$")
-
-                    current = line.split(":")[1].replace(">", "").strip()
-                    self._loggraph[current] = {}
-                    self._loggraph[current]["columns"] = []
-                    self._loggraph[current]["data"] = []
-
-                    loggraph_info = ""
-
-                    # while not 'inline graphs' in line and not 'FONT' in line:
-                    while n_dollar < 4:
-                        n_dollar += line.count("$$")
-                        loggraph_info += line
-
-                        if n_dollar == 4:
-                            break
-
-                        i += 1
-                        line = output[i]
-
-                    # at this stage I should have the whole 9 yards in
-                    # a single string...
-
-                    tokens = loggraph_info.split("$$")
-                    self._loggraph[current]["columns"] = tokens[1].split()
-
-                    if len(tokens) < 4:
-                        raise RuntimeError('loggraph "%s" broken' % current)
-
-                    data = tokens[3].split("\n")
-
-                    # pop takes the data off the end so...
-                    # data.reverse()
-
-                    columns = len(self._loggraph[current]["columns"])
-
-                    # while len(data) > 0:
-                    # record = []
-                    # for i in range(columns):
-                    # record.append(data.pop())
-                    # self._loggraph[current]['data'].append(record)
-
-                    # code around cases where columns merge together...
-
-                    for j in data:
-                        record = j.split()
-                        if len(record) == columns:
-                            self._loggraph[current]["data"].append(record)
+            """Get the CCP4 loggraph tables found in the standard output of
+            the program, as a dictionary to allow exploration."""
 
+            self._loggraph = self._loggraph_parser.get_tables()
             return self._loggraph
 
     return CCP4Decorator()
@@ -0,0 +1,49 @@
+import pytest
+
+from xia2.Decorators.CCP4Decorator import LoggraphParser
+
+output = """\
+ Some text before the table
+ $TABLE: Analysis against resolution:
+ $GRAPHS: Rmerge v resolution :A:1,2: $$
+ N  1/d^2 Rmerge $$ $$
+  1  0.01  0.030
+  2  0.02  0.041
+  3  0.03
+ $$
+ and after it
+ $TABLE :  Analysis against Batch, Mn(I/sd):
+ $GRAPHS: Rmerge v Batch:N:1,2: $$
+ N Batch Rmerge $$
+ $$
+  1  1  0.02
+  2  2  0.03
+ $$
+"""
+
+
+def test_loggraph_parser():
+    parser = LoggraphParser()
+    for line in output.splitlines(keepends=True):
+        parser(line)
+    tables = parser.get_tables()
+    assert list(tables) == [
+        "Analysis against resolution",
+        "Analysis against Batch, Mn(I/sd)",
+    ]
+    assert tables["Analysis against resolution"] == {
+        "columns": ["N", "1/d^2", "Rmerge"],
+        "data": [["1", "0.01", "0.030"], ["2", "0.02", "0.041"]],
+    }
+    assert tables["Analysis against Batch, Mn(I/sd)"]["data"] == [
+        ["1", "1", "0.02"],
+        ["2", "2", "0.03"],
+    ]
+
+
+def test_loggraph_parser_broken():
+    parser = LoggraphParser()
+    for line in output.splitlines(keepends=True)[:6]:
+        parser(line)
+    with pytest.raises(RuntimeError, match="Analysis against resolution"):
+        parser.get_tables()
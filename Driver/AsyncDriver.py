@@ -0,0 +1,155 @@
+import asyncio
+import time
+
+from xia2.Driver.DefaultDriver import DefaultDriver
+
+# maximum length of a single line of output from the child process - the
+# asyncio default of 64 KiB is too small for some very chatty programs
+_stream_limit = 2 ** 20
+
+
+class AsyncDriver(DefaultDriver):
+    """A Driver implementation which runs the child process directly (i.e.
+    without a shell) through asyncio, streaming the standard output through
+    non-blocking pipes. Used synchronously this behaves like SimpleDriver,
+    but several instances may also be awaited at once from a single event
+    loop through close_wait_async() or run_concurrently()."""
+
+    def __init__(self):
+        super().__init__()
+
+        # like the ScriptDriver the standard input is collected and
+        # passed to the process once it has been started in close()
+        self._async_standard_input = []
+        self._async_status = None
+        self._async_process = None
+        self._async_completed = False
+
+    def reset(self):
+        DefaultDriver.reset(self)
+
+        self._async_standard_input = []
+        self._async_status = None
+        self._async_process = None
+        self._async_completed = False
+
+    def start(self):
+        if self._executable is None:
+            raise RuntimeError("no executable is set.")
+
+        self._async_standard_input = []
+        self._async_status = None
+        self._async_completed = False
+
+    def _input(self, record):
+        if self._async_completed:
+            raise RuntimeError("child process has terminated")
+
+        self._async_standard_input.append(record)
+
+    def _output(self):
+        # all of the output is consumed as it is produced by _communicate()
+        # so by the time anyone asks there is nothing left to read
+
+        return ""
+
+    def _status(self):
+        if self._async_status is not None:
+            return self._async_status
+
+        return 0
+
+    async def _feed_input(self, stdin):
+        try:
+            for record in self._async_standard_input:
+                stdin.write(record.encode())
+                await stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # the child went away without reading all of its input - this
+            # will be reported through the output and the return code
+            pass
+        finally:
+            stdin.close()
+
+    async def _read_output(self, stdout):
+        while True:
+            line = await stdout.readline()
+            if not line:
+                break
+            self._record_output(
+                line.decode("latin-1").replace("\r\n", "\n").replace("\r", "\n")
+            )
+
+    async def _communicate(self):
+        """Run the child process to completion, feeding in the standard
+        input and streaming the standard output to the log file."""
+
+        if self._async_completed:
+            return
+
+        self._runtime_log["process start"] = time.time()
+        self._async_process = await asyncio.create_subprocess_exec(
+            self._executable,
+            *self._command_line,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            cwd=self._working_directory,
+            env=self._get_environment(),
+            limit=_stream_limit,
+        )
+
+        await asyncio.gather(
+            self._feed_input(self._async_process.stdin),
+            self._read_output(self._async_process.stdout),
+        )
+        self._async_status = await self._async_process.wait()
+        self._async_completed = True
+
+    def close(self):
+        """Run the child process to completion on a private event loop.
+        This must not be called from within a running event loop - use
+        close_wait_async() there instead."""
+
+        if not self._async_completed:
+            asyncio.run(self._communicate())
+
+    async def close_wait_async(self):
+        """Awaitable equivalent of close_wait(), allowing many child
+        processes to run at once from a single event loop."""
+
+        await self._communicate()
+        self.close_wait()
+
+    def cleanup(self):
+        self._async_process = None
+
+    def kill(self):
+        if self._async_process is not None and self._async_process.returncode is None:
+            self._async_process.kill()
+
+
+def run_concurrently(drivers, max_concurrent=None):
+    """Close and wait for each of the started AsyncDriver instances in
+    drivers, running up to max_concurrent of the child processes at once
+    (all of them if max_concurrent is not set). Exceptions are raised once
+    all of the processes have completed."""
+
+    async def _run_all():
+        semaphore = asyncio.Semaphore(max_concurrent) if max_concurrent else None
+
+        async def _run_one(driver):
+            if semaphore is None:
+                await driver.close_wait_async()
+                return
+            async with semaphore:
+                await driver.close_wait_async()
+
+        results = await asyncio.gather(
+            *(_run_one(driver) for driver in drivers), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    asyncio.run(_run_all())
@@ -0,0 +1,502 @@
+import contextlib
+import os
+import shlex
+import subprocess
+import threading
+import time
+
+from xia2.Driver.DefaultDriver import DefaultDriver
+from xia2.Driver.DriverHelper import script_writer
+from xia2.Handlers.RunContext import get_run_context
+
+
+class SGEBackend:
+    """Submission of jobs to a Sun / Univa / Son of Grid Engine cluster."""
+
+    name = "sge"
+    submit_command = "qsub"
+    array_task_variable = "SGE_TASK_ID"
+
+    def submit_arguments(self, cpu_threads, array_size, name):
+        arguments = ["-V", "-cwd", "-N", name, "-o", "/dev/null", "-e", "/dev/null"]
+        if cpu_threads > 1:
+            arguments += ["-pe", "smp", "%d" % cpu_threads]
+        if array_size:
+            arguments += ["-t", "1-%d" % array_size]
+        return arguments
+
+    def parse_job_id(self, stdout):
+        # Your job 123 ("name") has been submitted
+        # Your job-array 123.1-4:1 ("name") has been submitted
+        for record in stdout.split("\n"):
+            if record.startswith("Your job"):
+                return record.split()[2].split(".")[0]
+        raise RuntimeError("could not determine job id from: %s" % stdout.strip())
+
+    def job_exists(self, job_id, working_directory):
+        result = subprocess.run(
+            ["qstat", "-j", job_id],
+            cwd=working_directory,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        return "Following jobs do not exist" not in result.stderr
+
+
+class SlurmBackend:
+    """Submission of jobs to a SLURM cluster."""
+
+    name = "slurm"
+    submit_command = "sbatch"
+    array_task_variable = "SLURM_ARRAY_TASK_ID"
+
+    def submit_arguments(self, cpu_threads, array_size, name):
+        arguments = ["--parsable", "--job-name=%s" % name, "--output=/dev/null"]
+        if cpu_threads > 1:
+            arguments += ["--cpus-per-task=%d" % cpu_threads]
+        if array_size:
+            arguments += ["--array=1-%d" % array_size]
+        return arguments
+
+    def parse_job_id(self, stdout):
+        # with --parsable this is "jobid" or "jobid;cluster"
+        for record in stdout.split("\n"):
+            record = record.strip()
+            if record:
+                return record.split(";")[0]
+        raise RuntimeError("could not determine job id from: %s" % stdout.strip())
+
+    def job_exists(self, job_id, working_directory):
+        result = subprocess.run(
+            ["squeue", "--noheader", "--jobs=%s" % job_id],
+            cwd=working_directory,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        return result.returncode == 0 and bool(result.stdout.strip())
+
+
+class PBSBackend:
+    """Submission of jobs to a PBS Pro / OpenPBS cluster."""
+
+    name = "pbs"
+    submit_command = "qsub"
+    array_task_variable = "PBS_ARRAY_INDEX"
+
+    def submit_arguments(self, cpu_threads, array_size, name):
+        arguments = ["-V", "-N", name, "-o", "/dev/null", "-e", "/dev/null"]
+        if cpu_threads > 1:
+            arguments += ["-l", "select=1:ncpus=%d" % cpu_threads]
+        if array_size:
+            arguments += ["-J", "1-%d" % array_size]
+        return arguments
+
+    def parse_job_id(self, stdout):
+        # 123.server or 123[].server for array jobs
+        for record in stdout.split("\n"):
+            record = record.strip()
+            if record:
+                return record
+        raise RuntimeError("could not determine job id from: %s" % stdout.strip())
+
+    def job_exists(self, job_id, working_directory):
+        result = subprocess.run(
+            ["qstat", job_id],
+            cwd=working_directory,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        return result.returncode == 0
+
+
+backends = {
+    backend.name: backend for backend in (SGEBackend(), SlurmBackend(), PBSBackend())
+}
+
+
+def get_submit_command(backend):
+    """Get the submission command for backend from the xia2 parameters,
+    falling back to the standard command for the batch system."""
+
+    from xia2.Handlers.Phil import PhilIndex
+
+    mp_params = PhilIndex.get_python_object().xia2.settings.multiprocessing
+    if backend.name == "slurm":
+        command = mp_params.sbatch_command
+    else:
+        command = mp_params.qsub_command
+    return command or backend.submit_command
+
+
+def _wait_for_sentinels(
+    sentinels, backend, job_id, working_directory, status_interval=60, grace_period=30
+):
+    """Wait for all of the sentinel files to appear, which the jobs write
+    as the very last thing they do. The files are checked with a backoff
+    from 0.1 to 2 seconds: the batch system is only asked about the job
+    every status_interval seconds, to catch jobs which were killed before
+    they could write their sentinel."""
+
+    delay = 0.1
+    last_status_check = time.time()
+    job_gone = None
+
+    while True:
+        missing = [s for s in sentinels if not os.path.exists(s)]
+        if not missing:
+            return
+
+        now = time.time()
+        if job_gone is not None:
+            # allow for the file system to catch up with the job
+            if now - job_gone >= grace_period:
+                raise RuntimeError(
+                    "batch job %s finished without writing %s"
+                    % (job_id, ", ".join(missing))
+                )
+        elif now - last_status_check >= status_interval:
+            last_status_check = now
+            if not backend.job_exists(job_id, working_directory):
+                job_gone = now
+
+        time.sleep(delay)
+        delay = min(2 * delay, 2.0)
+
+
+def _read_status(status_file, timeout=30):
+    """Read the exit status of a job from status_file, allowing for the
+    contents reaching a network file system some time after the file
+    itself has appeared."""
+
+    delay = 0.1
+    deadline = time.time() + timeout
+    while True:
+        with open(status_file) as fh:
+            status = fh.read().strip()
+        if status:
+            try:
+                return int(status)
+            except ValueError:
+                raise RuntimeError("unexpected status %r in %s" % (status, status_file))
+        if time.time() >= deadline:
+            raise RuntimeError("no status written to %s" % status_file)
+        time.sleep(delay)
+        delay = min(2 * delay, 2.0)
+
+
+class BatchDriver(DefaultDriver):
+    """A Driver implementation which runs the program through a batch
+    queueing system (SGE, SLURM or PBS). The completion of the job is
+    detected through the status file written at the end of the job script,
+    rather than by repeatedly asking the batch system about the job."""
+
+    backend_name = "sge"
+
+    def __init__(self):
+        if os.name != "posix":
+            raise RuntimeError('os "%s" not supported' % os.name)
+
+        super().__init__()
+
+        self._backend = backends[self.backend_name]
+        self._submit_command = None
+        self._script_command_line = []
+        self._script_standard_input = []
+        self._script_name = "J%s" % self._name
+        self._script_status = 0
+        self._submitted = False
+
+        # this is opened by the close() method and read by output
+        # from self._script_name.xout
+
+        self._output_file = None
+
+    def set_batch_system(self, backend_name):
+        if backend_name not in backends:
+            raise RuntimeError("unknown batch system: %s" % backend_name)
+        self._backend = backends[backend_name]
+
+    def get_batch_system(self):
+        return self._backend.name
+
+    def set_submit_command(self, submit_command):
+        """Override the command used to submit the job, e.g. to add extra
+        queue or project options."""
+        self._submit_command = submit_command
+
+    def _get_submit_command(self):
+        if self._submit_command:
+            return shlex.split(self._submit_command)
+        return shlex.split(get_submit_command(self._backend))
+
+    def start(self):
+        """This is pretty meaningless in terms of running things through
+        scripts..."""
+
+        self._script_command_line = list(self._command_line)
+        self._script_standard_input = []
+        self._submitted = False
+
+    def check(self):
+        """NULL overloading of the default check method."""
+        return True
+
+    def _input(self, record):
+        self._script_standard_input.append(record)
+
+    def _output(self):
+        return self._output_file.readline()
+
+    def _status(self):
+        return self._script_status
+
+    def _script_path(self, extension=""):
+        return os.path.join(
+            self._working_directory, "jobs", self._script_name + extension
+        )
+
+    def _job_command(self):
+        """The shell command to run this job from within a batch script."""
+        return "cd %s && bash %s 2> %s" % (
+            shlex.quote(self._working_directory),
+            shlex.quote(self._script_path(".sh")),
+            shlex.quote(self._script_path(".xerr")),
+        )
+
+    def _write_script(self):
+        try:
+            os.mkdir(os.path.join(self._working_directory, "jobs"))
+        except OSError:
+            if not os.path.exists(os.path.join(self._working_directory, "jobs")):
+                raise
+
+        # copy in LD_LIBRARY_PATH - SGE squashes this
+        if (
+            "LD_LIBRARY_PATH" in os.environ
+            and "LD_LIBRARY_PATH" not in self._working_environment
+        ):
+            self._working_environment["LD_LIBRARY_PATH"] = os.environ[
+                "LD_LIBRARY_PATH"
+            ].split(os.pathsep)
+
+        if os.path.exists(self._script_path(".xstatus")):
+            os.remove(self._script_path(".xstatus"))
+
+        script_writer(
+            self._working_directory,
+            os.path.join("jobs", self._script_name),
+            self._executable,
+            self._script_command_line,
+            self._working_environment,
+            self._script_standard_input,
+        )
+
+    def _finish(self):
+        """Read back the results of the job once the status file exists."""
+
+        if os.path.exists(self._script_path(".xerr")):
+            with open(self._script_path(".xerr")) as fh:
+                for record in fh:
+                    if "command not found" in record:
+                        missing_program = record.split(":")[-2].strip()
+                        raise RuntimeError('executable "%s" missing' % missing_program)
+
+        self._script_status = _read_status(self._script_path(".xstatus"))
+
+        # set this up for reading the "standard output" of the job.
+        self._output_file = open(self._script_path(".xout"))
+        self._submitted = True
+
+    def close(self):
+        """This is where most of the work will be done - in here is
+        where the script itself gets written and submitted, and the output
+        file channel opened when the job has finished..."""
+
+        if self._submitted:
+            # already run as part of an array job
+            return
+
+        array_jobs = get_run_context().array_jobs
+        if array_jobs is not None:
+            array_jobs.run(self)
+        else:
+            _run_jobs([self])
+
+    def cleanup(self):
+        if self._output_file is not None:
+            self._output_file.close()
+            self._output_file = None
+
+    def kill(self):
+        """This is meaningless..."""
+
+        pass
+
+
+class SGEDriver(BatchDriver):
+    backend_name = "sge"
+
+
+class SlurmDriver(BatchDriver):
+    backend_name = "slurm"
+
+
+class PBSDriver(BatchDriver):
+    backend_name = "pbs"
+
+
+def submit(
+    backend, submit_command, job_commands, working_directory, script, cpu_threads, name
+):
+    """Write a batch script running the job_commands - as an array job if
+    there are more than one - submit it and return the job id."""
+
+    with open(script, "w") as fh:
+        fh.write("#!/bin/bash\n\n")
+        if len(job_commands) == 1:
+            fh.write("%s\n" % job_commands[0])
+        else:
+            fh.write('case "$%s" in\n' % backend.array_task_variable)
+            for j, job_command in enumerate(job_commands):
+                fh.write("%d) %s ;;\n" % (j + 1, job_command))
+            fh.write("esac\n")
+
+    array_size = len(job_commands) if len(job_commands) > 1 else None
+    result = subprocess.run(
+        submit_command
+        + backend.submit_arguments(cpu_threads, array_size, name)
+        + [script],
+        cwd=working_directory,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    if result.returncode:
+        raise RuntimeError(
+            "%s failed: %s" % (" ".join(submit_command), result.stderr.strip())
+        )
+    return backend.parse_job_id(result.stdout)
+
+
+def _run_jobs(drivers, name=None):
+    """Submit the started BatchDriver instances in drivers as one job - an
+    array job if there are more than one - wait for it to finish and read
+    back the results of each. All drivers must use the same batch system;
+    the job requests the largest number of cpu threads of any of them."""
+
+    backend = drivers[0]._backend
+    assert all(driver._backend is backend for driver in drivers)
+
+    for driver in drivers:
+        driver._write_script()
+
+    lead = drivers[0]
+    job_id = submit(
+        backend,
+        lead._get_submit_command(),
+        [driver._job_command() for driver in drivers],
+        lead._working_directory,
+        lead._script_path(".batch.sh"),
+        max(driver._cpu_threads for driver in drivers),
+        name or lead._script_name,
+    )
+    start = time.time()
+    _wait_for_sentinels(
+        [driver._script_path(".xstatus") for driver in drivers],
+        backend,
+        job_id,
+        lead._working_directory,
+    )
+    for driver in drivers:
+        driver._runtime_log["process start"] = start
+        driver._finish()
+
+
+def run_array(drivers, name=None):
+    """Run all of the started BatchDriver instances in drivers as a single
+    array job, then close_wait() each of them."""
+
+    if not drivers:
+        return
+    _run_jobs(drivers, name=name)
+    for driver in drivers:
+        driver.close_wait()
+
+
+class _Batch:
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.drivers = []
+        self.submitted = False
+        self.done = False
+        self.error = None
+
+
+class ArrayJobs:
+    """Gathers the batch jobs of ntasks tasks worked on side by side by up
+    to concurrency threads - one sweep each, say - into array jobs, rather
+    than submitting each on its own. The tasks are run inside task(), with
+    this in the run context (as array_jobs): the jobs waiting are submitted
+    as soon as every task being worked on is waiting for one, or once the
+    first of them has waited window seconds for the others."""
+
+    def __init__(self, ntasks, concurrency=None, window=5):
+        self._tasks_left = ntasks
+        self._concurrency = concurrency or ntasks
+        self._window = window
+        self._batches = {}
+        self._condition = threading.Condition()
+
+    @contextlib.contextmanager
+    def task(self):
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._tasks_left -= 1
+                self._condition.notify_all()
+
+    def _running(self):
+        return min(self._concurrency, self._tasks_left)
+
+    def run(self, driver):
+        """Run the job of driver as part of the next array job, returning
+        once it has finished."""
+
+        key = driver.get_batch_system()
+        with self._condition:
+            batch = self._batches.get(key)
+            if batch is None:
+                batch = self._batches[key] = _Batch(time.time() + self._window)
+            batch.drivers.append(driver)
+            self._condition.notify_all()
+
+            while not batch.submitted:
+                if (
+                    len(batch.drivers) >= self._running()
+                    or time.time() >= batch.deadline
+                ):
+                    # this thread submits the job for all of them
+                    batch.submitted = True
+                    del self._batches[key]
+                    break
+                self._condition.wait(max(0, batch.deadline - time.time()))
+            else:
+                while not batch.done:
+                    self._condition.wait()
+                if batch.error is not None:
+                    raise RuntimeError("array job failed: %s" % batch.error)
+                return
+
+        try:
+            _run_jobs(batch.drivers)
+        except Exception as e:
+            batch.error = e
+            raise
+        finally:
+            with self._condition:
+                batch.done = True
+                self._condition.notify_all()
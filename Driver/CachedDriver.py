@@ -0,0 +1,177 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+from xia2.Driver.AsyncDriver import AsyncDriver
+from xia2.lib.digest import file_digest
+
+logger = logging.getLogger("xia2.Driver.CachedDriver")
+
+_cache_directory = os.environ.get("XIA2_RESULT_CACHE")
+
+
+def set_cache_directory(directory):
+    """Set the directory in which results are cached; None to disable."""
+    global _cache_directory
+    _cache_directory = os.path.abspath(directory) if directory else None
+
+
+def get_cache_directory():
+    return _cache_directory
+
+
+class CachedDriver(AsyncDriver):
+    """A Driver implementation which keeps the results of the programs it
+    runs in a content-addressed cache, keyed on the executable, the command
+    line, the standard input and the contents of the input files. When the
+    same program is run again with the same inputs, the output files and
+    standard output are restored from the cache instead of running it.
+
+    Caching is opt-in: a wrapper must declare every file the program writes
+    with add_output_file(), as only those files are stored and restored, and
+    the results of programs with no declared output files are never cached.
+    Input files are those passed to add_input_file() together with any
+    other command line token (or value of a key=value token) naming an
+    existing file. Only the results of successful runs are kept."""
+
+    def __init__(self):
+        super().__init__()
+
+        # all of the standard output of a run which may be cached, however
+        # much of it the driver itself keeps
+        self._cache_records = None
+
+    def _record_output(self, record):
+        if self._cache_records is not None and record:
+            self._cache_records.append(record)
+        return super()._record_output(record)
+
+    def _normalise(self, text):
+        return text.replace(self._working_directory + os.sep, "")
+
+    def _all_output_files(self):
+        return [os.path.join(self._working_directory, f) for f in self._output_files]
+
+    def _all_input_files(self):
+        output_files = self._all_output_files()
+        input_files = list(self._input_files)
+        for token in self._command_line:
+            for candidate in (token, token.split("=", 1)[-1]):
+                path = os.path.join(self._working_directory, candidate)
+                if (
+                    os.path.isfile(path)
+                    and path not in input_files
+                    and path not in output_files
+                ):
+                    input_files.append(path)
+                    break
+        return input_files
+
+    def _cache_key(self):
+        st = os.stat(self._executable)
+        key = {
+            "executable": [self._executable, st.st_size, st.st_mtime_ns],
+            "command_line": [self._normalise(c) for c in self._command_line],
+            "standard_input": [
+                self._normalise(r) for r in self._async_standard_input
+            ],
+            "environment": self._working_environment,
+            "input_files": sorted(
+                (
+                    self._normalise(os.path.join(self._working_directory, f)),
+                    file_digest(os.path.join(self._working_directory, f)),
+                )
+                for f in self._all_input_files()
+            ),
+        }
+        return hashlib.sha256(
+            json.dumps(key, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(_cache_directory, "entries", key[:2], "%s.json" % key)
+
+    def _blob_path(self, digest):
+        return os.path.join(_cache_directory, "blobs", digest[:2], digest)
+
+    def _restore(self, entry):
+        for name, digest in entry["output_files"].items():
+            destination = os.path.join(self._working_directory, name)
+            if os.path.dirname(destination):
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copyfile(self._blob_path(digest), destination)
+        for record in entry["standard_output"]:
+            self._record_output(record)
+        self._async_status = entry["status"]
+        self._async_completed = True
+
+    def _store(self, key, output_files, standard_output):
+        entry = {
+            "command_line": [os.path.basename(self._executable)]
+            + [self._normalise(c) for c in self._command_line],
+            "output_files": {},
+            "standard_output": standard_output,
+            "status": self._async_status,
+        }
+        for filename in output_files:
+            digest = file_digest(filename)
+            blob = self._blob_path(digest)
+            if not os.path.exists(blob):
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                shutil.copyfile(filename, blob + ".tmp%d" % os.getpid())
+                os.replace(blob + ".tmp%d" % os.getpid(), blob)
+            entry["output_files"][self._normalise(filename)] = digest
+
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp%d" % os.getpid(), "w") as fh:
+            json.dump(entry, fh)
+        os.replace(path + ".tmp%d" % os.getpid(), path)
+
+    async def _communicate(self):
+        if self._async_completed:
+            return
+
+        output_files = self._all_output_files() if _cache_directory else []
+        if not output_files:
+            if _cache_directory:
+                logger.debug(
+                    "Not caching %s: no output files declared",
+                    os.path.basename(self._executable),
+                )
+            await super()._communicate()
+            return
+
+        key = self._cache_key()
+        entry_path = self._entry_path(key)
+        if os.path.exists(entry_path):
+            with open(entry_path) as fh:
+                entry = json.load(fh)
+            if all(
+                os.path.exists(self._blob_path(d))
+                for d in entry["output_files"].values()
+            ):
+                logger.debug(
+                    "Restoring results of %s from cache %s",
+                    " ".join(entry["command_line"]),
+                    key,
+                )
+                self._runtime_log["cache hit"] = time.time()
+                self._restore(entry)
+                return
+
+        self._cache_records = []
+        try:
+            await super()._communicate()
+            records = self._cache_records
+        finally:
+            self._cache_records = None
+
+        # only keep successful runs
+        if self._async_status:
+            return
+
+        self._store(key, [f for f in output_files if os.path.isfile(f)], records)
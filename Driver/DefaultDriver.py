@@ -1,3 +1,6 @@
+import collections
+import copy
+import itertools
 import logging
 import os
 import time
@@ -27,6 +30,13 @@ class DefaultDriver:
     provide functionality for controlling the job, limited only by the
     needs of portability across Windows, Macintosh OS X and Linux."""
 
+    # the number of records of the standard output kept for get_all_output()
+    # and error reporting, unless set_output_buffer() says otherwise
+    output_buffer_lines = 1000
+
+    # the longest time in seconds between flushes of the log file
+    log_flush_interval = 1.0
+
     def __init__(self):
         """Initialise the Driver instance."""
         super().__init__()
@@ -45,17 +55,24 @@ class DefaultDriver:
         # usually small
         self._standard_input_records = []
 
-        # this will be bigger but that is ok...
-        self._standard_output_records = []
+        # the most recent records of the standard output - all of them
+        # only if asked for through set_output_buffer(None)
+        self._output_buffer_size = self.output_buffer_lines
+        self._standard_output_records = self._new_output_buffer()
+
+        # callables passed each record of the standard output as it arrives
+        self._output_parsers = []
 
         # optional - possibly useful if using a batch submission
         # system or wanting to describe better what the job is doing
         self._input_files = []
+        self._output_files = []
 
         self._scratch_directories = []
 
         self._log_file = None
         self._log_file_name = None
+        self._log_file_flushed = 0.0
 
         self._task = None
 
@@ -124,6 +141,44 @@ class DefaultDriver:
             self._working_environment[name] = []
         self._working_environment[name].append(value)
 
+    def _get_environment(self):
+        """Return a copy of os.environ with the working environment for
+        this process applied on top."""
+
+        environment = copy.deepcopy(os.environ)
+
+        for name in self._working_environment:
+            added = self._working_environment[name][0]
+            for value in self._working_environment[name][1:]:
+                added += f"{os.pathsep}{value}"
+
+            if name in environment and name not in self._working_environment_exclusive:
+                environment[name] = "%s%s%s" % (added, os.pathsep, environment[name])
+            else:
+                environment[name] = added
+
+        return environment
+
+    def add_input_file(self, filename):
+        """Declare a file (relative to the working directory, or absolute)
+        which will be read by the program."""
+
+        if filename not in self._input_files:
+            self._input_files.append(filename)
+
+    def get_input_files(self):
+        return self._input_files
+
+    def add_output_file(self, filename):
+        """Declare a file (relative to the working directory, or absolute)
+        which will be written by the program."""
+
+        if filename not in self._output_files:
+            self._output_files.append(filename)
+
+    def get_output_files(self):
+        return self._output_files
+
     def add_scratch_directory(self, directory):
         """Add a scratch directory."""
 
@@ -186,13 +241,14 @@ class DefaultDriver:
         """Reset the output things."""
 
         self._standard_input_records = []
-        self._standard_output_records = []
+        self._standard_output_records = self._new_output_buffer()
 
         self._command_line = []
 
         # optional - possibly useful if using a batch submission
         # system or wanting to describe better what the job is doing
         self._input_files = []
+        self._output_files = []
         self._scratch_directories = []
         if self._log_file is not None:
             self._log_file.flush()
@@ -245,7 +301,8 @@ class DefaultDriver:
         # only look for errors in the last 30 lines of the standard
         # output - if something went wrong, it went wrong in there...
 
-        self.check_for_error_text(self._standard_output_records[-30:])
+        records = self._standard_output_records
+        self.check_for_error_text(list(itertools.islice(reversed(records), 30))[::-1])
         # next check the status
 
         self.check_return_code()
@@ -331,17 +388,54 @@ class DefaultDriver:
 
         record = self._output()
 
-        # copy record somehow
+        return self._record_output(record)
+
+    def add_output_parser(self, parser):
+        """Register parser, a callable which is passed each record of the
+        standard output of the program as it arrives, to process the output
+        without reading through all of it after the program has finished.
+        Parsers should keep what they find for afterwards rather than raise
+        exceptions, as the program is still running."""
+
+        self._output_parsers.append(parser)
+
+    def set_output_buffer(self, lines):
+        """Keep the last lines records of the standard output for
+        get_all_output() and error reporting, or all of the output if lines
+        is None. Only the last output_buffer_lines records are kept by
+        default - wrappers which read through all of the output after the
+        program has finished should use an output parser instead, or else
+        ask for all of the output to be kept."""
+
+        self._output_buffer_size = lines
+        records = self._standard_output_records
+        self._standard_output_records = self._new_output_buffer()
+        self._standard_output_records.extend(records)
+
+    def _new_output_buffer(self):
+        if self._output_buffer_size is None:
+            return []
+        return collections.deque(maxlen=self._output_buffer_size)
+
+    def _record_output(self, record):
+        """Copy a record from the child program to the output parsers, the
+        output records and the log file, and keep track of whether the
+        program has finished."""
+
         self._standard_output_records.append(record)
+        if record:
+            for parser in self._output_parsers:
+                parser(record)
 
         if self._log_file is not None:
             self._log_file.write(record)
 
-            # FIXME 07/NOV/06 I have noticed that sometimes
-            # information is missed from the log files - perhaps
-            # flushing here will help??
-
-            self._log_file.flush()
+            # flush now and then rather than for every record, so that the
+            # log file can still be followed while the program runs
+            now = time.time()
+            if not record or now - self._log_file_flushed >= self.log_flush_interval:
+                self._log_file.flush()
+                self._log_file_flushed = now
 
         # presume if there is no output that the program has finished
         if not record:
@@ -381,9 +475,10 @@ class DefaultDriver:
         return ""
 
     def get_all_output(self):
-        """Return all of the output of the job."""
+        """Return the output of the job kept according to
+        set_output_buffer() - by default just the most recent records."""
 
-        return self._standard_output_records
+        return list(self._standard_output_records)
 
     def close(self):
         """Close the standard input channel."""
@@ -1,9 +1,20 @@
+import importlib
 import os
 
-from xia2.Driver.InteractiveDriver import InteractiveDriver
-from xia2.Driver.QSubDriver import QSubDriver
-from xia2.Driver.ScriptDriver import ScriptDriver
-from xia2.Driver.SimpleDriver import SimpleDriver
+from xia2.Handlers.RunContext import get_run_context
+
+# the module and class of each kind of driver, imported when first used (the
+# asyncio and batch drivers pull in modules most runs do not need)
+_driver_classes = {
+    "simple": ("xia2.Driver.SimpleDriver", "SimpleDriver"),
+    "script": ("xia2.Driver.ScriptDriver", "ScriptDriver"),
+    "interactive": ("xia2.Driver.InteractiveDriver", "InteractiveDriver"),
+    "qsub": ("xia2.Driver.QSubDriver", "QSubDriver"),
+    "asyncio": ("xia2.Driver.AsyncDriver", "AsyncDriver"),
+    "slurm": ("xia2.Driver.BatchDriver", "SlurmDriver"),
+    "pbs": ("xia2.Driver.BatchDriver", "PBSDriver"),
+    "cached": ("xia2.Driver.CachedDriver", "CachedDriver"),
+}
 
 
 class _DriverFactory:
@@ -15,6 +26,10 @@ class _DriverFactory:
             "script",
             "interactive",
             "qsub",
+            "asyncio",
+            "slurm",
+            "pbs",
+            "cached",
         ]
 
         # should probably write a message or something explaining
@@ -24,29 +39,31 @@ class _DriverFactory:
             self.set_driver_type(os.environ["XIA2CORE_DRIVERTYPE"])
 
     def set_driver_type(self, driver_type):
-        """Set the kind of driver this factory should produce."""
+        """Set the kind of driver this factory should produce by default,
+        for every thread: to change it for just some of the work, use
+        xia2.Handlers.RunContext.run_context(driver_type=...) instead."""
         if driver_type not in self._implemented_types:
             raise RuntimeError("unimplemented driver class: %s" % driver_type)
 
         self._driver_type = driver_type
 
     def get_driver_type(self):
-        return self._driver_type
+        """The kind of driver to produce in the current run context."""
+        driver_type = get_run_context().driver_type
+        if driver_type is None:
+            driver_type = self._driver_type
+        return driver_type
 
     def Driver(self, driver_type=None):
         """Create a new Driver instance, optionally providing the
         type of Driver we want."""
 
         if not driver_type:
-            driver_type = self._driver_type
+            driver_type = self.get_driver_type()
 
-        driver_class = {
-            "simple": SimpleDriver,
-            "script": ScriptDriver,
-            "interactive": InteractiveDriver,
-            "qsub": QSubDriver,
-        }.get(driver_type)
-        if driver_class:
+        if driver_type in _driver_classes:
+            module_name, class_name = _driver_classes[driver_type]
+            driver_class = getattr(importlib.import_module(module_name), class_name)
             return driver_class()
 
         raise RuntimeError('Driver class "%s" unknown' % driver_type)
@@ -104,8 +104,12 @@ def script_writer(
 
             script.write("eof\n")
 
-            # record the status from this script
-            script.write('echo "$?" > %s.xstatus\n' % script_name)
+            # record the status from this script - moved into place once
+            # written, so that the status file is never seen empty
+            script.write('echo "$?" > %s.xstatus.tmp\n' % script_name)
+            script.write(
+                "mv -f %s.xstatus.tmp %s.xstatus\n" % (script_name, script_name)
+            )
 
         os.chmod(
             os.path.join(working_directory, "%s.sh" % script_name),
@@ -1,4 +1,3 @@
-import copy
 import os
 import subprocess
 import time
@@ -33,17 +32,7 @@ class SimpleDriver(DefaultDriver):
             for c in self._command_line:
                 command_line += " '%s'" % c
 
-        environment = copy.deepcopy(os.environ)
-
-        for name in self._working_environment:
-            added = self._working_environment[name][0]
-            for value in self._working_environment[name][1:]:
-                added += f"{os.pathsep}{value}"
-
-            if name in environment and name not in self._working_environment_exclusive:
-                environment[name] = "%s%s%s" % (added, os.pathsep, environment[name])
-            else:
-                environment[name] = added
+        environment = self._get_environment()
 
         self._runtime_log["process start"] = time.time()
         self._popen = subprocess.Popen(
@@ -0,0 +1,114 @@
+import errno
+import logging
+import os
+import shutil
+
+import xia2.Driver.timing
+from xia2.lib.digest import file_digest
+
+logger = logging.getLogger("xia2.Driver.Staging")
+
+# from linux/fs.h - share the data blocks of one file with another, on file
+# systems which support it (btrfs, xfs, ...)
+_FICLONE = 0x40049409
+
+# set to False once a reflink has failed with an error meaning that the
+# file system (or platform) does not support them, to save trying again
+_reflink_supported = True
+
+
+def _reflink(src, dst):
+    global _reflink_supported
+    if not _reflink_supported:
+        return False
+    try:
+        import fcntl
+    except ImportError:
+        _reflink_supported = False
+        return False
+
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        try:
+            fcntl.ioctl(fout.fileno(), _FICLONE, fin.fileno())
+        except OSError as e:
+            if e.errno in (errno.ENOTTY, errno.EOPNOTSUPP, errno.ENOSYS, errno.EINVAL):
+                _reflink_supported = False
+            return False
+    return True
+
+
+def _link(src, dst):
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        pass
+    try:
+        os.symlink(os.path.abspath(src), dst)
+        return "symlink"
+    except OSError:
+        return None
+
+
+def _unchanged(src, dst):
+    """Whether dst already has the same content as src: the same file, or
+    one of the same size and modification time (as left by stage_file), or
+    failing that of the same size with the same digest."""
+    try:
+        if os.path.samefile(src, dst):
+            return True
+        src_stat = os.stat(src)
+        dst_stat = os.stat(dst)
+    except OSError:
+        return False
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+    if src_stat.st_mtime_ns == dst_stat.st_mtime_ns:
+        return True
+    return file_digest(src) == file_digest(dst)
+
+
+def stage_file(src, dst, link=True):
+    """Make the content of src available as dst as cheaply as possible:
+    nothing is done if dst already has the same content, otherwise dst is
+    made a reflink (copy-on-write clone) of src, or if that is not possible
+    a hard or symbolic link to src, or failing all that a copy.
+
+    Links share the file with src, so must only be used (link=True) when
+    neither file will be written to again in place: programs which may
+    rewrite dst, and duplicates of files which are themselves rewritten
+    later, should use link=False to get a reflink or a copy. The new file
+    replaces dst atomically, so an existing dst which is a link to some
+    other file is never written through.
+
+    Returns the method used: "unchanged", "reflink", "hardlink", "symlink"
+    or "copy"."""
+
+    if _unchanged(src, dst):
+        method = "unchanged"
+    else:
+        tmp = "%s.xia2-stage-%d" % (dst, os.getpid())
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        method = None
+        if _reflink(src, tmp):
+            method = "reflink"
+        else:
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+            if link:
+                method = _link(src, tmp)
+            if method is None:
+                shutil.copyfile(src, tmp)
+                method = "copy"
+        if method in ("reflink", "copy"):
+            # so that staging src again finds dst unchanged without reading
+            # either file
+            st = os.stat(src)
+            os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(tmp, dst)
+
+    nbytes = os.path.getsize(src)
+    logger.debug("Staged %s as %s (%s)", src, dst, method)
+    xia2.Driver.timing.record_staging(method, nbytes)
+    return method
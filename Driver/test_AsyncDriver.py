@@ -0,0 +1,73 @@
+import sys
+import time
+
+import pytest
+
+from xia2.Driver.AsyncDriver import AsyncDriver, run_concurrently
+
+
+def _driver(tmpdir, script):
+    d = AsyncDriver()
+    d.set_executable(sys.executable)
+    d.set_working_directory(tmpdir.strpath)
+    d.add_command_line(["-c", script])
+    return d
+
+
+def test_asyncdriver_runs_process_with_input(tmpdir):
+    d = _driver(tmpdir, "import sys; print(sys.stdin.read().upper(), end='')")
+    d.start()
+    d.input("hello")
+    d.input("world")
+    d.close_wait()
+    assert d.get_all_output()[:2] == ["HELLO\n", "WORLD\n"]
+    d.check_for_errors()
+
+
+def test_asyncdriver_does_not_use_shell(tmpdir):
+    d = _driver(tmpdir, "import sys; print(sys.argv[1])")
+    d.add_command_line("$HOME 'quoted' ;")
+    d.start()
+    d.close_wait()
+    assert d.get_all_output()[0] == "$HOME 'quoted' ;\n"
+
+
+def test_asyncdriver_return_code(tmpdir):
+    d = _driver(tmpdir, "import sys; sys.exit(3)")
+    d.start()
+    d.close_wait()
+    assert d.status() == 3
+    with pytest.raises(RuntimeError):
+        d.check_for_errors()
+
+
+def test_asyncdriver_writes_log_file(tmpdir):
+    d = _driver(tmpdir, "print('logged')")
+    d.write_log_file(tmpdir.join("async.log").strpath)
+    d.start()
+    d.close_wait()
+    assert tmpdir.join("async.log").read().startswith("logged\n")
+
+
+def test_run_concurrently_overlaps_processes(tmpdir):
+    drivers = []
+    for j in range(4):
+        d = _driver(tmpdir, "import time; time.sleep(1); print(%d)" % j)
+        d.start()
+        drivers.append(d)
+    t0 = time.time()
+    run_concurrently(drivers)
+    assert time.time() - t0 < 3
+    for j, d in enumerate(drivers):
+        assert d.get_all_output()[0] == "%d\n" % j
+
+
+def test_run_concurrently_reports_errors(tmpdir):
+    good = _driver(tmpdir, "print('ok')")
+    bad = _driver(tmpdir, "print('ok')")
+    bad.set_working_directory(tmpdir.join("does-not-exist").strpath)
+    good.start()
+    bad.start()
+    with pytest.raises(OSError):
+        run_concurrently([bad, good], max_concurrent=1)
+    assert good.get_all_output()[0] == "ok\n"
@@ -0,0 +1,170 @@
+import concurrent.futures
+import os
+import stat
+import sys
+
+import pytest
+
+from xia2.Driver import BatchDriver
+from xia2.Handlers.RunContext import bind_run_context, run_context
+
+fake_sbatch = """#!/bin/bash
+# stand-in for sbatch: run the job script (or each array task) in the background
+script="${@: -1}"
+ntasks=""
+for arg in "$@"; do
+    case "$arg" in
+        --array=1-*) ntasks="${arg#--array=1-}" ;;
+    esac
+done
+echo "$@" >> "%(log)s"
+if [ -n "$ntasks" ]; then
+    for i in $(seq 1 "$ntasks"); do
+        SLURM_ARRAY_TASK_ID=$i bash "$script" > /dev/null 2>&1 &
+    done
+else
+    bash "$script" > /dev/null 2>&1 &
+fi
+echo "4242;cluster"
+"""
+
+fake_squeue = """#!/bin/bash
+# stand-in for squeue: no jobs are ever queued
+exit 0
+"""
+
+
+@pytest.fixture
+def fake_slurm(tmpdir, monkeypatch):
+    bin_dir = tmpdir.mkdir("bin")
+    log = tmpdir.join("sbatch.log")
+    for name, content in (
+        ("sbatch", fake_sbatch % {"log": log.strpath}),
+        ("squeue", fake_squeue),
+    ):
+        script = bin_dir.join(name)
+        script.write(content)
+        os.chmod(script.strpath, stat.S_IRWXU)
+    monkeypatch.setenv("PATH", bin_dir.strpath + os.pathsep + os.environ["PATH"])
+    return log
+
+
+def _driver(tmpdir, script):
+    d = BatchDriver.SlurmDriver()
+    d.set_submit_command("sbatch")
+    d.set_executable(sys.executable)
+    d.set_working_directory(tmpdir.strpath)
+    d.add_command_line(["-c", script])
+    return d
+
+
+def test_slurm_driver_runs_job(fake_slurm, tmpdir):
+    d = _driver(tmpdir, 'import sys; print(sys.stdin.read().upper(), end="")')
+    d.set_cpu_threads(4)
+    d.start()
+    d.input("hello")
+    d.close_wait()
+    assert d.get_all_output()[0] == "HELLO\n"
+    d.check_for_errors()
+    submitted = fake_slurm.read()
+    assert "--cpus-per-task=4" in submitted
+    assert "--array" not in submitted
+
+
+def test_slurm_driver_return_code(fake_slurm, tmpdir):
+    d = _driver(tmpdir, "import sys; sys.exit(2)")
+    d.start()
+    d.close_wait()
+    assert d.status() == 2
+    with pytest.raises(RuntimeError):
+        d.check_for_errors()
+
+
+def test_slurm_array_job(fake_slurm, tmpdir):
+    drivers = []
+    for j in range(3):
+        d = _driver(tmpdir, "print(%d)" % j)
+        d.start()
+        drivers.append(d)
+    BatchDriver.run_array(drivers)
+    for j, d in enumerate(drivers):
+        assert d.get_all_output()[0] == "%d\n" % j
+    submitted = fake_slurm.read().splitlines()
+    assert len(submitted) == 1
+    assert "--array=1-3" in submitted[0]
+
+
+def test_wait_for_sentinels_notices_lost_job(fake_slurm, tmpdir):
+    with pytest.raises(RuntimeError, match="finished without writing"):
+        BatchDriver._wait_for_sentinels(
+            [tmpdir.join("never").strpath],
+            BatchDriver.backends["slurm"],
+            "4242",
+            tmpdir.strpath,
+            status_interval=0,
+            grace_period=0,
+        )
+
+
+@pytest.mark.parametrize(
+    "backend,stdout,job_id",
+    [
+        ("sge", 'Your job 123 ("J1") has been submitted\n', "123"),
+        ("sge", 'Your job-array 124.1-4:1 ("J1") has been submitted\n', "124"),
+        ("slurm", "125\n", "125"),
+        ("pbs", "126.server\n", "126.server"),
+    ],
+)
+def test_parse_job_id(backend, stdout, job_id):
+    assert BatchDriver.backends[backend].parse_job_id(stdout) == job_id
+
+
+def test_read_status(tmpdir):
+    status_file = tmpdir.join("J1.xstatus")
+    status_file.write("3\n")
+    assert BatchDriver._read_status(status_file.strpath) == 3
+
+    # an empty status file is never taken as success
+    status_file.write("")
+    with pytest.raises(RuntimeError, match="no status"):
+        BatchDriver._read_status(status_file.strpath, timeout=0)
+    status_file.write("garbage")
+    with pytest.raises(RuntimeError, match="unexpected status"):
+        BatchDriver._read_status(status_file.strpath, timeout=0)
+
+
+def test_array_jobs_gathers_jobs_of_threads(fake_slurm, tmpdir):
+    # three threads each running two programs one after the other: the
+    # programs running side by side go in the same array job
+    array_jobs = BatchDriver.ArrayJobs(3, window=30)
+
+    def work(j):
+        with array_jobs.task():
+            outputs = []
+            for step in range(2):
+                d = _driver(tmpdir, "print(%d)" % (10 * step + j))
+                d.start()
+                d.close_wait()
+                outputs.append(d.get_all_output()[0])
+            return outputs
+
+    with run_context(array_jobs=array_jobs):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(bind_run_context(work), j) for j in range(3)]
+            results = [f.result() for f in futures]
+    assert results == [["%d\n" % j, "%d\n" % (10 + j)] for j in range(3)]
+    submitted = fake_slurm.read().splitlines()
+    assert len(submitted) == 2
+    assert all("--array=1-3" in s for s in submitted)
+
+
+def test_array_jobs_window(fake_slurm, tmpdir):
+    # a task busy with something else does not hold up the others for
+    # longer than the window
+    array_jobs = BatchDriver.ArrayJobs(2, window=0.1)
+    with array_jobs.task(), run_context(array_jobs=array_jobs):
+        d = _driver(tmpdir, "print(1)")
+        d.start()
+        d.close_wait()
+    assert d.get_all_output()[0] == "1\n"
+    assert "--array" not in fake_slurm.read()
@@ -0,0 +1,154 @@
+import sys
+
+import pytest
+
+from xia2.Driver import CachedDriver
+
+script = """
+import os, sys
+with open(sys.argv[1]) as fh:
+    data = fh.read()
+with open(os.environ["COUNTER"], "a") as fh:
+    fh.write("ran\\n")
+with open(sys.argv[2].split("=", 1)[1], "w") as fh:
+    fh.write(data.upper() + sys.stdin.read())
+print("processed", sys.argv[1])
+"""
+
+
+@pytest.fixture(autouse=True)
+def counter(tmpdir, monkeypatch):
+    monkeypatch.setenv("COUNTER", tmpdir.join("counter").strpath)
+    return tmpdir.join("counter")
+
+
+@pytest.fixture
+def cache(tmpdir):
+    CachedDriver.set_cache_directory(tmpdir.join("cache").strpath)
+    yield tmpdir.join("cache")
+    CachedDriver.set_cache_directory(None)
+
+
+def _run(working_directory, record="stdin\n", output="output.txt"):
+    d = CachedDriver.CachedDriver()
+    d.set_executable(sys.executable)
+    d.set_working_directory(working_directory.strpath)
+    d.add_command_line(["-c", script, "input.txt", "output.file=%s" % output])
+    d.add_output_file(output)
+    d.start()
+    d.input(record, newline=False)
+    d.close_wait()
+    d.check_for_errors()
+    return d
+
+
+def test_cached_driver_replays_results(cache, counter, tmpdir):
+    work = tmpdir.mkdir("work")
+    work.join("input.txt").write("data\n")
+
+    d = _run(work)
+    assert work.join("output.txt").read() == "DATA\nstdin\n"
+    assert counter.read() == "ran\n"
+
+    # a second run in a fresh directory with the same input is replayed
+    other = tmpdir.mkdir("other")
+    other.join("input.txt").write("data\n")
+    d2 = _run(other)
+    assert counter.read() == "ran\n"
+    assert other.join("output.txt").read() == "DATA\nstdin\n"
+    assert d2.get_all_output()[0] == d.get_all_output()[0]
+
+
+def test_cached_driver_reruns_on_changed_input(cache, counter, tmpdir):
+    work = tmpdir.mkdir("work")
+    work.join("input.txt").write("data\n")
+    _run(work)
+
+    work.join("input.txt").write("other data\n")
+    _run(work)
+    assert counter.read() == "ran\nran\n"
+    assert work.join("output.txt").read() == "OTHER DATA\nstdin\n"
+
+    _run(work, record="different\n")
+    assert counter.read() == "ran\nran\nran\n"
+
+
+def test_cached_driver_without_cache_directory(counter, tmpdir):
+    work = tmpdir.mkdir("work")
+    work.join("input.txt").write("data\n")
+    _run(work)
+    _run(work)
+    assert counter.read() == "ran\nran\n"
+
+
+def test_cached_driver_keeps_only_output_files(cache, counter, tmpdir):
+    # files written alongside by something else are neither stored nor
+    # restored, while outputs in subdirectories are
+    work = tmpdir.mkdir("work")
+    work.join("input.txt").write("data\n")
+    work.mkdir("sub")
+    work.join("other.txt").write("old")
+    _run(work, output="sub/output.txt")
+    work.join("other.txt").write("new")
+
+    work.join("sub", "output.txt").remove()
+    _run(work, output="sub/output.txt")
+    assert counter.read() == "ran\n"
+    assert work.join("sub", "output.txt").read() == "DATA\nstdin\n"
+    assert work.join("other.txt").read() == "new"
+
+
+def test_cached_driver_needs_output_files(cache, counter, tmpdir):
+    # an output named on the command line is not enough, it must be declared
+    work = tmpdir.mkdir("work")
+    work.join("input.txt").write("data\n")
+    for j in range(2):
+        d = CachedDriver.CachedDriver()
+        d.set_executable(sys.executable)
+        d.set_working_directory(work.strpath)
+        d.add_command_line(["-c", script, "input.txt", "hklout=output.txt"])
+        d.start()
+        d.close_wait()
+        d.check_for_errors()
+    assert counter.read() == "ran\nran\n"
+
+
+pointless_script = """
+import os, sys
+with open(os.environ["COUNTER"], "a") as fh:
+    fh.write("ran\\n")
+arguments = dict(zip(sys.argv[1::2], sys.argv[2::2]))
+with open(arguments["hklin"]) as fh:
+    data = fh.read()
+with open(arguments["hklout"], "w") as fh:
+    fh.write(data.upper())
+with open(arguments["xmlout"], "w") as fh:
+    fh.write("<POINTLESS>%s</POINTLESS>" % sys.stdin.read().strip())
+"""
+
+
+def test_cached_driver_restores_all_declared_outputs(cache, counter, tmpdir):
+    # as Pointless, with the xml output named by keyword alongside hklout
+    def run(working_directory):
+        d = CachedDriver.CachedDriver()
+        d.set_executable(sys.executable)
+        d.set_working_directory(working_directory.strpath)
+        d.add_command_line(["-c", pointless_script])
+        d.add_command_line(["xmlout", "1_pointless.xml"])
+        d.add_command_line(["hklin", "input.mtz", "hklout", "pointless.mtz"])
+        d.add_output_file("1_pointless.xml")
+        d.add_output_file("pointless.mtz")
+        d.start()
+        d.input("lauegroup hklin")
+        d.close_wait()
+        d.check_for_errors()
+
+    for name in ("work", "other"):
+        work = tmpdir.mkdir(name)
+        work.join("input.mtz").write("reflections")
+        run(work)
+        assert work.join("pointless.mtz").read() == "REFLECTIONS"
+        assert work.join("1_pointless.xml").read() == (
+            "<POINTLESS>lauegroup hklin</POINTLESS>"
+        )
+    assert counter.read() == "ran\n"
@@ -1,3 +1,5 @@
+import sys
+
 import pytest
 import xia2.Driver.DefaultDriver
 
@@ -6,3 +8,41 @@ def test_defaultdriver_fails_on_start():
     d = xia2.Driver.DefaultDriver.DefaultDriver()
     with pytest.raises(NotImplementedError):
         d.start()
+
+
+def _run(tmpdir, n_lines, output_buffer=False):
+    from xia2.Driver.AsyncDriver import AsyncDriver
+
+    d = AsyncDriver()
+    d.set_executable(sys.executable)
+    d.set_working_directory(tmpdir.strpath)
+    d.add_command_line(["-c", "for j in range(%d): print(j)" % n_lines])
+    if output_buffer is not False:
+        d.set_output_buffer(output_buffer)
+    d.write_log_file(tmpdir.join("run.log").strpath)
+    records = []
+    d.add_output_parser(records.append)
+    d.start()
+    d.close_wait()
+    return d, records
+
+
+def test_output_parsers_and_buffer(tmpdir):
+    d, records = _run(tmpdir, 1500)
+
+    # the parsers see all of the output as it arrives, and the log file has
+    # all of it, but only the most recent output is kept
+    assert records == ["%d\n" % j for j in range(1500)]
+    assert tmpdir.join("run.log").read().startswith("".join(records))
+    output = d.get_all_output()
+    assert len(output) == d.output_buffer_lines
+    assert output[-2:] == ["1499\n", ""]
+    d.check_for_errors()
+
+
+def test_keep_all_output(tmpdir):
+    d, records = _run(tmpdir, 1500, output_buffer=None)
+    assert d.get_all_output()[:-1] == records
+
+    d, records = _run(tmpdir, 100, output_buffer=10)
+    assert d.get_all_output()[:-1] == records[-9:]
@@ -10,3 +10,9 @@ def test_instantiate_driver():
 def test_instantiate_nonexistent_driver_fails():
     with pytest.raises(RuntimeError):
         DF.DriverFactory.Driver("nosuchtype")
+
+
+def test_instantiate_asyncio_driver():
+    from xia2.Driver.AsyncDriver import AsyncDriver
+
+    assert isinstance(DF.DriverFactory.Driver("asyncio"), AsyncDriver)
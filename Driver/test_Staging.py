@@ -0,0 +1,78 @@
+import os
+
+import xia2.Driver.Staging
+import xia2.Driver.timing
+from xia2.Driver.Staging import stage_file
+
+
+def test_stage_file_links_then_skips_unchanged(tmpdir):
+    xia2.Driver.timing.reset()
+    src = tmpdir.join("GAIN.cbf")
+    src.write_binary(b"x" * 2000000)
+    tmpdir.mkdir("integrate")
+    dst = tmpdir.join("integrate", "GAIN.cbf")
+
+    method = stage_file(src.strpath, dst.strpath)
+    assert method in ("reflink", "hardlink", "symlink")
+    assert dst.read_binary() == src.read_binary()
+    assert stage_file(src.strpath, dst.strpath) == "unchanged"
+
+    # a file with the same content which is not linked is not copied again
+    other = tmpdir.join("integrate", "BKGPIX.cbf")
+    other.write_binary(b"y" * 500000)
+    copy = tmpdir.join("BKGPIX.cbf")
+    copy.write_binary(b"y" * 500000)
+    assert stage_file(copy.strpath, other.strpath) == "unchanged"
+
+    report = xia2.Driver.timing.report()
+    assert " unchanged: 2 files, 2.5 MB" in report
+    assert report[-1] == "4.5 MB not copied"
+    xia2.Driver.timing.reset()
+    assert xia2.Driver.timing.report() == []
+
+
+def test_stage_file_without_links(tmpdir):
+    src = tmpdir.join("XDS.INP")
+    src.write("JOB=INTEGRATE\n")
+    dst = tmpdir.join("1_INTEGRATE.INP")
+    assert stage_file(src.strpath, dst.strpath, link=False) in ("reflink", "copy")
+    assert not os.path.samefile(src.strpath, dst.strpath)
+
+    # rewriting the original in place does not change the staged file
+    with open(src.strpath, "w") as fh:
+        fh.write("JOB=CORRECT\n")
+    assert dst.read() == "JOB=INTEGRATE\n"
+
+
+def test_stage_file_does_not_write_through_existing_links(tmpdir):
+    old = tmpdir.join("old", "XPARM.XDS")
+    old.write("old", ensure=True)
+    new = tmpdir.join("new", "XPARM.XDS")
+    new.write("new", ensure=True)
+    dst = tmpdir.join("XPARM.XDS")
+    os.symlink(old.strpath, dst.strpath)
+
+    stage_file(new.strpath, dst.strpath)
+    assert dst.read() == "new"
+    assert old.read() == "old"
+
+
+def test_stage_file_compares_size_and_time_first(tmpdir, monkeypatch):
+    src = tmpdir.join("XDS_ASCII.HKL")
+    src.write("reflections")
+    dst = tmpdir.join("1_XDS_ASCII.HKL")
+    assert stage_file(src.strpath, dst.strpath, link=False) in ("reflink", "copy")
+
+    # the copy has the time of the original, so is not read to compare it
+    def file_digest(filename):
+        raise AssertionError("%s read" % filename)
+
+    monkeypatch.setattr(xia2.Driver.Staging, "file_digest", file_digest)
+    assert stage_file(src.strpath, dst.strpath, link=False) == "unchanged"
+    monkeypatch.undo()
+
+    # while a file of the same size written at another time is compared
+    dst.write("REFLECTIONS")
+    os.utime(dst.strpath, ns=(0, 0))
+    assert stage_file(src.strpath, dst.strpath, link=False) in ("reflink", "copy")
+    assert dst.read() == "reflections"
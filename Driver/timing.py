@@ -3,6 +3,9 @@ import time
 
 _timing_db = []
 
+# number of files and bytes staged by each method, see xia2.Driver.Staging
+_staging_db = {}
+
 
 def record(timing_information):
     """
@@ -16,6 +19,17 @@ def record(timing_information):
     _timing_db.append(timing_information)
 
 
+def record_staging(method, nbytes):
+    """
+    Record that a file of nbytes was staged into a working directory.
+
+    :param method: how the file was staged - "copy" for a full copy,
+                   otherwise e.g. "hardlink" or "unchanged"
+    """
+    files, total = _staging_db.get(method, (0, 0))
+    _staging_db[method] = (files + 1, total + nbytes)
+
+
 @contextlib.contextmanager
 def record_step(name):
     """
@@ -43,15 +57,35 @@ def report():
 
     :return: A list of strings
     """
-    return visualise_db(_timing_db)
+    return visualise_db(_timing_db) + staging_report()
+
+
+def staging_report():
+    """
+    Summarise the files staged into working directories and the number of
+    bytes which did not need to be copied
+
+    :return: A list of strings
+    """
+    if not _staging_db:
+        return []
+    output = ["", "Staged files:"]
+    saved = 0
+    for method, (files, nbytes) in sorted(_staging_db.items()):
+        output.append("%10s: %d files, %.1f MB" % (method, files, nbytes / 1e6))
+        if method != "copy":
+            saved += nbytes
+    output.append("%.1f MB not copied" % (saved / 1e6))
+    return output
 
 
 def reset():
     """
     Remove all records from the global database
     """
-    global _timing_db
+    global _timing_db, _staging_db
     _timing_db = []
+    _staging_db = {}
 
 
 def visualise_db(timing_db):
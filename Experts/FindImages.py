@@ -6,14 +6,35 @@
 # the file names and the information in image headers.
 
 
+import concurrent.futures
 import logging
 import math
 import os
 import re
 import string
+import time
 
 logger = logging.getLogger("xia2.Experts.FindImages")
 
+# the number of files checked for readability at once: on network file
+# systems each check is a round trip to the server, so doing many at once
+# makes a big difference
+_max_access_workers = 32
+
+# listings of the directories searched for images, keyed on the absolute
+# path of the directory, each reused for as long as the modification time
+# of the directory is unchanged
+_directory_listings = {}
+
+# a listing taken within this many seconds of the last change to the
+# directory is not reused, as a file created since may not have moved the
+# modification time on by a tick of the file system clock
+_mtime_margin = 2.0
+
+# templates and frame ranges for which all of the image files have already
+# been found to be present and readable in this run
+_readable_images = set()
+
 # N.B. these are reversed patterns...
 
 patterns = [
@@ -27,6 +48,33 @@ joiners = [".", "_", ""]
 compiled_patterns = [re.compile(pattern) for pattern in patterns]
 
 
+class _DirectoryListing:
+    """The names of the files in a directory, with the image numbers found
+    in there for each template looked for so far."""
+
+    def __init__(self, directory, mtime_ns):
+        self.mtime_ns = mtime_ns
+        self.listed = time.time()
+        with os.scandir(directory) as it:
+            self.names = frozenset(entry.name for entry in it)
+        self.images = {}
+
+    def is_current(self, mtime_ns):
+        return (
+            mtime_ns == self.mtime_ns and self.listed - mtime_ns / 1e9 > _mtime_margin
+        )
+
+
+def _get_listing(directory):
+    directory = os.path.abspath(directory)
+    mtime_ns = os.stat(directory).st_mtime_ns
+    listing = _directory_listings.get(directory)
+    if listing is None or not listing.is_current(mtime_ns):
+        listing = _DirectoryListing(directory, mtime_ns)
+        _directory_listings[directory] = listing
+    return listing
+
+
 def template_regex(filename):
     """Try a bunch of templates to work out the most sensible. N.B. assumes
     that the image index will be the last digits found in the file name."""
@@ -102,9 +150,11 @@ def image2template_directory(filename):
 
 def find_matching_images(template, directory):
     """Find images which match the input template in the directory
-    provided."""
+    provided. The directory is only listed again once it has changed."""
 
-    files = os.listdir(directory)
+    listing = _get_listing(directory)
+    if template in listing.images:
+        return list(listing.images[template])
 
     # to turn the template to a regular expression want to replace
     # however many #'s with EXACTLY the same number of [0-9] tokens,
@@ -118,18 +168,16 @@ def find_matching_images(template, directory):
     regexp_text = re.escape(template).replace("\\#" * length, "([0-9]{%d})" % length)
     regexp = re.compile(regexp_text)
 
-    # FIXME there are faster ways of determining this - by generating the lists
-    # of possible images. That said, the code for this is now in dxtbx...
-
     images = []
 
-    for f in files:
+    for f in listing.names:
         match = regexp.match(f)
 
         if match:
             images.append(int(match.group(1)))
 
     images.sort()
+    listing.images[template] = tuple(images)
 
     return images
 
@@ -236,5 +284,150 @@ def digest_template(template, images):
     return template, images, offset
 
 
+def compact_ranges(numbers):
+    """Describe the integers in numbers compactly as ranges, e.g.
+    [1, 2, 3, 7, 9, 10] -> "1-3, 7, 9-10"."""
+
+    ranges = []
+    for number in sorted(numbers):
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ", ".join(
+        "%d" % first if first == last else "%d-%d" % (first, last)
+        for first, last in ranges
+    )
+
+
+def _list_directory(directory):
+    try:
+        return _get_listing(directory).names
+    except OSError:
+        return frozenset()
+
+
+def check_image_files(imageset, images, first, last):
+    """Check that every image from first to last is one of the images of
+    the imageset, and that the file for each of them exists and is
+    readable. Returns the sorted lists of the missing image numbers and of
+    the numbers of images which could not be read.
+
+    The existence of the files is checked against a single listing of each
+    directory, and their readability by checking many files at once. Once
+    all of the images for a template and frame range have been found, they
+    are not checked again."""
+
+    key = (imageset.get_template(), first, last)
+    if key in _readable_images:
+        return [], []
+
+    present = set(images)
+    missing = [j for j in range(first, last + 1) if j not in present]
+
+    # several images may share a file, e.g. for HDF5 data
+    image_files = {}
+    for j in range(first, last + 1):
+        if j in present:
+            image_files.setdefault(imageset.get_path(j - first), []).append(j)
+
+    listings = {}
+    unreadable = []
+    to_check = []
+    for path, numbers in image_files.items():
+        directory, name = os.path.split(os.path.abspath(path))
+        if directory not in listings:
+            listings[directory] = _list_directory(directory)
+        if name in listings[directory]:
+            to_check.append(path)
+        else:
+            unreadable.extend(numbers)
+
+    if to_check:
+        max_workers = min(_max_access_workers, len(to_check))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            readable = pool.map(lambda path: os.access(path, os.R_OK), to_check)
+            for path, ok in zip(to_check, readable):
+                if not ok:
+                    unreadable.extend(image_files[path])
+
+    unreadable.sort()
+    if not missing and not unreadable:
+        _readable_images.add(key)
+    return missing, unreadable
+
+
+class ImageFollower:
+    """Follow the images of a sweep, numbered first to last, as they are
+    written during data collection. An image counts as written once its
+    file is in the directory and all of the images before it are too."""
+
+    def __init__(
+        self, template, directory, first, last, timeout=300, poll_interval=1.0
+    ):
+        self._template = template
+        self._directory = directory
+        self._first = first
+        self._last = last
+        self._timeout = timeout
+        self._poll_interval = poll_interval
+        self._written = first - 1
+
+    def get_last_written(self):
+        """Return the number of the last image written so far, first - 1 if
+        there are none."""
+
+        if self._written < self._last:
+            try:
+                images = set(find_matching_images(self._template, self._directory))
+            except OSError:
+                images = set()
+            while self._written < self._last and self._written + 1 in images:
+                self._written += 1
+        return self._written
+
+    def wait_for(self, image):
+        """Wait until all of the images up to image (or the last image of
+        the sweep) have been written, raising RuntimeError if none appear
+        for timeout seconds. Returns the last image written."""
+
+        image = min(image, self._last)
+        written = self.get_last_written()
+        last_change = time.time()
+        while written < image:
+            time.sleep(self._poll_interval)
+            now_written = self.get_last_written()
+            if now_written > written:
+                written = now_written
+                last_change = time.time()
+            elif time.time() - last_change > self._timeout:
+                raise RuntimeError(
+                    "no new images matching %s after %d s: images %s missing"
+                    % (
+                        os.path.join(self._directory, self._template),
+                        self._timeout,
+                        compact_ranges(range(written + 1, image + 1)),
+                    )
+                )
+        return written
+
+    def wait_for_all(self):
+        return self.wait_for(self._last)
+
+    def chunks(self, size, last=None):
+        """Yield (start, end) for consecutive chunks of images up to last
+        (by default the last image of the sweep) as they are written: each
+        has at least size images, or is everything written so far if that
+        is more, apart from the final chunk which may be smaller."""
+
+        last = self._last if last is None else min(last, self._last)
+        start = self._first
+        while start <= last:
+            end = min(start + size - 1, last)
+            end = max(end, min(self.wait_for(end), last))
+            yield start, end
+            start = end + 1
+
+
 if __name__ == "__main__":
     work_template_regex()
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+
+import pytest
+
+import xia2.Experts.FindImages
+from xia2.Experts.FindImages import (
+    ImageFollower,
+    check_image_files,
+    compact_ranges,
+    find_matching_images,
+)
+
+
+class _ImageSet:
+    """The parts of a dxtbx imageset used by check_image_files."""
+
+    def __init__(self, template, first):
+        self._template = template
+        self._first = first
+
+    def get_template(self):
+        return self._template
+
+    def get_path(self, index):
+        return self._template.replace("####", "%04d" % (self._first + index))
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache(monkeypatch):
+    monkeypatch.setattr(xia2.Experts.FindImages, "_readable_images", set())
+    monkeypatch.setattr(xia2.Experts.FindImages, "_directory_listings", {})
+
+
+def test_compact_ranges():
+    assert compact_ranges([]) == ""
+    assert compact_ranges([5]) == "5"
+    assert compact_ranges([9, 1, 2, 3, 7, 10]) == "1-3, 7, 9-10"
+
+
+def test_check_image_files(tmp_path):
+    template = str(tmp_path / "x_####.cbf")
+    for j in range(1, 11):
+        if j not in (4, 5, 6):
+            (tmp_path / ("x_%04d.cbf" % j)).write_bytes(b"")
+    imageset = _ImageSet(template, 1)
+
+    # images 9, 10 not in the imageset, images 4-6 not on disk
+    missing, unreadable = check_image_files(imageset, list(range(1, 9)), 1, 10)
+    assert missing == [9, 10]
+    assert unreadable == [4, 5, 6]
+
+    if hasattr(os, "geteuid") and os.geteuid() != 0:
+        os.chmod(tmp_path / "x_0002.cbf", 0)
+        missing, unreadable = check_image_files(imageset, [1, 2, 3], 1, 3)
+        assert missing == []
+        assert unreadable == [2]
+
+
+def test_check_image_files_cached(tmp_path, monkeypatch):
+    template = str(tmp_path / "x_####.cbf")
+    for j in range(1, 101):
+        (tmp_path / ("x_%04d.cbf" % j)).write_bytes(b"")
+    imageset = _ImageSet(template, 1)
+
+    assert check_image_files(imageset, list(range(1, 101)), 1, 100) == ([], [])
+
+    # once found, the images are not looked at again in this run
+    def fail(*args):
+        raise AssertionError("images checked twice")
+
+    monkeypatch.setattr(xia2.Experts.FindImages, "_list_directory", fail)
+    assert check_image_files(imageset, list(range(1, 101)), 1, 100) == ([], [])
+
+
+def test_find_matching_images_cached(tmp_path, monkeypatch):
+    for j in (1, 2, 3, 5):
+        (tmp_path / ("x_%04d.cbf" % j)).write_bytes(b"")
+    (tmp_path / "y_0001.cbf").write_bytes(b"")
+    # as if the directory were last changed a while ago
+    os.utime(tmp_path, (0, 0))
+
+    scandir = os.scandir
+    listed = []
+
+    def counting_scandir(path):
+        listed.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(xia2.Experts.FindImages.os, "scandir", counting_scandir)
+
+    assert find_matching_images("x_####.cbf", str(tmp_path)) == [1, 2, 3, 5]
+    assert find_matching_images("x_####.cbf", str(tmp_path)) == [1, 2, 3, 5]
+    assert find_matching_images("y_####.cbf", str(tmp_path)) == [1]
+    assert len(listed) == 1
+
+    # a new image changes the modification time of the directory
+    (tmp_path / "x_0004.cbf").write_bytes(b"")
+    assert find_matching_images("x_####.cbf", str(tmp_path)) == [1, 2, 3, 4, 5]
+    assert len(listed) == 2
+
+    # which is too recent for the new listing to be trusted, as another
+    # image could have appeared since without moving it on
+    assert find_matching_images("x_####.cbf", str(tmp_path)) == [1, 2, 3, 4, 5]
+    assert len(listed) == 3
+
+
+def _write_images(directory, first, last, interval):
+    """Stand in for a detector, writing the images one at a time."""
+    for j in range(first, last + 1):
+        time.sleep(interval)
+        (directory / ("x_%04d.cbf" % j)).write_bytes(b"")
+
+
+def test_image_follower(tmp_path):
+    follower = ImageFollower(
+        "x_####.cbf", str(tmp_path), 1, 20, timeout=5, poll_interval=0.01
+    )
+    assert follower.get_last_written() == 0
+
+    writer = threading.Thread(target=_write_images, args=(tmp_path, 1, 20, 0.01))
+    writer.start()
+    try:
+        chunks = list(follower.chunks(4, last=12))
+        assert follower.wait_for_all() == 20
+    finally:
+        writer.join()
+
+    # the chunks cover the images up to 12 with no gaps, each but the last
+    # of at least four images
+    assert chunks[0][0] == 1
+    assert chunks[-1][1] == 12
+    assert all(b[0] == a[1] + 1 for a, b in zip(chunks, chunks[1:]))
+    assert all(end - start >= 3 for start, end in chunks[:-1])
+
+
+def test_image_follower_timeout(tmp_path):
+    _write_images(tmp_path, 1, 3, 0)
+    (tmp_path / "x_0005.cbf").write_bytes(b"")
+    follower = ImageFollower(
+        "x_####.cbf", str(tmp_path), 1, 10, timeout=0.1, poll_interval=0.01
+    )
+    assert follower.wait_for(2) == 3
+    with pytest.raises(RuntimeError, match="images 4-10 missing"):
+        follower.wait_for_all()
@@ -7,8 +7,11 @@
 
 
 import os
+import threading
 import xml.dom.minidom
 
+from xia2.Handlers.RunContext import ContextHandler
+
 
 class _Citations:
     """A class to track citations."""
@@ -16,6 +19,7 @@ class _Citations:
     def __init__(self):
         self._citations = {}
         self._cited = []
+        self._lock = threading.Lock()
 
         # set up the citations list...
 
@@ -51,8 +55,9 @@ class _Citations:
     def cite(self, program):
         """Cite a given program."""
 
-        if program not in self._cited:
-            self._cited.append(program)
+        with self._lock:
+            if program not in self._cited:
+                self._cited.append(program)
 
     def get_programs(self):
         """Get a list of all of the programs which have been cited."""
@@ -137,4 +142,5 @@ class _Citations:
         return actaformat % data
 
 
-Citations = _Citations()
+# the citations of the current run context, by default those of the process
+Citations = ContextHandler("citations", _Citations)
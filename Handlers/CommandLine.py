@@ -232,19 +232,21 @@ class _CommandLine:
         from xia2.Handlers.Environment import get_number_cpus
 
         if mp_params.mode == "parallel":
-            if mp_params.type == "qsub":
-                if which("qsub") is None:
-                    raise Sorry("qsub not available")
+            if mp_params.type in ("qsub", "pbs") and which("qsub") is None:
+                raise Sorry("qsub not available")
+            if mp_params.type == "slurm" and which("sbatch") is None:
+                raise Sorry("sbatch not available")
             if mp_params.njob is Auto:
                 mp_params.njob = get_number_cpus()
-                if mp_params.nproc is Auto:
-                    mp_params.nproc = 1
-            elif mp_params.nproc is Auto:
+            if mp_params.nproc is Auto:
+                # an upper bound: the cores are shared out between the sweeps
+                # according to their size
                 mp_params.nproc = get_number_cpus()
         elif mp_params.mode == "serial":
-            if mp_params.type == "qsub":
-                if which("qsub") is None:
-                    raise Sorry("qsub not available")
+            if mp_params.type in ("qsub", "pbs") and which("qsub") is None:
+                raise Sorry("qsub not available")
+            if mp_params.type == "slurm" and which("sbatch") is None:
+                raise Sorry("sbatch not available")
             if mp_params.njob is Auto:
                 mp_params.njob = 1
             if mp_params.nproc is Auto:
@@ -258,6 +260,22 @@ class _CommandLine:
         if mp_params.nproc > 1 and os.name == "nt":
             raise Sorry("nproc > 1 is not supported on Windows.")  # #191
 
+        if params.xia2.settings.developmental.result_cache:
+            from xia2.Driver import CachedDriver
+            from xia2.Driver.DriverFactory import DriverFactory
+
+            # the cached driver runs the programs on this computer, so would
+            # quietly replace e.g. XIA2CORE_DRIVERTYPE=qsub
+            driver_type = DriverFactory.get_driver_type()
+            if driver_type not in ("simple", "asyncio", "cached"):
+                raise Sorry(
+                    "result_cache cannot be used with the %s driver" % driver_type
+                )
+            CachedDriver.set_cache_directory(
+                params.xia2.settings.developmental.result_cache
+            )
+            DriverFactory.set_driver_type("cached")
+
         if params.xia2.settings.indexer is not None:
             add_preference("indexer", params.xia2.settings.indexer)
         if params.xia2.settings.refiner is not None:
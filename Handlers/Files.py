@@ -11,6 +11,9 @@ import contextlib
 import logging
 import os
 import shutil
+import threading
+
+from xia2.Handlers.RunContext import ContextHandler
 
 logger = logging.getLogger("xia2.Handlers.Files")
 
@@ -19,6 +22,9 @@ class _FileHandler:
     """A singleton class to manage files."""
 
     def __init__(self):
+        # files may be recorded from several threads at once
+        self._lock = threading.Lock()
+
         self._temporary_files = []
 
         self._html_files = {}
@@ -77,19 +83,24 @@ class _FileHandler:
 
     def record_log_file(self, tag, filename):
         """Record a log file."""
-        self._log_files[tag] = filename
+        with self._lock:
+            self._log_files[tag] = filename
 
     def record_xml_file(self, tag, filename):
         """Record an xml file."""
-        self._xml_files[tag] = filename
+        with self._lock:
+            self._xml_files[tag] = filename
 
     def record_html_file(self, tag, filename):
         """Record an html file."""
-        self._html_files[tag] = filename
+        with self._lock:
+            self._html_files[tag] = filename
 
     def record_data_file(self, filename):
         """Record a data file."""
-        if filename not in self._data_files:
+        with self._lock:
+            if filename in self._data_files:
+                return
             assert os.path.isfile(filename), "Required file %s not found" % filename
             self._data_files.append(filename)
 
@@ -97,7 +108,8 @@ class _FileHandler:
         """Record an extra data file."""
         ext = os.path.splitext(filename)[1][1:]
         key = (tag, ext)
-        self._more_data_files[key] = filename
+        with self._lock:
+            self._more_data_files[key] = filename
 
     def get_data_file(self, base_path, filename):
         """Return the point where this data file will end up!"""
@@ -111,11 +123,13 @@ class _FileHandler:
 
     def record_temporary_file(self, filename):
         # allow for file overwrites etc.
-        if filename not in self._temporary_files:
-            self._temporary_files.append(filename)
+        with self._lock:
+            if filename not in self._temporary_files:
+                self._temporary_files.append(filename)
 
 
-FileHandler = _FileHandler()
+# the file handler of the current run context, by default that of the process
+FileHandler = ContextHandler("file_handler", _FileHandler)
 
 
 @contextlib.contextmanager
@@ -10,11 +10,14 @@
 # couple for XDS.
 
 
-from iotbx.phil import parse
-from libtbx.phil import interface
+import functools
 
-master_phil = parse(
-    """
+from xia2.Handlers.RunContext import ContextHandler
+
+# the master phil is only parsed when first needed: with its includes (and
+# the cctbx types) this imports much of cctbx, dials and xia2, which many
+# programs never need
+_master_phil_str = """
 general
   .short_caption = "General settings"
 {
@@ -711,6 +714,38 @@ xia2.settings
       .help = "Minimum oscillation range of a sweep for inclusion in processing."
       .short_caption = "Minimum oscillation range"
       .expert_level = 1
+    follow
+      .short_caption = "Follow data collection"
+      .expert_level = 1
+    {
+      enable = False
+        .type = bool
+        .help = "Start processing while the images are still being written:" \
+                " spots are found on each chunk of images as it appears," \
+                " indexing starts once index_oscillation_range degrees have" \
+                " been collected and integration once the last image has" \
+                " been written. The image range of each sweep must be given" \
+                " (image=/path/to/image_0001.cbf:1:3600). Spots are only" \
+                " found incrementally with the DIALS indexer; with other" \
+                " indexers indexing waits for the last image."
+        .short_caption = "Follow data collection"
+      timeout = 300
+        .type = float(value_min=0)
+        .help = "Give up if no new image has appeared for this many seconds."
+        .short_caption = "Timeout (s)"
+      poll_interval = 1
+        .type = float(value_min=0)
+        .help = "How often to look for new images, in seconds."
+        .short_caption = "Poll interval (s)"
+      chunk_size = 50
+        .type = int(value_min=1)
+        .help = "Find spots on at least this many images at a time."
+        .short_caption = "Spotfinding chunk size"
+      index_oscillation_range = 30
+        .type = float(value_min=0)
+        .help = "Start indexing once this many degrees have been collected."
+        .short_caption = "Oscillation range for indexing"
+    }
     include scope dials.util.options.tolerance_phil_scope
     include scope dials.util.options.geometry_phil_scope
     include scope dials.util.options.format_phil_scope
@@ -869,6 +904,12 @@ xia2.settings
     detector_id = None
       .type = str
       .help = "Override detector serial number information"
+    result_cache = None
+      .type = path
+      .help = "Directory in which to keep the results of each external" \
+              " program run, keyed on the program, command line, input" \
+              " and input files. Programs already run with identical input" \
+              " are not run again: their results are restored from here."
   }
   multi_sweep_indexing = Auto
     .type = bool
@@ -958,19 +999,28 @@ xia2.settings
       .expert_level = 1
     nproc = Auto
       .type = int(value_min=1)
-      .help = "The number of processors to use per job."
+      .help = "The number of processors to use per job. In parallel mode" \
+              " this is the maximum, as the processors are shared between" \
+              " the sweeps according to the number of images in each."
       .expert_level = 0
     njob = Auto
       .type = int(value_min=1)
-      .help = "The number of sweeps to process simultaneously."
+      .help = "The maximum number of sweeps to process simultaneously."
       .expert_level = 1
-    type = *simple qsub
+    type = *simple qsub slurm pbs asyncio
       .type = choice
-      .help = "How to run the parallel processing jobs, e.g. over a cluster"
+      .help = "How to run the parallel processing jobs, e.g. over a cluster" \
+              " (qsub for Sun Grid Engine, slurm or pbs)." \
+              " asyncio runs the external programs without a shell from a" \
+              " single event loop."
       .expert_level = 1
     qsub_command = ''
       .type = str
-      .help = "The command to use to submit qsub jobs"
+      .help = "The command to use to submit qsub jobs (for SGE or PBS)"
+      .expert_level = 1
+    sbatch_command = ''
+      .type = str
+      .help = "The command to use to submit SLURM jobs"
       .expert_level = 1
   }
   report
@@ -987,14 +1037,19 @@ xia2.settings
       .type = choice
   }
 }
-""",
-    process_includes=True,
-)
+"""
 
-# override default resolution parameters
-master_phil = master_phil.fetch(
-    source=parse(
-        """\
+
+@functools.lru_cache(maxsize=None)
+def _get_master_phil():
+    from iotbx.phil import parse
+
+    master_phil = parse(_master_phil_str, process_includes=True)
+
+    # override default resolution parameters
+    return master_phil.fetch(
+        source=parse(
+            """\
 xia2.settings {
   resolution {
     isigma = None
@@ -1002,10 +1057,24 @@ xia2.settings {
   }
 }
 """
+        )
     )
-)
 
-PhilIndex = interface.index(master_phil=master_phil)
+
+def __getattr__(name):
+    if name == "master_phil":
+        return _get_master_phil()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _make_phil_index():
+    from libtbx.phil import interface
+
+    return interface.index(master_phil=_get_master_phil())
+
+
+# the parameters of the current run context, by default those of the process
+PhilIndex = ContextHandler("phil_index", _make_phil_index)
 
 if __name__ == "__main__":
     PhilIndex.working_phil.show()
@@ -0,0 +1,125 @@
+# The state of a xia2 run - the kind of driver to use, the parameters, the
+# record of files and citations and the numbering of the log files - kept
+# in a context variable rather than in module globals, so that threads and
+# asyncio tasks running wrappers at the same time each see the settings of
+# their own job (or run) rather than whichever was set last.
+#
+# The handlers themselves (PhilIndex, FileHandler, Citations, DriverFactory
+# and the log file numbering in xia2.lib.bits) look up the current context
+# on every use, so none of their callers need to change; an ordinary run
+# never sets any of this and gets the process-wide instances.
+
+
+import contextlib
+import contextvars
+import functools
+import threading
+
+
+class RunContext:
+    """The settings and handlers of a xia2 run. Any left as None are taken
+    from the process-wide defaults."""
+
+    def __init__(
+        self,
+        driver_type=None,
+        phil_index=None,
+        file_handler=None,
+        citations=None,
+        run_number=None,
+        array_jobs=None,
+    ):
+        self.driver_type = driver_type
+        self.phil_index = phil_index
+        self.file_handler = file_handler
+        self.citations = citations
+        # a xia2.lib.bits.Counter for the numbering of the log files
+        self.run_number = run_number
+        # a xia2.Driver.BatchDriver.ArrayJobs gathering the batch jobs of
+        # threads working side by side into array jobs
+        self.array_jobs = array_jobs
+
+    def replace(self, **changes):
+        """Return a new context with the given settings replaced, keeping
+        the current ones for any given as None."""
+        settings = dict(self.__dict__)
+        for name, value in changes.items():
+            if name not in settings:
+                raise TypeError("unknown run context setting: %s" % name)
+            if value is not None:
+                settings[name] = value
+        return RunContext(**settings)
+
+
+_current_context = contextvars.ContextVar("xia2_run_context", default=RunContext())
+
+
+def get_run_context():
+    return _current_context.get()
+
+
+@contextlib.contextmanager
+def run_context(**changes):
+    """Run the enclosed code with the given settings replacing those of
+    the current run context, e.g.
+
+      with run_context(driver_type="qsub"):
+          pointless = Pointless()
+
+    This only affects the current thread (or asyncio task), and those
+    started from it: use bind_run_context() for work handed to a pool of
+    threads."""
+
+    token = _current_context.set(get_run_context().replace(**changes))
+    try:
+        yield get_run_context()
+    finally:
+        _current_context.reset(token)
+
+
+def bind_run_context(func):
+    """Return a function which calls func in the current run context,
+    whichever thread it is then called from: threads (unlike asyncio tasks)
+    start out in the default context, not that of the thread starting them."""
+
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # a context can only be entered by one thread at a time
+        return context.copy().run(func, *args, **kwargs)
+
+    return wrapper
+
+
+class ContextHandler:
+    """Stands in for one of the process-wide handlers (PhilIndex,
+    FileHandler, Citations), passing everything through to the instance in
+    the current run context or, if there is none, to the default. The
+    default is only made, by calling make_default(), when first needed, so
+    that programs which never use the handler do not pay for setting it up."""
+
+    def __init__(self, name, make_default):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_make_default", make_default)
+        object.__setattr__(self, "_default", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def get_instance(self):
+        instance = getattr(get_run_context(), self._name)
+        if instance is not None:
+            return instance
+        if self._default is None:
+            with self._lock:
+                if self._default is None:
+                    object.__setattr__(self, "_default", self._make_default())
+        return self._default
+
+    def __getattr__(self, attr):
+        if attr in ("_name", "_make_default", "_default", "_lock"):
+            # not yet set, e.g. while being copied
+            raise AttributeError(attr)
+        return getattr(self.get_instance(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self.get_instance(), attr, value)
@@ -0,0 +1,81 @@
+import asyncio
+import concurrent.futures
+import threading
+
+from libtbx.phil import interface
+
+from xia2.Driver.AsyncDriver import AsyncDriver
+from xia2.Driver.DriverFactory import DriverFactory
+from xia2.Driver.SimpleDriver import SimpleDriver
+from xia2.Handlers.Files import FileHandler, _FileHandler
+from xia2.Handlers.Phil import PhilIndex, master_phil
+from xia2.Handlers.RunContext import bind_run_context, get_run_context, run_context
+from xia2.lib.bits import Counter, _get_number
+
+
+def test_run_context_driver_type():
+    default = DriverFactory.get_driver_type()
+    with run_context(driver_type="asyncio"):
+        assert isinstance(DriverFactory.Driver(), AsyncDriver)
+        # None leaves the setting alone
+        with run_context(driver_type=None):
+            assert DriverFactory.get_driver_type() == "asyncio"
+        with run_context(driver_type="simple"):
+            assert isinstance(DriverFactory.Driver(), SimpleDriver)
+        assert DriverFactory.get_driver_type() == "asyncio"
+    assert DriverFactory.get_driver_type() == default
+
+
+def test_run_context_threads():
+    # each thread sees the driver type of the job it is running, however
+    # the threads are interleaved
+    barrier = threading.Barrier(2)
+
+    def job(driver_type):
+        with run_context(driver_type=driver_type):
+            barrier.wait()
+            return DriverFactory.get_driver_type()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(job, t) for t in ("asyncio", "script")]
+        assert [f.result() for f in futures] == ["asyncio", "script"]
+
+    # without binding the context, threads start out in the default one
+    with run_context(driver_type="asyncio"):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+            unbound = pool.submit(DriverFactory.get_driver_type)
+            bound = pool.submit(bind_run_context(DriverFactory.get_driver_type))
+            assert unbound.result() == DriverFactory._driver_type
+            assert bound.result() == "asyncio"
+
+
+def test_run_context_asyncio():
+    async def job(driver_type):
+        with run_context(driver_type=driver_type):
+            await asyncio.sleep(0.01)
+            return DriverFactory.get_driver_type()
+
+    async def main():
+        return await asyncio.gather(job("asyncio"), job("script"))
+
+    assert asyncio.run(main()) == ["asyncio", "script"]
+
+
+def test_run_context_handlers(tmp_path):
+    # a run with handlers of its own leaves those of the process alone
+    default_handler = FileHandler.get_instance()
+    default_nproc = PhilIndex.params.xia2.settings.multiprocessing.nproc
+    with run_context(
+        phil_index=interface.index(master_phil=master_phil),
+        file_handler=_FileHandler(),
+        run_number=Counter(0),
+    ) as context:
+        assert get_run_context() is context
+        PhilIndex.update("xia2.settings.multiprocessing.nproc=7")
+        assert PhilIndex.params.xia2.settings.multiprocessing.nproc == 7
+        FileHandler.record_log_file("test", str(tmp_path / "test.log"))
+        assert FileHandler.get_instance() is context.file_handler
+        assert [_get_number(), _get_number()] == [1, 2]
+    assert PhilIndex.params.xia2.settings.multiprocessing.nproc == default_nproc
+    assert "test" not in default_handler._log_files
+    assert "test" in context.file_handler._log_files
@@ -2,7 +2,9 @@ import logging
 import math
 
 import iotbx.phil
+import numpy as np
 from cctbx.array_family import flex
+from cctbx.miller import split_unmerged
 from libtbx.utils import frange
 
 logger = logging.getLogger(__name__)
@@ -49,6 +51,7 @@ class DeltaCcHalf:
         self.binner = unmerged_intensities.eliminate_sys_absent().setup_binner_counting_sorted(
             n_bins=self._n_bins
         )
+        self._unmerged_intensities = unmerged_intensities
         self.cc_half_overall = self._compute_mean_weighted_cc_half(unmerged_intensities)
 
         self._group_size = group_size
@@ -76,30 +79,186 @@ class DeltaCcHalf:
                 self._group_to_batches.append((b_min, b_max))
                 self._group_to_dataset_id.append(test_k)
 
+    def _group_observations(self, permutation=None):
+        """The indices of the observations in each group, in the concatenated
+        unmerged intensities reordered by permutation (if given), together
+        with the group of each observation."""
+        obs_group = []
+        offset = 0
+        for test_k, batches in enumerate(self.batches):
+            batches = batches.data().as_numpy_array()
+            if self._group_size is None:
+                obs_group.append(np.full(batches.size, offset))
+            else:
+                obs_group.append(offset + (batches - batches.min()) // self._group_size)
+            offset += list(self._group_to_dataset_id).count(test_k)
+        obs_group = np.concatenate(obs_group)
+        if permutation is not None:
+            obs_group = obs_group[permutation]
+        order = np.argsort(obs_group, kind="stable")
+        counts = np.bincount(obs_group, minlength=len(self._group_to_batches))
+        return np.split(order, np.cumsum(counts)[:-1]), obs_group
+
     def _compute_ccs(self):
+        if self._cc_one_half_method == "sigma_tau":
+            ccs = self._compute_ccs_sigma_tau()
+        else:
+            ccs = self._compute_ccs_half_dataset()
+        for (group_start, group_end), cc in zip(self._group_to_batches, ccs):
+            logger.debug(
+                "CC½ excluding batches %i-%i: %.3f", group_start, group_end, cc
+            )
+        return ccs
+
+    def _compute_ccs_sigma_tau(self):
+        """CC½ excluding each group in turn by the sigma-tau method, as
+        cc_one_half_sigma_tau(), from the sums over the observations of each
+        unique reflection and over the reflections in each resolution bin.
+        These are accumulated once, then the contribution of each group is
+        subtracted, so the cost of each group is proportional to the number
+        of observations in it rather than to the size of the whole data set."""
+
+        unmerged = self._unmerged_intensities.map_to_asu()
+        unmerged.use_binning(self.binner)
+        n_bins = unmerged.binner().n_bins_all()
+        obs_bin = unmerged.binner().bin_indices().as_numpy_array().astype(np.intp)
+        intensity = unmerged.data().as_numpy_array()
+        group_obs, _ = self._group_observations()
+
+        # the unique reflection of each observation, from the packed indices
+        hkl = np.array(unmerged.indices(), dtype=np.int64).reshape(-1, 3)
+        hkl -= hkl.min(axis=0)
+        span = hkl.max(axis=0) + 1
+        packed = (hkl[:, 0] * span[1] + hkl[:, 1]) * span[2] + hkl[:, 2]
+        unique, refl = np.unique(packed, return_inverse=True)
+        n_refl = unique.size
+        refl_bin = np.zeros(n_refl, dtype=np.intp)
+        refl_bin[refl] = obs_bin
+
+        # sums over the observations of each reflection, taken about the
+        # mean intensity of the reflection for numerical stability
+        n = np.bincount(refl, minlength=n_refl)
+        shift = np.bincount(refl, intensity, n_refl) / n
+        x = intensity - shift[refl]
+        s1 = np.bincount(refl, x, n_refl)
+        s2 = np.bincount(refl, x * x, n_refl)
+
+        def merge(n, s1, s2, shift):
+            # mean and internal variance of each reflection, as given by
+            # merge_equivalents() with unit sigmas; zero where not used
+            used = n > 1
+            n = np.where(used, n, 2)
+            mean = s1 / n
+            variance = np.maximum((s2 - s1 * mean) / (n - 1), 1.0) / n
+            return used, (mean + shift) * used, variance * used
+
+        used, mean, variance = merge(n, s1, s2, shift)
+        bin_shift = np.bincount(refl_bin, mean, n_bins) / np.maximum(
+            np.bincount(refl_bin, used, n_bins), 1
+        )
+
+        def bin_sums(refl_bin, used, mean, variance):
+            d = mean - bin_shift[refl_bin] * used
+            return np.array(
+                [
+                    np.bincount(refl_bin, used, n_bins),
+                    np.bincount(refl_bin, d, n_bins),
+                    np.bincount(refl_bin, d * d, n_bins),
+                    np.bincount(refl_bin, variance, n_bins),
+                ]
+            )
+
+        totals = bin_sums(refl_bin, used, mean, variance)
+        bin_n_obs = np.bincount(obs_bin, minlength=n_bins)
+
         ccs = flex.double()
-        for (group_start, group_end), test_k in zip(
-            self._group_to_batches, self._group_to_dataset_id
-        ):
-            batches = self.batches[test_k].data()
-            group_sel = (batches >= group_start) & (batches <= group_end)
-            indices_i = flex.miller_index()
-            data_i = flex.double()
-            sigmas_i = flex.double()
-            for k, unmerged in enumerate(self.intensities):
-                if k == test_k:
-                    unmerged = unmerged.select(~group_sel)
-                indices_i.extend(unmerged.indices())
-                data_i.extend(unmerged.data())
-                sigmas_i.extend(unmerged.sigmas())
-
-            unmerged_i = self.intensities[0].customized_copy(
-                indices=indices_i, data=data_i, sigmas=sigmas_i
+        for sel in group_obs:
+            # the reflections with observations in this group, before and
+            # after removing them
+            affected, inverse = np.unique(refl[sel], return_inverse=True)
+            removed = (
+                np.bincount(inverse),
+                np.bincount(inverse, x[sel]),
+                np.bincount(inverse, x[sel] ** 2),
             )
+            b = refl_bin[affected]
+            sums = (
+                totals
+                - bin_sums(b, used[affected], mean[affected], variance[affected])
+                + bin_sums(
+                    b,
+                    *merge(
+                        n[affected] - removed[0],
+                        s1[affected] - removed[1],
+                        s2[affected] - removed[2],
+                        shift[affected],
+                    )
+                )
+            )
+            n_obs = bin_n_obs - np.bincount(obs_bin[sel], minlength=n_bins)
 
-            ccs.append(self._compute_mean_weighted_cc_half(unmerged_i))
-            logger.debug(
-                "CC½ excluding batches %i-%i: %.3f", group_start, group_end, ccs[-1],
+            # cc_one_half_sigma_tau() for each non-empty bin
+            m, y1, y2, e = (row[n_obs > 0] for row in sums)
+            m_ = np.maximum(m, 2)
+            var_y = (y2 - y1 * y1 / m_) / (m_ - 1)
+            var_e = 2 * e / m_
+            cc = np.where(m > 1, (var_y - 0.5 * var_e) / (var_y + 0.5 * var_e), 0.0)
+            ccs.append(flex.mean_weighted(flex.double(cc), flex.double(m)))
+        return ccs
+
+    def _compute_ccs_half_dataset(self):
+        """CC½ excluding each group in turn by the half dataset method, as
+        cc_one_half(). The random split into half datasets depends on all of
+        the observations in a bin, so this cannot be done by subtraction:
+        instead the data are mapped to the asu, sorted and binned once, and
+        only the bins with observations in each group are recomputed."""
+
+        unmerged = self._unmerged_intensities.customized_copy(
+            anomalous_flag=False
+        ).map_to_asu()
+        permutation = unmerged.sort_permutation(by_value="packed_indices")
+        unmerged = unmerged.select(permutation)
+        unmerged.use_binning(self.binner)
+        obs_bin = unmerged.binner().bin_indices().as_numpy_array()
+        positive = unmerged.sigmas().as_numpy_array() > 0
+        group_obs, obs_group = self._group_observations(
+            permutation.as_numpy_array()
+        )
+        bin_obs = [
+            np.flatnonzero(obs_bin == i_bin)
+            for i_bin in unmerged.binner().range_all()
+        ]
+
+        def cc_one_half(sel):
+            if sel.size == 0:
+                return None
+            sel = flex.size_t(sel[positive[sel]].astype(np.uint64))
+            split_datasets = split_unmerged(
+                unmerged_indices=unmerged.indices().select(sel),
+                unmerged_data=unmerged.data().select(sel),
+                unmerged_sigmas=unmerged.sigmas().select(sel),
+                seed=0,
+            )
+            data_1 = split_datasets.data_1
+            return (
+                flex.linear_correlation(data_1, split_datasets.data_2).coefficient(),
+                data_1.size(),
+            )
+
+        all_cc_bins = [cc_one_half(sel) for sel in bin_obs]
+
+        ccs = flex.double()
+        for i_group, sel in enumerate(group_obs):
+            cc_bins = list(all_cc_bins)
+            for i_bin in np.unique(obs_bin[sel]):
+                keep = bin_obs[i_bin]
+                cc_bins[i_bin] = cc_one_half(keep[obs_group[keep] != i_group])
+            cc_bins = [b for b in cc_bins if b is not None]
+            ccs.append(
+                flex.mean_weighted(
+                    flex.double(b[0] for b in cc_bins),
+                    flex.double(b[1] for b in cc_bins),
+                )
             )
         return ccs
 
@@ -1,6 +1,7 @@
 # An indexer using the DIALS methods.
 
 
+import concurrent.futures
 import copy
 import logging
 import math
@@ -41,9 +42,11 @@ from xia2.Schema.Interfaces.Indexer import Indexer
 from xia2.lib.bits import auto_logfiler
 from xia2.Handlers.Streams import banner
 from xia2.Handlers.Phil import PhilIndex
+from xia2.Handlers.RunContext import bind_run_context
 from xia2.Handlers.Files import FileHandler
 from xia2.Experts.SymmetryExpert import lattice_to_spacegroup_number
 from xia2.Handlers.Citations import Citations
+from xia2.Handlers.Environment import get_number_cpus
 from dials.util.ascii_art import spot_counts_per_image_plot
 from cctbx.sgtbx import bravais_types
 from dxtbx.serialize import load
@@ -53,6 +56,8 @@ logger = logging.getLogger("xia2.Modules.Indexer.DialsIndexer")
 
 
 class DialsIndexer(Indexer):
+    follows_images = True
+
     def __init__(self):
         super().__init__()
 
@@ -239,6 +244,170 @@ class DialsIndexer(Indexer):
 
         return wedges
 
+    def _configure_spotfinder(self, spotfinder, sweep_filename):
+        dfs_params = PhilIndex.params.dials.find_spots
+        spotfinder.set_input_sweep_filename(sweep_filename)
+        if dfs_params.phil_file is not None:
+            spotfinder.set_phil_file(dfs_params.phil_file)
+        if dfs_params.min_spot_size is not None:
+            spotfinder.set_min_spot_size(dfs_params.min_spot_size)
+        if dfs_params.min_local is not None:
+            spotfinder.set_min_local(dfs_params.min_local)
+        if dfs_params.sigma_strong:
+            spotfinder.set_sigma_strong(dfs_params.sigma_strong)
+        gain = PhilIndex.params.xia2.settings.input.gain
+        if gain:
+            spotfinder.set_gain(gain)
+        if dfs_params.filter_ice_rings:
+            spotfinder.set_filter_ice_rings(dfs_params.filter_ice_rings)
+        if dfs_params.kernel_size:
+            spotfinder.set_kernel_size(dfs_params.kernel_size)
+        if dfs_params.global_threshold is not None:
+            spotfinder.set_global_threshold(dfs_params.global_threshold)
+        if dfs_params.threshold.algorithm is not None:
+            spotfinder.set_threshold_algorithm(dfs_params.threshold.algorithm)
+
+    def _run_spotfinder(self, spotfinder):
+        spotfinder.run()
+
+        spot_filename = spotfinder.get_spot_filename()
+        if not os.path.exists(spot_filename):
+            raise RuntimeError(
+                "Spotfinding failed: %s does not exist."
+                % os.path.basename(spot_filename)
+            )
+        return flex.reflection_table.from_file(spot_filename)
+
+    def _find_spots_following(self, spotfinder, follower, xsweep, last, nproc):
+        """Find the spots on the images up to last a chunk at a time as they
+        are written, gathering them all into the spot file of spotfinder,
+        which is used for the first chunk. The later chunks start from the
+        experiments written for the first, so that the experiment
+        identifiers of all of the spots match."""
+
+        chunk_size = PhilIndex.params.xia2.settings.input.follow.chunk_size
+        reflections = None
+        for start, end in follower.chunks(chunk_size, last):
+            if reflections is None:
+                chunk_spotfinder = spotfinder
+            else:
+                chunk_spotfinder = self.Spotfinder()
+                self._configure_spotfinder(
+                    chunk_spotfinder,
+                    os.path.join(
+                        self.get_working_directory(),
+                        spotfinder.get_output_sweep_filename(),
+                    ),
+                )
+                chunk_spotfinder.set_output_sweep_filename(
+                    f"{chunk_spotfinder.get_xpid()}_{xsweep.get_name()}_strong.expt"
+                )
+                chunk_spotfinder.set_input_spot_filename(
+                    f"{chunk_spotfinder.get_xpid()}_{xsweep.get_name()}_strong.refl"
+                )
+                chunk_spotfinder.set_nproc(nproc)
+            chunk_spotfinder.set_scan_ranges([(start, end)])
+            logger.debug(
+                "Finding spots on images %d to %d of %s", start, end, xsweep.get_name()
+            )
+            if reflections is None:
+                reflections = self._run_spotfinder(chunk_spotfinder)
+            else:
+                reflections.extend(self._run_spotfinder(chunk_spotfinder))
+
+        reflections.as_file(spotfinder.get_spot_filename())
+        return reflections
+
+    def _find_spots(
+        self,
+        imageset,
+        xsweep,
+        sweep_filename,
+        spotfinder,
+        detectblanks,
+        discovery,
+        nproc,
+    ):
+        """Find the spots on one imageset, look for blank images and search
+        for the beam centre: the beam centre search is skipped if the
+        imageset is to be split around blank regions. When following data
+        collection, the spots are found on the images as they are written,
+        until there are enough to index from. Returns the spot and
+        experiments filenames, a plot of the spot counts and the blank
+        regions."""
+
+        first, last = imageset.get_scan().get_image_range()
+
+        # FIXME this should really use the assigned spot finding regions
+        # offset = self.get_frame_offset()
+        self._configure_spotfinder(spotfinder, sweep_filename)
+        follower = xsweep.get_image_follower()
+        if follower is not None:
+            follow_params = PhilIndex.params.xia2.settings.input.follow
+            width = imageset.get_scan().get_oscillation()[1]
+            last = min(
+                last,
+                first
+                + int(math.ceil(follow_params.index_oscillation_range / width))
+                - 1,
+            )
+            refl = self._find_spots_following(spotfinder, follower, xsweep, last, nproc)
+        else:
+            if last - first > 10:
+                # several of these may be running at once in the same
+                # directory, so each needs its own hot mask file
+                spotfinder.set_write_hot_mask(True)
+                spotfinder.set_hot_mask_prefix("%d_hot_mask" % spotfinder.get_xpid())
+            if PhilIndex.params.dials.fast_mode:
+                wedges = self._index_select_images_i(imageset)
+                spotfinder.set_scan_ranges(wedges)
+            else:
+                spotfinder.set_scan_ranges([(first, last)])
+            refl = self._run_spotfinder(spotfinder)
+
+        spot_filename = spotfinder.get_spot_filename()
+        experiments_filename = spotfinder.get_output_sweep_filename()
+
+        if not len(refl):
+            raise RuntimeError("No spots found in sweep %s" % xsweep.get_name())
+        spot_counts_plot = spot_counts_per_image_plot(refl)
+
+        blank_regions = []
+        if detectblanks is not None:
+            detectblanks.set_sweep_filename(experiments_filename)
+            detectblanks.set_reflections_filename(spot_filename)
+            detectblanks.run()
+            json = detectblanks.get_results()
+            blank_regions = [
+                (int(s), int(e)) for s, e in json["strong"]["blank_regions"]
+            ]
+
+        remove_blanks = blank_regions and PhilIndex.params.xia2.settings.remove_blanks
+
+        if discovery is not None and not remove_blanks:
+            discovery.set_sweep_filename(experiments_filename)
+            discovery.set_spot_filename(spot_filename)
+
+            # set scan_range to correspond to not more than 180 degrees
+            # if we have > 20000 reflections
+            width = imageset.get_scan().get_oscillation()[1]
+            if (last - first) * width > 180.0 and len(refl) > 20000:
+                end = first + int(round(180.0 / width)) - 1
+                logger.debug("Using %d to %d for beam search", first, end)
+                discovery.set_image_range((first, end))
+
+            try:
+                discovery.run()
+                result = discovery.get_optimized_experiments_filename()
+                # overwrite indexed.expt in experiments list
+                experiments_filename = result
+            except Exception as e:
+                logger.debug(
+                    "DIALS beam centre search failed: %s", str(e), exc_info=True
+                )
+
+        return spot_filename, experiments_filename, spot_counts_plot, blank_regions
+
     def _index_prepare(self):
 
         Citations.cite("dials")
@@ -250,20 +419,29 @@ class DialsIndexer(Indexer):
         spot_lists = []
         experiments_filenames = []
 
-        for imageset, xsweep in zip(self._indxr_imagesets, self._indxr_sweeps):
+        imagesets = list(zip(self._indxr_imagesets, self._indxr_sweeps))
 
-            logger.notice(banner("Spotfinding %s" % xsweep.get_name()))
+        # the imagesets are independent of one another until indexing, so
+        # run the spotfinding for all of them at once, sharing out the cores
+        nproc = PhilIndex.params.xia2.settings.multiprocessing.nproc
+        if not isinstance(nproc, int) or nproc < 1:
+            nproc = get_number_cpus()
+        n_workers = max(1, min(nproc, len(imagesets)))
+        nproc_per_imageset = max(1, nproc // n_workers)
 
-            first, last = imageset.get_scan().get_image_range()
+        # the wrappers are all set up here in order, before any are run, so
+        # that the log files are numbered the same way from one run to the
+        # next
+        from dxtbx.model.experiment_list import ExperimentListFactory
 
+        genmasks = []
+        for imageset, xsweep in imagesets:
             # at this stage, break out to run the DIALS code: this sets itself up
             # now cheat and pass in some information... save re-reading all of the
             # image headers
 
             # FIXME need to adjust this to allow (say) three chunks of images
 
-            from dxtbx.model.experiment_list import ExperimentListFactory
-
             sweep_filename = os.path.join(
                 self.get_working_directory(), "%s_import.expt" % xsweep.get_name()
             )
@@ -280,181 +458,151 @@ class DialsIndexer(Indexer):
                 )
             )
             genmask.set_params(PhilIndex.params.dials.masking)
-            sweep_filename, mask_pickle = genmask.run()
+            genmasks.append(genmask)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=n_workers) as pool:
+            masked = [
+                future.result()
+                for future in [
+                    pool.submit(bind_run_context(genmask.run)) for genmask in genmasks
+                ]
+            ]
+        for (imageset, xsweep), (sweep_filename, mask_pickle) in zip(imagesets, masked):
             logger.debug("Generated mask for %s: %s", xsweep.get_name(), mask_pickle)
 
-            gain = PhilIndex.params.xia2.settings.input.gain
-            if gain is libtbx.Auto:
-                gain_estimater = self.EstimateGain()
-                gain_estimater.set_sweep_filename(sweep_filename)
-                gain_estimater.run()
-                gain = gain_estimater.get_gain()
-                logger.info("Estimated gain: %.2f", gain)
-                PhilIndex.params.xia2.settings.input.gain = gain
-
-            # FIXME this should really use the assigned spot finding regions
-            # offset = self.get_frame_offset()
-            dfs_params = PhilIndex.params.dials.find_spots
+        # the gain is shared between all of the imagesets, so is only
+        # estimated (from the first) if it has not been set already
+        gain = PhilIndex.params.xia2.settings.input.gain
+        if gain is libtbx.Auto:
+            gain_estimater = self.EstimateGain()
+            gain_estimater.set_sweep_filename(masked[0][0])
+            gain_estimater.run()
+            gain = gain_estimater.get_gain()
+            logger.info("Estimated gain: %.2f", gain)
+            PhilIndex.params.xia2.settings.input.gain = gain
+
+        jobs = []
+        for (imageset, xsweep), (sweep_filename, mask_pickle) in zip(imagesets, masked):
             spotfinder = self.Spotfinder()
-            if last - first > 10:
-                spotfinder.set_write_hot_mask(True)
-            spotfinder.set_input_sweep_filename(sweep_filename)
             spotfinder.set_output_sweep_filename(
                 f"{spotfinder.get_xpid()}_{xsweep.get_name()}_strong.expt"
             )
             spotfinder.set_input_spot_filename(
                 f"{spotfinder.get_xpid()}_{xsweep.get_name()}_strong.refl"
             )
-            if PhilIndex.params.dials.fast_mode:
-                wedges = self._index_select_images_i(imageset)
-                spotfinder.set_scan_ranges(wedges)
-            else:
-                spotfinder.set_scan_ranges([(first, last)])
-            if dfs_params.phil_file is not None:
-                spotfinder.set_phil_file(dfs_params.phil_file)
-            if dfs_params.min_spot_size is not None:
-                spotfinder.set_min_spot_size(dfs_params.min_spot_size)
-            if dfs_params.min_local is not None:
-                spotfinder.set_min_local(dfs_params.min_local)
-            if dfs_params.sigma_strong:
-                spotfinder.set_sigma_strong(dfs_params.sigma_strong)
-            gain = PhilIndex.params.xia2.settings.input.gain
-            if gain:
-                spotfinder.set_gain(gain)
-            if dfs_params.filter_ice_rings:
-                spotfinder.set_filter_ice_rings(dfs_params.filter_ice_rings)
-            if dfs_params.kernel_size:
-                spotfinder.set_kernel_size(dfs_params.kernel_size)
-            if dfs_params.global_threshold is not None:
-                spotfinder.set_global_threshold(dfs_params.global_threshold)
-            if dfs_params.threshold.algorithm is not None:
-                spotfinder.set_threshold_algorithm(dfs_params.threshold.algorithm)
-            spotfinder.run()
-
-            spot_filename = spotfinder.get_spot_filename()
-            if not os.path.exists(spot_filename):
-                raise RuntimeError(
-                    "Spotfinding failed: %s does not exist."
-                    % os.path.basename(spot_filename)
-                )
-
-            spot_lists.append(spot_filename)
-            experiments_filenames.append(spotfinder.get_output_sweep_filename())
-
-            refl = flex.reflection_table.from_file(spot_filename)
-            if not len(refl):
-                raise RuntimeError("No spots found in sweep %s" % xsweep.get_name())
-            logger.info(spot_counts_per_image_plot(refl))
-
-            if not PhilIndex.params.dials.fast_mode:
+            spotfinder.set_nproc(nproc_per_imageset)
+            # when following data collection the spots are only found on the
+            # first images, so all of the rest would appear to be blank
+            detectblanks = None
+            if (
+                not PhilIndex.params.dials.fast_mode
+                and xsweep.get_image_follower() is None
+            ):
                 detectblanks = self.DetectBlanks()
-                detectblanks.set_sweep_filename(experiments_filenames[-1])
-                detectblanks.set_reflections_filename(spot_filename)
-                detectblanks.run()
-                json = detectblanks.get_results()
-                blank_regions = json["strong"]["blank_regions"]
-                if len(blank_regions):
-                    blank_regions = [(int(s), int(e)) for s, e in blank_regions]
-                    for blank_start, blank_end in blank_regions:
-                        logger.info(
-                            "WARNING: Potential blank images: %i -> %i",
-                            blank_start + 1,
-                            blank_end,
-                        )
-
-                    if PhilIndex.params.xia2.settings.remove_blanks:
-                        non_blanks = []
-                        start, end = imageset.get_array_range()
-                        last_blank_end = start
-                        for blank_start, blank_end in blank_regions:
-                            if blank_start > start:
-                                non_blanks.append((last_blank_end, blank_start))
-                            last_blank_end = blank_end
-
-                        if last_blank_end + 1 < end:
-                            non_blanks.append((last_blank_end, end))
-
-                        xsweep = self.get_indexer_sweep()
-                        xwav = xsweep.get_wavelength()
-                        xsample = xsweep.sample
-
-                        sweep_name = xsweep.get_name()
-
-                        for i, (nb_start, nb_end) in enumerate(non_blanks):
-                            assert i < 26
-                            if i == 0:
-                                sub_imageset = imageset[
-                                    nb_start - start : nb_end - start
-                                ]
-                                xsweep._frames_to_process = (nb_start + 1, nb_end + 1)
-                                self.set_indexer_prepare_done(done=False)
-                                self._indxr_imagesets[
-                                    self._indxr_imagesets.index(imageset)
-                                ] = sub_imageset
-                                xsweep._integrater._setup_from_imageset(sub_imageset)
-                            else:
-                                min_images = (
-                                    PhilIndex.params.xia2.settings.input.min_images
-                                )
-                                if (nb_end - nb_start) < min_images:
-                                    continue
-                                new_name = "_".join(
-                                    (sweep_name, string.ascii_lowercase[i])
-                                )
-                                new_sweep = xwav.add_sweep(
-                                    new_name,
-                                    xsample,
-                                    directory=os.path.join(
-                                        os.path.basename(xsweep.get_directory()),
-                                        new_name,
-                                    ),
-                                    image=imageset.get_path(nb_start - start),
-                                    frames_to_process=(nb_start + 1, nb_end),
-                                    beam=xsweep.get_beam_centre(),
-                                    reversephi=xsweep.get_reversephi(),
-                                    distance=xsweep.get_distance(),
-                                    gain=xsweep.get_gain(),
-                                    dmin=xsweep.get_resolution_high(),
-                                    dmax=xsweep.get_resolution_low(),
-                                    polarization=xsweep.get_polarization(),
-                                    user_lattice=xsweep.get_user_lattice(),
-                                    user_cell=xsweep.get_user_cell(),
-                                    epoch=xsweep._epoch,
-                                    ice=xsweep._ice,
-                                    excluded_regions=xsweep._excluded_regions,
-                                )
-                                logger.info(
-                                    "Generating new sweep: %s (%s:%i:%i)",
-                                    new_sweep.get_name(),
-                                    new_sweep.get_image(),
-                                    new_sweep.get_frames_to_process()[0],
-                                    new_sweep.get_frames_to_process()[1],
-                                )
-                        return
-
+            discovery = None
             if not PhilIndex.params.xia2.settings.trust_beam_centre:
                 discovery = self.SearchBeamPosition()
-                discovery.set_sweep_filename(experiments_filenames[-1])
-                discovery.set_spot_filename(spot_filename)
+                discovery.set_nproc(nproc_per_imageset)
+            jobs.append(
+                (
+                    imageset,
+                    xsweep,
+                    sweep_filename,
+                    spotfinder,
+                    detectblanks,
+                    discovery,
+                    nproc_per_imageset,
+                )
+            )
 
-                # set scan_range to correspond to not more than 180 degrees
-                # if we have > 20000 reflections
-                width = imageset.get_scan().get_oscillation()[1]
-                if (last - first) * width > 180.0 and len(refl) > 20000:
-                    end = first + int(round(180.0 / width)) - 1
-                    logger.debug("Using %d to %d for beam search", first, end)
-                    discovery.set_image_range((first, end))
+        # the results are collected in the original order, so any error is
+        # reported for the first imageset on which it happened
+        with concurrent.futures.ThreadPoolExecutor(max_workers=n_workers) as pool:
+            find_spots = bind_run_context(self._find_spots)
+            futures = [pool.submit(find_spots, *job) for job in jobs]
+            results = [future.result() for future in futures]
 
-                try:
-                    discovery.run()
-                    result = discovery.get_optimized_experiments_filename()
-                    # overwrite indexed.expt in experiments list
-                    experiments_filenames[-1] = result
-                except Exception as e:
-                    logger.debug(
-                        "DIALS beam centre search failed: %s", str(e), exc_info=True
+        for (imageset, xsweep), result in zip(imagesets, results):
+            spot_filename, experiments_filename, plot, blank_regions = result
+
+            logger.notice(banner("Spotfinding %s" % xsweep.get_name()))
+            logger.info(plot)
+
+            spot_lists.append(spot_filename)
+            experiments_filenames.append(experiments_filename)
+
+            if len(blank_regions):
+                for blank_start, blank_end in blank_regions:
+                    logger.info(
+                        "WARNING: Potential blank images: %i -> %i",
+                        blank_start + 1,
+                        blank_end,
                     )
 
+                if PhilIndex.params.xia2.settings.remove_blanks:
+                    non_blanks = []
+                    start, end = imageset.get_array_range()
+                    last_blank_end = start
+                    for blank_start, blank_end in blank_regions:
+                        if blank_start > start:
+                            non_blanks.append((last_blank_end, blank_start))
+                        last_blank_end = blank_end
+
+                    if last_blank_end + 1 < end:
+                        non_blanks.append((last_blank_end, end))
+
+                    xsweep = self.get_indexer_sweep()
+                    xwav = xsweep.get_wavelength()
+                    xsample = xsweep.sample
+
+                    sweep_name = xsweep.get_name()
+
+                    for i, (nb_start, nb_end) in enumerate(non_blanks):
+                        assert i < 26
+                        if i == 0:
+                            sub_imageset = imageset[nb_start - start : nb_end - start]
+                            xsweep._frames_to_process = (nb_start + 1, nb_end + 1)
+                            self.set_indexer_prepare_done(done=False)
+                            self._indxr_imagesets[
+                                self._indxr_imagesets.index(imageset)
+                            ] = sub_imageset
+                            xsweep._integrater._setup_from_imageset(sub_imageset)
+                        else:
+                            min_images = PhilIndex.params.xia2.settings.input.min_images
+                            if (nb_end - nb_start) < min_images:
+                                continue
+                            new_name = "_".join((sweep_name, string.ascii_lowercase[i]))
+                            new_sweep = xwav.add_sweep(
+                                new_name,
+                                xsample,
+                                directory=os.path.join(
+                                    os.path.basename(xsweep.get_directory()),
+                                    new_name,
+                                ),
+                                image=imageset.get_path(nb_start - start),
+                                frames_to_process=(nb_start + 1, nb_end),
+                                beam=xsweep.get_beam_centre(),
+                                reversephi=xsweep.get_reversephi(),
+                                distance=xsweep.get_distance(),
+                                gain=xsweep.get_gain(),
+                                dmin=xsweep.get_resolution_high(),
+                                dmax=xsweep.get_resolution_low(),
+                                polarization=xsweep.get_polarization(),
+                                user_lattice=xsweep.get_user_lattice(),
+                                user_cell=xsweep.get_user_cell(),
+                                epoch=xsweep._epoch,
+                                ice=xsweep._ice,
+                                excluded_regions=xsweep._excluded_regions,
+                            )
+                            logger.info(
+                                "Generating new sweep: %s (%s:%i:%i)",
+                                new_sweep.get_name(),
+                                new_sweep.get_image(),
+                                new_sweep.get_frames_to_process()[0],
+                                new_sweep.get_frames_to_process()[1],
+                            )
+                    return
+
         self.set_indexer_payload("spot_lists", spot_lists)
         self.set_indexer_payload("experiments", experiments_filenames)
 
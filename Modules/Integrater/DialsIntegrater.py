@@ -13,6 +13,7 @@ from xia2.Handlers.Files import FileHandler
 from xia2.Handlers.Phil import PhilIndex
 from xia2.lib.bits import auto_logfiler
 from xia2.lib.SymmetryLib import lattice_to_spacegroup
+from xia2.Modules import MtzUtils
 from xia2.Schema.Interfaces.Integrater import Integrater
 from xia2.Wrappers.Dials.anvil_correction import anvil_correction as _anvil_correction
 from xia2.Wrappers.Dials.ExportMtz import ExportMtz as _ExportMtz
@@ -352,29 +353,20 @@ class DialsIntegrater(Integrater):
                 f"{pname} {xname} {dname} {sweep} INTEGRATE", mtz_filename
             )
 
-            from iotbx.reflection_file_reader import any_reflection_file
-
-            miller_arrays = any_reflection_file(
-                self._intgr_integrated_filename
-            ).as_miller_arrays()
-            # look for profile-fitted intensities
-            intensities = [
-                ma for ma in miller_arrays if ma.info().labels == ["IPR", "SIGIPR"]
-            ]
-            if len(intensities) == 0:
-                # look instead for summation-integrated intensities
-                intensities = [
-                    ma for ma in miller_arrays if ma.info().labels == ["I", "SIGI"]
-                ]
-                assert len(intensities)
-            self._intgr_n_ref = intensities[0].size()
-
             if not os.path.isfile(self._intgr_integrated_filename):
                 raise RuntimeError(
                     "dials.export failed: %s does not exist."
                     % self._intgr_integrated_filename
                 )
 
+            # count the reflections from the header alone: dials.export only
+            # writes reflections with every kind of intensity requested, so
+            # the profile-fitted (or summation) intensities of every
+            # reflection are present
+            header = MtzUtils.read_mtz_header(self._intgr_integrated_filename)
+            assert set(header.column_labels).intersection(("IPR", "I"))
+            self._intgr_n_ref = header.n_reflections
+
             if (
                 self._intgr_reindex_operator is None
                 and self._intgr_spacegroup_number
@@ -1,11 +1,170 @@
+import collections
+import os
+import struct
+
 import iotbx.mtz
 from cctbx import sgtbx
 from xia2.lib.SymmetryLib import clean_reindex_operator
 
+# MTZ files are made up of 80 character records: the header follows the
+# reflection data, and is followed in turn by the history and the headers
+# of the batches (orientation blocks)
+_record_length = 80
+
+# headers already read by this process, keyed on the path, size and
+# modification time of the file
+_header_cache = {}
+
+MtzDataset = collections.namedtuple(
+    "MtzDataset", ["project", "crystal", "dataset", "id", "cell", "wavelength"]
+)
+
+
+class MtzHeader:
+    """The metadata recorded in the header of an MTZ file: the symmetry,
+    columns, datasets (other than HKL_base) and batches, without any of the
+    reflection data."""
+
+    def __init__(self):
+        self.title = ""
+        self.n_reflections = 0
+        self.cell = None
+        self.space_group_name = None
+        self.space_group_number = None
+        self.symmetry_operators = []
+        # (d_max, d_min)
+        self.resolution_range = (0, 0)
+        self.column_labels = []
+        self.column_types = []
+        self.datasets = []
+        self.batches = []
+
+    def space_group(self):
+        space_group = sgtbx.space_group()
+        for operator in self.symmetry_operators:
+            space_group.expand_smx(sgtbx.rt_mx(operator))
+        return space_group
+
+    def columns(self):
+        return list(zip(self.column_labels, self.column_types))
+
+
+def _read_records(fh):
+    while True:
+        record = fh.read(_record_length)
+        if len(record) < _record_length:
+            return
+        yield record.decode("latin-1")
+
+
+def _parse_header(fh, file_name):
+    header = MtzHeader()
+
+    stamp = fh.read(20)
+    if len(stamp) < 20 or stamp[:4] != b"MTZ ":
+        raise RuntimeError("%s is not an MTZ file" % file_name)
+
+    # the integer format is in the high nibble of the second byte of the
+    # machine stamp: 4 for little endian, 1 for big endian
+    endian = "<" if stamp[9] >> 4 == 4 else ">"
+    (position,) = struct.unpack(endian + "i", stamp[4:8])
+    if position == -1:
+        # larger files give the position as a 64 bit integer
+        (position,) = struct.unpack(endian + "q", stamp[12:20])
+    fh.seek((position - 1) * 4)
+
+    crystals = {}
+    projects = {}
+    datasets = {}
+    records = _read_records(fh)
+
+    for record in records:
+        keyword = record[:4]
+        if keyword == "END ":
+            break
+        tokens = record.split()
+        if keyword == "TITL":
+            header.title = record[6:].strip()
+        elif keyword == "NCOL":
+            header.n_reflections = int(tokens[2])
+        elif keyword == "CELL":
+            header.cell = tuple(float(t) for t in tokens[1:7])
+        elif keyword == "SYMI":
+            header.space_group_number = int(tokens[4])
+            header.space_group_name = record.split("'")[1].strip()
+        elif keyword == "SYMM":
+            header.symmetry_operators.append(record[5:].strip())
+        elif keyword == "RESO":
+            # stored as 1/d^2, and as 0 for files with no reflections
+            header.resolution_range = tuple(
+                float(t) ** -0.5 if float(t) > 0 else -1.0 for t in tokens[1:3]
+            )
+        elif keyword == "COLU":
+            # as renamed by the CCP4 library
+            header.column_labels.append(tokens[1].replace("M/ISYM", "M_ISYM"))
+            header.column_types.append(tokens[2])
+        elif keyword == "PROJ":
+            projects[int(tokens[1])] = record.split(None, 2)[2].strip()
+        elif keyword == "CRYS":
+            crystals[int(tokens[1])] = record.split(None, 2)[2].strip()
+        elif keyword == "DATA":
+            datasets[int(tokens[1])] = {"dataset": record.split(None, 2)[2].strip()}
+        elif keyword == "DCEL":
+            datasets[int(tokens[1])]["cell"] = tuple(float(t) for t in tokens[2:8])
+        elif keyword == "DWAV":
+            datasets[int(tokens[1])]["wavelength"] = float(tokens[2])
+
+    # datasets are numbered from 0 within each crystal, as for iotbx.mtz
+    crystal_datasets = collections.Counter()
+    for dataset_id, dataset in datasets.items():
+        project = projects.get(dataset_id, "")
+        crystal = crystals.get(dataset_id, project)
+        if crystal == "HKL_base":
+            continue
+        header.datasets.append(
+            MtzDataset(
+                project,
+                crystal,
+                dataset["dataset"],
+                crystal_datasets[crystal],
+                dataset.get("cell", header.cell),
+                dataset.get("wavelength", 0.0),
+            )
+        )
+        crystal_datasets[crystal] += 1
+
+    # then the history and the batch headers, skipping over the orientation
+    # data of each batch
+    for record in records:
+        keyword = record[:4]
+        if keyword == "MTZH":
+            fh.seek(int(record.split()[1]) * _record_length, os.SEEK_CUR)
+        elif record.startswith("BH "):
+            batch, nwords = (int(t) for t in record.split()[1:3])
+            header.batches.append(batch)
+            fh.seek(_record_length + nwords * 4, os.SEEK_CUR)
+        elif keyword == "MTZE":
+            break
+
+    return header
+
+
+def read_mtz_header(file_name):
+    """Read the header of an MTZ file, returning an MtzHeader. This only
+    reads the header and batch headers at the end of the file, and the
+    result is kept for as long as the file is unchanged: it is shared
+    between callers, so must not be modified."""
+
+    st = os.stat(file_name)
+    key = (os.path.abspath(file_name), st.st_size, st.st_mtime_ns)
+    if key not in _header_cache:
+        with open(file_name, "rb") as fh:
+            _header_cache[key] = _parse_header(fh, file_name)
+    return _header_cache[key]
+
 
 def space_group_from_mtz(file_name):
-    mtz_obj = iotbx.mtz.object(file_name=file_name)
-    return mtz_obj.space_group()
+    return read_mtz_header(file_name).space_group()
 
 
 def space_group_name_from_mtz(file_name):
@@ -17,13 +176,11 @@ def space_group_number_from_mtz(file_name):
 
 
 def batches_from_mtz(file_name):
-    mtz_obj = iotbx.mtz.object(file_name=file_name)
-    return [batch.num() for batch in mtz_obj.batches()]
+    return list(read_mtz_header(file_name).batches)
 
 
 def nref_from_mtz(file_name):
-    mtz_obj = iotbx.mtz.object(file_name=file_name)
-    return mtz_obj.n_reflections()
+    return read_mtz_header(file_name).n_reflections
 
 
 def reindex(hklin, hklout, change_of_basis_op, space_group=None):
@@ -5,7 +5,7 @@
 import copy
 import os
 
-from iotbx import mtz
+from xia2.Modules.MtzUtils import read_mtz_header
 
 
 class Mtzdump:
@@ -31,47 +31,37 @@ class Mtzdump:
         self._hklin = hklin
 
     def dump(self):
-        """Actually obtain the contents of the mtz file header."""
+        """Actually obtain the contents of the mtz file header - only the
+        header is read, not the reflections."""
 
         assert self._hklin, self._hklin
         assert os.path.exists(self._hklin), self._hklin
 
-        mtz_obj = mtz.object(self._hklin)
+        header = read_mtz_header(self._hklin)
 
-        # work through the file acculumating the necessary information
+        # work through the header acculumating the necessary information
 
         self._header["datasets"] = []
         self._header["dataset_info"] = {}
 
-        self._batches = [batch.num() for batch in mtz_obj.batches()]
-        self._header["column_labels"] = [column.label() for column in mtz_obj.columns()]
-        self._header["column_types"] = [column.type() for column in mtz_obj.columns()]
-        self._resolution_range = mtz_obj.max_min_resolution()
+        self._batches = list(header.batches)
+        self._header["column_labels"] = list(header.column_labels)
+        self._header["column_types"] = list(header.column_types)
+        self._resolution_range = header.resolution_range
 
-        self._header["spacegroup"] = mtz_obj.space_group_name()
-        self._reflections = mtz_obj.n_reflections()
+        self._header["spacegroup"] = header.space_group_name
+        self._reflections = header.n_reflections
 
-        for crystal in mtz_obj.crystals():
-            if crystal.name() == "HKL_base":
-                continue
+        for dataset in header.datasets:
+            dataset_id = f"{dataset.project}/{dataset.crystal}/{dataset.dataset}"
 
-            pname = crystal.project_name()
-            xname = crystal.name()
-            cell = crystal.unit_cell().parameters()
+            assert dataset_id not in self._header["datasets"]
 
-            for dataset in crystal.datasets():
-                dname = dataset.name()
-                wavelength = dataset.wavelength()
-                dataset_id = f"{pname}/{xname}/{dname}"
-                dataset_number = dataset.i_dataset()
-
-                assert dataset_id not in self._header["datasets"]
-
-                self._header["datasets"].append(dataset_id)
-                self._header["dataset_info"][dataset_id] = {}
-                self._header["dataset_info"][dataset_id]["wavelength"] = wavelength
-                self._header["dataset_info"][dataset_id]["cell"] = cell
-                self._header["dataset_info"][dataset_id]["id"] = dataset_number
+            self._header["datasets"].append(dataset_id)
+            self._header["dataset_info"][dataset_id] = {}
+            self._header["dataset_info"][dataset_id]["wavelength"] = dataset.wavelength
+            self._header["dataset_info"][dataset_id]["cell"] = dataset.cell
+            self._header["dataset_info"][dataset_id]["id"] = dataset.id
 
     def get_columns(self):
         """Get a list of the columns and their types as tuples
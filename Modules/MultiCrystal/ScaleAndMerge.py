@@ -1,3 +1,4 @@
+import concurrent.futures
 import copy
 import logging
 import math
@@ -9,7 +10,7 @@ import iotbx.phil
 from cctbx import miller
 from cctbx import sgtbx
 from dxtbx.serialize import load
-from dxtbx.model import ExperimentList
+from dxtbx.model import Experiment, ExperimentList
 
 
 from dials.array_family import flex
@@ -185,13 +186,51 @@ symmetry.cosym.best_monoclinic_beta = False
 )
 
 
+def _copy_experiments(experiments):
+    """A new ExperimentList with copies of just the crystal and scan models,
+    which DataManager changes in place, sharing all of the other models with
+    experiments. The imagesets are copied too (their paths, not the images)
+    as each holds the scan to which _set_batches writes the batch offset."""
+    memo = {}
+    copies = ExperimentList()
+    for expt in experiments:
+        scan = copy.deepcopy(expt.scan, memo)
+        imageset = copy.deepcopy(expt.imageset, memo)
+        if scan is not None:
+            imageset.set_scan(scan)
+        copies.append(
+            Experiment(
+                imageset=imageset,
+                beam=expt.beam,
+                detector=expt.detector,
+                goniometer=expt.goniometer,
+                scan=scan,
+                crystal=copy.deepcopy(expt.crystal, memo),
+                profile=expt.profile,
+                scaling_model=expt.scaling_model,
+                identifier=expt.identifier,
+            )
+        )
+    return copies
+
+
 class DataManager:
+    """The experiments and reflections of a multi-crystal data set.
+
+    The reflection table is shared with the input, and with any copies made
+    with copy() or copy_selection(), until it has to be changed in place:
+    a copy is then taken by the DataManager making the change. A copy of a
+    selection holds the identifiers of the selected experiments, and only
+    selects their reflections from the shared table when they are needed."""
+
     def __init__(self, experiments, reflections):
         self._input_experiments = experiments
         self._input_reflections = reflections
 
-        self._experiments = copy.deepcopy(experiments)
-        self._reflections = copy.deepcopy(reflections)
+        self._experiments = _copy_experiments(experiments)
+        self._reflections = reflections
+        self._reflections_shared = True
+        self._view_identifiers = None
         self.ids_to_identifiers_map = dict(self._reflections.experiment_identifiers())
         self.identifiers_to_ids_map = {
             value: key for key, value in self.ids_to_identifiers_map.items()
@@ -199,6 +238,17 @@ class DataManager:
 
         self._set_batches()
 
+    def __getstate__(self):
+        # a copy of a selection is pickled (e.g. to scale it in another
+        # process) with just the selected reflections, not the shared table
+        state = self.__dict__.copy()
+        if self._view_identifiers is not None:
+            state["_reflections"] = self._select_view()
+            state["_input_reflections"] = state["_reflections"]
+            state["_view_identifiers"] = None
+        state["_reflections_shared"] = False
+        return state
+
     def _set_batches(self):
         max_batches = max(e.scan.get_image_range()[1] for e in self._experiments)
         max_batches += 10  # allow some head room
@@ -206,7 +256,7 @@ class DataManager:
         n = int(math.ceil(math.log10(max_batches)))
 
         for i, expt in enumerate(self._experiments):
-            expt.scan.set_batch_offset(i * 10 ** n)
+            expt.scan.set_batch_offset(i * 10**n)
             # This may be a different scan instance ¯\_(ツ)_/¯
             expt.imageset.get_scan().set_batch_offset(expt.scan.get_batch_offset())
             logger.debug(
@@ -223,11 +273,31 @@ class DataManager:
 
     @property
     def reflections(self):
+        if self._view_identifiers is not None:
+            self.reflections = self._select_view()
         return self._reflections
 
     @reflections.setter
     def reflections(self, reflections):
         self._reflections = reflections
+        self._reflections_shared = False
+        self._view_identifiers = None
+
+    def _select_view(self):
+        reflections = self._reflections.select_on_experiment_identifiers(
+            self._view_identifiers
+        )
+        reflections.reset_ids()
+        reflections.assert_experiment_identifiers_are_consistent(self._experiments)
+        return reflections
+
+    def _writable_reflections(self):
+        """The reflections, copied first if shared with another DataManager
+        or the input, for changing in place."""
+        reflections = self.reflections
+        if self._reflections_shared:
+            self.reflections = reflections = copy.deepcopy(reflections)
+        return reflections
 
     def select(self, experiment_identifiers):
         self._experiments = ExperimentList(
@@ -243,6 +313,41 @@ class DataManager:
         self.reflections.reset_ids()
         self.reflections.assert_experiment_identifiers_are_consistent(self.experiments)
 
+    def copy(self):
+        """A new DataManager with copies of the experiments, sharing the
+        reflections with this one until either changes them in place."""
+        return self._copy(self._experiments)
+
+    def copy_selection(self, experiment_identifiers):
+        """A new DataManager for just the selected experiments, equivalent to
+        copy() followed by select() but without copying any reflections: they
+        are selected from the reflections of this DataManager when needed."""
+        data_manager = self._copy(
+            [
+                expt
+                for expt in self._experiments
+                if expt.identifier in experiment_identifiers
+            ]
+        )
+        if self._view_identifiers is not None:
+            data_manager._view_identifiers = [
+                i for i in self._view_identifiers if i in experiment_identifiers
+            ]
+        else:
+            data_manager._view_identifiers = list(experiment_identifiers)
+        return data_manager
+
+    def _copy(self, experiments):
+        # not copy.copy(), which would pickle the state of a view
+        data_manager = DataManager.__new__(DataManager)
+        data_manager.__dict__.update(self.__dict__)
+        data_manager._experiments = _copy_experiments(experiments)
+        data_manager._input_experiments = data_manager._experiments
+        data_manager.ids_to_identifiers_map = dict(self.ids_to_identifiers_map)
+        data_manager.identifiers_to_ids_map = dict(self.identifiers_to_ids_map)
+        self._reflections_shared = data_manager._reflections_shared = True
+        return data_manager
+
     def filter_dose(self, dose_min, dose_max):
         from dials.command_line.slice_sequence import (
             slice_experiments,
@@ -256,10 +361,10 @@ class DataManager:
             )
             for expt in self._experiments
         ]
-        n_refl_before = self._reflections.size()
+        n_refl_before = self.reflections.size()
         self._experiments = slice_experiments(self._experiments, image_range)
-        flex.min_max_mean_double(self._reflections["xyzobs.px.value"].parts()[2]).show()
-        self._reflections = slice_reflections(self._reflections, image_range)
+        flex.min_max_mean_double(self.reflections["xyzobs.px.value"].parts()[2]).show()
+        self.reflections = slice_reflections(self.reflections, image_range)
         flex.min_max_mean_double(self._reflections["xyzobs.px.value"].parts()[2]).show()
         logger.info(
             "%i reflections out of %i remaining after filtering for dose"
@@ -275,10 +380,11 @@ class DataManager:
         from dials.report.analysis import scaled_data_as_miller_array
 
         # offsets = calculate_batch_offsets(experiments)
+        all_reflections = self.reflections
         reflection_tables = []
-        for id_ in set(self._reflections["id"]).difference({-1}):
+        for id_ in set(all_reflections["id"]).difference({-1}):
             reflection_tables.append(
-                self._reflections.select(self._reflections["id"] == id_)
+                all_reflections.select(all_reflections["id"] == id_)
             )
 
         offsets = [expt.scan.get_batch_offset() for expt in self._experiments]
@@ -317,9 +423,8 @@ class DataManager:
 
     def reindex(self, cb_op, space_group=None):
         logger.info("Reindexing: %s" % cb_op)
-        self._reflections["miller_index"] = cb_op.apply(
-            self._reflections["miller_index"]
-        )
+        reflections = self._writable_reflections()
+        reflections["miller_index"] = cb_op.apply(reflections["miller_index"])
 
         for expt in self._experiments:
             cryst_reindexed = expt.crystal.change_basis(cb_op)
@@ -328,7 +433,7 @@ class DataManager:
             expt.crystal.update(cryst_reindexed)
 
     def export_reflections(self, filename, d_min=None):
-        reflections = self._reflections
+        reflections = self.reflections
         if d_min:
             reflections = reflections.select(reflections["d"] >= d_min)
         reflections.as_file(filename)
@@ -343,15 +448,13 @@ class DataManager:
         params.mtz.d_min = d_min
         params.mtz.hklout = filename
         params.intensity = ["scale"]
-        export.export_mtz(params, self._experiments, [self._reflections])
+        export.export_mtz(params, self._experiments, [self.reflections])
 
     def export_merged_mtz(self, filename, d_min=None):
         params = merge.phil_scope.extract()
         params.d_min = d_min
         params.assess_space_group = False
-        mtz_obj = merge.merge_data_to_mtz(
-            params, self._experiments, [self._reflections]
-        )
+        mtz_obj = merge.merge_data_to_mtz(params, self._experiments, [self.reflections])
         mtz_obj.write(filename)
 
 
@@ -456,9 +559,9 @@ class MultiCrystalScale:
         if max_clusters or min_completeness is not None or min_multiplicity is not None:
             self._data_manager_original = self._data_manager
             cwd = os.path.abspath(os.getcwd())
-            n_processed = 0
+            tasks = []
             for cluster in reversed(clusters):
-                if max_clusters is not None and n_processed == max_clusters:
+                if max_clusters is not None and len(tasks) == max_clusters:
                     break
                 if (
                     min_completeness is not None
@@ -472,35 +575,27 @@ class MultiCrystalScale:
                     continue
                 if len(cluster.labels) == len(self._data_manager_original.experiments):
                     continue
-                n_processed += 1
 
                 logger.info("Scaling cluster %i:" % cluster.cluster_id)
                 logger.info(cluster)
-                cluster_dir = "cluster_%i" % cluster.cluster_id
-                if not os.path.exists(cluster_dir):
-                    os.mkdir(cluster_dir)
-                os.chdir(cluster_dir)
-                data_manager = copy.deepcopy(self._data_manager_original)
+                cluster_dir = os.path.join(cwd, "cluster_%i" % cluster.cluster_id)
                 cluster_identifiers = [
                     self._data_manager.ids_to_identifiers_map[l] for l in cluster.labels
                 ]
-                data_manager.select(cluster_identifiers)
-                scaled = Scale(data_manager, self._params)
-
-                data_manager.export_unmerged_mtz(
-                    "scaled_unmerged.mtz", d_min=scaled.d_min
+                tasks.append(
+                    (
+                        self._data_manager_original.copy_selection(cluster_identifiers),
+                        cluster_dir,
+                    )
                 )
-                data_manager.export_merged_mtz("scaled.mtz", d_min=scaled.d_min)
-                data_manager.export_experiments("scaled.expt")
-                data_manager.export_reflections("scaled.refl", d_min=scaled.d_min)
 
-                self._record_individual_report(
-                    data_manager, scaled.report(), cluster_dir.replace("_", " ")
+            for cluster_dir, report_d in self._scale_clusters(tasks):
+                self._record_individual_report_dict(
+                    report_d, os.path.basename(cluster_dir).replace("_", " ")
                 )
-                os.chdir(cwd)
         if self._params.filtering.method:
             # Final round of scaling, this time filtering out any bad datasets
-            data_manager = copy.deepcopy(self._data_manager)
+            data_manager = self._data_manager.copy()
             params = copy.deepcopy(self._params)
             params.unit_cell.refine = []
             params.resolution.d_min = self._params.resolution.d_min
@@ -521,9 +616,37 @@ class MultiCrystalScale:
 
         self.report()
 
+    def _scale_clusters(self, tasks):
+        """Scale each of the clusters in tasks, a list of (data_manager,
+        working_directory) pairs, on a pool of up to nproc processes, dividing
+        the processors between the jobs running at once. Returns a list of
+        (working_directory, report dictionary) in the same order as tasks."""
+        if not tasks:
+            return []
+        n_workers = max(1, min(self._params.nproc, len(tasks)))
+        nproc = max(1, self._params.nproc // n_workers)
+        if n_workers == 1:
+            return [
+                _scale_cluster(data_manager, self._params, working_directory, nproc)
+                for data_manager, working_directory in tasks
+            ]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [
+                pool.submit(
+                    _scale_cluster,
+                    data_manager,
+                    self._params,
+                    working_directory,
+                    nproc,
+                )
+                for data_manager, working_directory in tasks
+            ]
+            return [future.result() for future in futures]
+
     def _record_individual_report(self, data_manager, report, cluster_name):
-        d = self._report_as_dict(report)
+        self._record_individual_report_dict(self._report_as_dict(report), cluster_name)
 
+    def _record_individual_report_dict(self, d, cluster_name):
         self._individual_report_dicts[cluster_name] = self._individual_report_dict(
             d, cluster_name
         )
@@ -571,7 +694,7 @@ class MultiCrystalScale:
         )
 
     @staticmethod
-    def _report_as_dict(report):
+    def _report_as_dict(report, dest_path=None):
         (
             overall_stats_table,
             merging_stats_table,
@@ -615,7 +738,7 @@ class MultiCrystalScale:
                     if "text" in data:
                         data["text"] = list(flex.std_string(data["text"]).select(sel))
 
-        d.update(report.multiplicity_plots())
+        d.update(report.multiplicity_plots(dest_path=dest_path))
         return d
 
     @staticmethod
@@ -850,13 +973,18 @@ class MultiCrystalScale:
 
 
 class Scale:
-    def __init__(self, data_manager, params, filtering=False):
+    def __init__(self, data_manager, params, filtering=False, working_directory=None):
         self._data_manager = data_manager
         self._params = params
         self._filtering = filtering
+        self._working_directory = working_directory or os.getcwd()
 
-        self._experiments_filename = "models.expt"
-        self._reflections_filename = "observations.refl"
+        self._experiments_filename = os.path.join(
+            self._working_directory, "models.expt"
+        )
+        self._reflections_filename = os.path.join(
+            self._working_directory, "observations.refl"
+        )
         self._data_manager.export_experiments(self._experiments_filename)
         self._data_manager.export_reflections(self._reflections_filename)
 
@@ -876,7 +1004,9 @@ class Scale:
     def refine(self):
         # refine in correct bravais setting
         self._experiments_filename, self._reflections_filename = self._dials_refine(
-            self._experiments_filename, self._reflections_filename
+            self._experiments_filename,
+            self._reflections_filename,
+            working_directory=self._working_directory,
         )
         self._data_manager.experiments = load.experiment_list(
             self._experiments_filename, check_format=False
@@ -891,6 +1021,7 @@ class Scale:
             self._experiments_filename,
             self._reflections_filename,
             combine_crystal_models=self._params.two_theta_refine.combine_crystal_models,
+            working_directory=self._working_directory,
         )
         self._data_manager.experiments = load.experiment_list(
             self._experiments_filename, check_format=False
@@ -909,8 +1040,12 @@ class Scale:
         return self._data_manager
 
     @staticmethod
-    def _dials_refine(experiments_filename, reflections_filename):
+    def _dials_refine(
+        experiments_filename, reflections_filename, working_directory=None
+    ):
         refiner = Refine()
+        if working_directory:
+            refiner.set_working_directory(working_directory)
         auto_logfiler(refiner)
         refiner.set_experiments_filename(experiments_filename)
         refiner.set_indexed_filename(reflections_filename)
@@ -922,9 +1057,14 @@ class Scale:
 
     @staticmethod
     def _dials_two_theta_refine(
-        experiments_filename, reflections_filename, combine_crystal_models=True
+        experiments_filename,
+        reflections_filename,
+        combine_crystal_models=True,
+        working_directory=None,
     ):
         tt_refiner = TwoThetaRefine()
+        if working_directory:
+            tt_refiner.set_working_directory(working_directory)
         auto_logfiler(tt_refiner)
         tt_refiner.set_experiments([experiments_filename])
         tt_refiner.set_reflection_files([reflections_filename])
@@ -935,6 +1075,7 @@ class Scale:
     def scale(self, d_min=None, d_max=None):
         logger.debug("Scaling with dials.scale")
         scaler = DialsScale()
+        scaler.set_working_directory(self._working_directory)
         auto_logfiler(scaler)
         scaler.add_experiments_json(self._experiments_filename)
         scaler.add_reflections_file(self._reflections_filename)
@@ -1016,6 +1157,7 @@ class Scale:
         # see also xia2/Modules/Scaler/CommonScaler.py: CommonScaler._estimate_resolution_limit()
         params = self._params.resolution
         m = EstimateResolution()
+        m.set_working_directory(self._working_directory)
         auto_logfiler(m)
         # use the scaled .refl and .expt file
         if self._experiments_filename and self._reflections_filename:
@@ -1084,3 +1226,32 @@ class Scale:
         params.d_min = self.d_min
         report = Report.Report.from_data_manager(self._data_manager, params=params)
         return report
+
+
+def _scale_cluster(data_manager, params, working_directory, nproc):
+    """Scale a single cluster of data sets in working_directory using up to
+    nproc processors, exporting the scaled data there; returns the working
+    directory with the report as a dictionary. This does not depend on the
+    current working directory, so may be run in a separate process."""
+    if not os.path.exists(working_directory):
+        os.mkdir(working_directory)
+    params = copy.deepcopy(params)
+    params.nproc = nproc
+    PhilIndex.params.xia2.settings.multiprocessing.nproc = nproc
+
+    scaled = Scale(data_manager, params, working_directory=working_directory)
+
+    data_manager.export_unmerged_mtz(
+        os.path.join(working_directory, "scaled_unmerged.mtz"), d_min=scaled.d_min
+    )
+    data_manager.export_merged_mtz(
+        os.path.join(working_directory, "scaled.mtz"), d_min=scaled.d_min
+    )
+    data_manager.export_experiments(os.path.join(working_directory, "scaled.expt"))
+    data_manager.export_reflections(
+        os.path.join(working_directory, "scaled.refl"), d_min=scaled.d_min
+    )
+    return (
+        working_directory,
+        MultiCrystalScale._report_as_dict(scaled.report(), dest_path=working_directory),
+    )
@@ -1,9 +1,11 @@
 import copy
+import functools
 import json
 import logging
 from collections import OrderedDict
 
 import iotbx.phil
+import numpy as np
 from scipy.cluster import hierarchy
 from scitbx.array_family import flex
 
@@ -35,6 +37,9 @@ d_min = None
     % batch_phil_scope
 )
 
+# the number of bits set in each possible byte value
+_popcount = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
 
 class ClusterInfo:
     def __init__(
@@ -66,6 +71,8 @@ class multi_crystal_analysis:
         self.unmerged_intensities = unmerged_intensities
         self._intensities_all = None
         self._labels_all = flex.size_t()
+        self._dataset_bitmaps = None
+        self._n_complete_cache = {}
         if prefix is None:
             prefix = ""
         self._prefix = prefix
@@ -135,29 +142,119 @@ class multi_crystal_analysis:
             )
         )
 
+    def _dataset_reflections(self):
+        """Summarise the reflections of each dataset once, for the statistics
+        of all of the clusters: a bitmap of the unique reflections (over the
+        unique reflections of all datasets, in the asymmetric unit of the
+        combined data), the number of observations and the observation at
+        the highest resolution."""
+
+        if self._dataset_bitmaps is not None:
+            return
+
+        asu = self._intensities_all.map_to_asu()
+        hkl = asu.indices().as_vec3_double().as_numpy_array().astype(np.int64)
+        hkl -= hkl.min(axis=0)
+        span = hkl.max(axis=0) + 1
+        packed = (hkl[:, 0] * span[1] + hkl[:, 1]) * span[2] + hkl[:, 2]
+        unique, reflection_ids = np.unique(packed, return_inverse=True)
+        reflection_ids = reflection_ids.ravel()
+
+        n_datasets = len(self.intensities)
+        labels = self._labels_all.as_numpy_array().astype(np.int64)
+        order = np.argsort(labels, kind="stable")
+        self._dataset_n_obs = np.bincount(labels, minlength=n_datasets)
+        ends = np.cumsum(self._dataset_n_obs)
+        d_star_sq = self._intensities_all.d_star_sq().data().as_numpy_array()
+
+        self._dataset_bitmaps = []
+        self._dataset_highest = []
+        for start, end in zip(ends - self._dataset_n_obs, ends):
+            selection = order[start:end]
+            present = np.zeros(unique.size, dtype=bool)
+            present[reflection_ids[selection]] = True
+            self._dataset_bitmaps.append(np.packbits(present))
+            if selection.size:
+                highest = selection[np.argmax(d_star_sq[selection])]
+                self._dataset_highest.append((d_star_sq[highest], int(highest)))
+            else:
+                self._dataset_highest.append(None)
+
+    def _n_complete(self, i_obs):
+        """The size of the complete set out to the resolution of observation
+        i_obs, as for completeness() of the merged data."""
+
+        if i_obs not in self._n_complete_cache:
+            self._n_complete_cache[i_obs] = (
+                self._intensities_all.select(flex.size_t([i_obs])).complete_set().size()
+            )
+        return self._n_complete_cache[i_obs]
+
     def cluster_info(self, cluster_dict):
+        """Summarise each of the clusters in cluster_dict. The clusters of
+        a dendrogram nest, so they are worked through from the smallest up,
+        the unique reflections of each being the union of those of the
+        largest clusters (or datasets) within it - the multiplicity and
+        completeness then follow from the numbers of unique reflections and
+        observations, without merging the data for each cluster."""
+
+        self._dataset_reflections()
+        unit_cells = np.array([i.unit_cell().parameters() for i in self.intensities])
+
+        members = {
+            cluster_id: frozenset(cluster["datasets"])
+            for cluster_id, cluster in cluster_dict.items()
+        }
+
+        # the largest cluster so far containing each dataset
+        owner = {}
+        bitmaps = {}
+        stats = {}
+        for cluster_id in sorted(members, key=lambda c: len(members[c])):
+            cluster = members[cluster_id]
+            parts = set()
+            for j in cluster:
+                c = owner.get(j)
+                if c is not None and members[c] <= cluster:
+                    parts.add(("cluster", c))
+                else:
+                    parts.add(("dataset", j))
+            bitmap = functools.reduce(
+                np.bitwise_or,
+                (
+                    bitmaps.pop(key)
+                    if kind == "cluster"
+                    else self._dataset_bitmaps[key - 1]
+                    for kind, key in sorted(parts)
+                ),
+            )
+            bitmaps[cluster_id] = bitmap
+            for j in cluster:
+                owner[j] = cluster_id
+
+            n_unique = int(_popcount[bitmap].sum())
+            n_obs = int(sum(self._dataset_n_obs[j - 1] for j in cluster))
+            highest = [self._dataset_highest[j - 1] for j in cluster]
+            highest = [h for h in highest if h is not None]
+            if highest:
+                n_complete = self._n_complete(max(highest)[1])
+                completeness = min(n_unique / max(1, n_complete), 1.0)
+            else:
+                completeness = 0.0
+            stats[cluster_id] = (n_obs / max(1, n_unique), completeness)
+
         info = []
         for cluster_id, cluster in cluster_dict.items():
-            sel_cluster = flex.bool(self._labels_all.size(), False)
-            uc_params = [flex.double() for i in range(6)]
-            for j in cluster["datasets"]:
-                sel_cluster |= self._labels_all == j
-                uc_j = self.intensities[j - 1].unit_cell().parameters()
-                for i in range(6):
-                    uc_params[i].append(uc_j[i])
-            average_uc = [flex.mean(uc_params[i]) for i in range(6)]
-            intensities_cluster = self._intensities_all.select(sel_cluster)
-            merging = intensities_cluster.merge_equivalents()
-            merged_intensities = merging.array()
-            multiplicities = merging.redundancies()
             dataset_ids = cluster["datasets"]
+            average_uc = list(unit_cells[[j - 1 for j in dataset_ids]].mean(axis=0))
+            multiplicity, completeness = stats[cluster_id]
             labels = [self.labels[i - 1] for i in dataset_ids]
             info.append(
                 ClusterInfo(
                     cluster_id,
                     labels,
-                    flex.mean(multiplicities.data().as_double()),
-                    merged_intensities.completeness(),
+                    multiplicity,
+                    completeness,
                     unit_cell=average_uc,
                     height=cluster.get("height"),
                 )
@@ -0,0 +1,137 @@
+import pytest
+from cctbx import sgtbx
+from dials.array_family import flex
+from dxtbx.imageset import ImageSetFactory
+from dxtbx.model import (
+    BeamFactory,
+    Crystal,
+    DetectorFactory,
+    Experiment,
+    ExperimentList,
+    GoniometerFactory,
+    ScanFactory,
+)
+
+from xia2.Modules.MultiCrystal.ScaleAndMerge import DataManager
+
+
+@pytest.fixture
+def data():
+    beam = BeamFactory.simple(wavelength=1)
+    detector = DetectorFactory.simple(
+        sensor="PAD",
+        distance=100,
+        beam_centre=(50, 50),
+        fast_direction="+x",
+        slow_direction="-y",
+        pixel_size=(0.1, 0.1),
+        image_size=(1000, 1000),
+    )
+    goniometer = GoniometerFactory.known_axis((1, 0, 0))
+
+    experiments = ExperimentList()
+    reflections = flex.reflection_table()
+    for i in range(3):
+        scan = ScanFactory.make_scan(
+            image_range=(1, 10),
+            exposure_times=0.1,
+            oscillation=(0, 1),
+            epochs=list(range(10)),
+            deg=True,
+        )
+        imageset = ImageSetFactory.make_sequence(
+            "crystal_%i_#####.cbf" % i,
+            list(range(1, 11)),
+            beam=beam,
+            detector=detector,
+            goniometer=goniometer,
+            scan=scan,
+            check_format=False,
+        )
+        experiments.append(
+            Experiment(
+                imageset=imageset,
+                beam=beam,
+                detector=detector,
+                goniometer=goniometer,
+                scan=scan,
+                crystal=Crystal(
+                    (50, 0, 0), (0, 60, 0), (0, 0, 70), space_group_symbol="P 1"
+                ),
+                identifier=str(i),
+            )
+        )
+        table = flex.reflection_table()
+        table["miller_index"] = flex.miller_index([(i, j, 1) for j in range(5)])
+        table["id"] = flex.int(5, i)
+        reflections.extend(table)
+    for i in range(3):
+        reflections.experiment_identifiers()[i] = str(i)
+    return experiments, reflections
+
+
+def test_data_manager_leaves_input_unchanged(data):
+    experiments, reflections = data
+    miller_indices = list(reflections["miller_index"])
+
+    data_manager = DataManager(experiments, reflections)
+    offsets = [e.scan.get_batch_offset() for e in data_manager.experiments]
+    assert offsets == [0, 100, 200]
+
+    # neither the scans of the input nor those of its imagesets are changed
+    assert [e.scan.get_batch_offset() for e in experiments] == [0, 0, 0]
+    offsets = [e.imageset.get_scan().get_batch_offset() for e in experiments]
+    assert offsets == [0, 0, 0]
+
+    data_manager.reindex(sgtbx.change_of_basis_op("-h,-k,l"))
+    assert list(reflections["miller_index"]) == miller_indices
+    assert data_manager.reflections["miller_index"][6] == (-1, -1, 1)
+
+
+def test_data_manager_copy_is_copied_on_write(data):
+    experiments, reflections = data
+    miller_indices = list(reflections["miller_index"])
+
+    parent = DataManager(experiments, reflections)
+    child = parent.copy()
+    assert child.reflections is parent.reflections
+
+    child.reindex(sgtbx.change_of_basis_op("-h,-k,l"))
+    assert child.reflections is not parent.reflections
+    assert list(parent.reflections["miller_index"]) == miller_indices
+    assert list(reflections["miller_index"]) == miller_indices
+    assert child.reflections["miller_index"][6] == (-1, -1, 1)
+
+
+def test_data_manager_copy_selection(data):
+    experiments, reflections = data
+
+    parent = DataManager(experiments, reflections)
+    view = parent.copy_selection(["0", "2"])
+    assert [e.identifier for e in view.experiments] == ["0", "2"]
+    assert view.reflections.size() == 10
+    assert set(view.reflections["id"]) == {0, 1}
+    assert list(view.reflections.experiment_identifiers().values()) == ["0", "2"]
+    assert view.reflections["miller_index"][5] == (2, 0, 1)
+    assert parent.reflections.size() == 15
+
+    # a selection of a selection
+    view2 = view.copy_selection(["2"])
+    assert view2.reflections.size() == 5
+    assert {hkl[0] for hkl in view2.reflections["miller_index"]} == {2}
+
+
+def test_data_manager_pickled_view(data):
+    experiments, reflections = data
+
+    parent = DataManager(experiments, reflections)
+    view = parent.copy_selection(["1"])
+    state = view.__getstate__()
+    assert state["_view_identifiers"] is None
+    assert state["_reflections"].size() == 5
+    assert state["_input_reflections"] is state["_reflections"]
+    assert set(state["_reflections"]["id"]) == {0}
+    assert list(state["_reflections"].experiment_identifiers().values()) == ["1"]
+
+    # the view itself still shares the whole table
+    assert view._reflections is reflections
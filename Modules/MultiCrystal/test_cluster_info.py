@@ -0,0 +1,92 @@
+import random
+
+import pytest
+from cctbx import crystal, miller
+from cctbx.array_family import flex
+from scipy.cluster import hierarchy
+
+from xia2.Modules.MultiCrystal import multi_crystal_analysis
+
+
+def _datasets(n_datasets, anomalous_flag):
+    random.seed(42)
+    symmetry = crystal.symmetry(
+        unit_cell=(50, 60, 70, 90, 90, 90), space_group_symbol="P 21 21 21"
+    )
+    complete_set = miller.build_set(symmetry, anomalous_flag, d_min=3)
+    space_group = symmetry.space_group()
+    intensities = []
+    for _ in range(n_datasets):
+        # a random part of the complete set to a random resolution, with
+        # repeated observations of symmetry equivalents outside of the
+        # asymmetric unit
+        d_min = random.uniform(3, 5)
+        indices = flex.miller_index()
+        for hkl in complete_set.resolution_filter(d_min=d_min).indices():
+            for _ in range(random.choice((0, 0, 1, 2, 3))):
+                equivalents = miller.sym_equiv_indices(space_group, hkl)
+                indices.append(random.choice(equivalents.indices()).h())
+        uc = [p * random.uniform(0.99, 1.01) for p in (50, 60, 70)] + [90] * 3
+        intensities.append(
+            miller.array(
+                miller.set(
+                    crystal.symmetry(unit_cell=uc, space_group=space_group),
+                    indices,
+                    anomalous_flag=anomalous_flag,
+                ),
+                data=flex.random_double(indices.size()),
+                sigmas=flex.double(indices.size(), 1),
+            )
+        )
+    return intensities
+
+
+def _analysis(intensities):
+    # just the parts of the analysis needed for cluster_info(), without
+    # running cosym and clustering the datasets
+    analysis = multi_crystal_analysis.__new__(multi_crystal_analysis)
+    analysis.intensities = intensities
+    analysis.labels = ["%i" % (i + 1) for i in range(len(intensities))]
+    analysis._intensities_all = intensities[0].deep_copy()
+    analysis._labels_all = flex.size_t(intensities[0].size(), 0)
+    for i, unmerged in enumerate(intensities[1:], start=1):
+        analysis._intensities_all = analysis._intensities_all.concatenate(
+            unmerged, assert_is_similar_symmetry=False
+        )
+        analysis._labels_all.extend(flex.size_t(unmerged.size(), i))
+    analysis._dataset_bitmaps = None
+    analysis._n_complete_cache = {}
+    return analysis
+
+
+@pytest.mark.parametrize("anomalous_flag", [False, True])
+def test_cluster_info(anomalous_flag):
+    intensities = _datasets(12, anomalous_flag)
+    analysis = _analysis(intensities)
+
+    random.seed(0)
+    points = [[random.random(), random.random()] for _ in intensities]
+    cluster_dict = analysis.linkage_matrix_to_dict(
+        hierarchy.linkage(points, method="average")
+    )
+    info = analysis.cluster_info(cluster_dict)
+    assert [c.cluster_id for c in info] == list(cluster_dict)
+
+    # the same as merging the data of each cluster in turn
+    for cluster, (cluster_id, c) in zip(info, cluster_dict.items()):
+        sel = flex.bool(analysis._labels_all.size(), False)
+        for j in c["datasets"]:
+            sel |= analysis._labels_all == j - 1
+        merging = analysis._intensities_all.select(sel).merge_equivalents()
+        assert cluster.multiplicity == pytest.approx(
+            flex.mean(merging.redundancies().data().as_double())
+        )
+        assert cluster.completeness == pytest.approx(merging.array().completeness())
+        assert cluster.labels == ["%i" % j for j in c["datasets"]]
+        unit_cells = [
+            intensities[j - 1].unit_cell().parameters() for j in c["datasets"]
+        ]
+        assert cluster.unit_cell == pytest.approx(
+            [sum(p) / len(p) for p in zip(*unit_cells)]
+        )
+        assert cluster.height == c["height"]
@@ -983,11 +983,15 @@ class CommonScaler(Scaler):
         result, select_result, anom_result, select_anom_result = None, None, None, None
         n_bins = PhilIndex.params.xia2.settings.merging_statistics.n_bins
 
+        # read the unmerged data once, for all of the views below and for
+        # any retries with fewer bins
+        i_obs = self._load_merging_statistics_data(scaled_unmerged_mtz)
+
         while result is None:
             try:
 
                 result = self._iotbx_merging_statistics(
-                    scaled_unmerged_mtz, anomalous=False, n_bins=n_bins
+                    scaled_unmerged_mtz, anomalous=False, n_bins=n_bins, i_obs=i_obs
                 )
                 result.as_json(file_name=str(merging_stats_json))
                 with open(str(merging_stats_file), "w") as fh:
@@ -1001,6 +1005,7 @@ class CommonScaler(Scaler):
                         d_min=selected_band[0],
                         d_max=selected_band[1],
                         n_bins=n_bins,
+                        i_obs=i_obs,
                     )
 
                 if sg.is_centric():
@@ -1008,7 +1013,7 @@ class CommonScaler(Scaler):
                     anom_key_to_var = {}
                 else:
                     anom_result = self._iotbx_merging_statistics(
-                        scaled_unmerged_mtz, anomalous=True, n_bins=n_bins
+                        scaled_unmerged_mtz, anomalous=True, n_bins=n_bins, i_obs=i_obs
                     )
                     anom_probability_plot = (
                         anom_result.overall.anom_probability_plot_expected_delta
@@ -1026,6 +1031,7 @@ class CommonScaler(Scaler):
                             d_min=selected_band[0],
                             d_max=selected_band[1],
                             n_bins=n_bins,
+                            i_obs=i_obs,
                         )
 
             except iotbx.merging_statistics.StatisticsError:
@@ -1062,14 +1068,32 @@ class CommonScaler(Scaler):
 
         return stats
 
-    def _iotbx_merging_statistics(
-        self, scaled_unmerged_mtz, anomalous=False, d_min=None, d_max=None, n_bins=None
-    ):
+    def _load_merging_statistics_data(self, scaled_unmerged_mtz):
+        """Read the unmerged intensities from scaled_unmerged_mtz, ready to
+        be passed to _iotbx_merging_statistics() any number of times: the
+        systematic absences are removed here rather than for every view."""
         params = PhilIndex.params.xia2.settings.merging_statistics
         i_obs = iotbx.merging_statistics.select_data(
             scaled_unmerged_mtz, data_labels=None
         )
-        i_obs = i_obs.customized_copy(anomalous_flag=True, info=i_obs.info())
+        info = i_obs.info()
+        i_obs = i_obs.customized_copy(anomalous_flag=True, info=info)
+        if params.eliminate_sys_absent:
+            i_obs = i_obs.eliminate_sys_absent().set_info(info)
+        return i_obs
+
+    def _iotbx_merging_statistics(
+        self,
+        scaled_unmerged_mtz,
+        anomalous=False,
+        d_min=None,
+        d_max=None,
+        n_bins=None,
+        i_obs=None,
+    ):
+        params = PhilIndex.params.xia2.settings.merging_statistics
+        if i_obs is None:
+            i_obs = self._load_merging_statistics_data(scaled_unmerged_mtz)
         return iotbx.merging_statistics.dataset_statistics(
             i_obs=i_obs,
             d_min=d_min,
@@ -1077,7 +1101,8 @@ class CommonScaler(Scaler):
             n_bins=n_bins or params.n_bins,
             anomalous=anomalous,
             use_internal_variance=params.use_internal_variance,
-            eliminate_sys_absent=params.eliminate_sys_absent,
+            # already done when the data were loaded
+            eliminate_sys_absent=False,
             assert_is_not_unique_set_under_symmetry=False,
         )
 
@@ -1,6 +1,7 @@
 # An implementation of the scaler interface for dials.scale
 
 
+import concurrent.futures
 import logging
 import math
 import os
@@ -10,9 +11,11 @@ import libtbx
 import numpy as np
 
 from xia2.Handlers.Citations import Citations
+from xia2.Handlers.Environment import get_number_cpus
 from xia2.Handlers.Files import FileHandler
 from xia2.lib.bits import auto_logfiler
 from xia2.Handlers.Phil import PhilIndex
+from xia2.Handlers.RunContext import bind_run_context
 from xia2.lib.SymmetryLib import sort_lattices
 from xia2.Handlers.Streams import banner
 from xia2.Handlers.CIF import CIF, mmCIF
@@ -534,6 +537,33 @@ pipeline=dials (supported for pipeline=dials-aimless).
             si.set_batch_offset(offsets[i])
             si.set_batches([r[0] + offsets[i], r[1] + offsets[i]])
 
+    def _export_and_merge_wavelength(
+        self, dname, exporter, merger, highest_suggested_resolution
+    ):
+        """Export the unmerged and merged data for one wavelength, writing
+        scalepack copies of each, and compute the merging statistics if
+        they come from cctbx - run for each wavelength at once by
+        _scale()."""
+
+        logger.debug("Exporting %s", exporter.get_mtz_filename())
+        exporter.run()
+
+        # now convert to .sca format
+        convert_mtz_to_sca(exporter.get_mtz_filename())
+
+        logger.debug("Merging %s", merger.get_mtz_filename())
+        merger.run()
+
+        # now convert to .sca format
+        convert_mtz_to_sca(merger.get_mtz_filename())
+
+        if PhilIndex.params.xia2.settings.merging_statistics.source == "cctbx":
+            return self._compute_scaler_statistics(
+                exporter.get_mtz_filename(),
+                selected_band=(highest_suggested_resolution, None),
+                wave=dname,
+            )
+
     def _scale(self):
         """Perform all of the operations required to deliver the scaled
         data."""
@@ -677,6 +707,7 @@ pipeline=dials (supported for pipeline=dials-aimless).
             f"{self._scalr_pname}_{self._scalr_xname}_scaled_unmerged.mtz",
         )
 
+        wavelength_statistics = {}
         if len(dnames_set) > 1:
             self._scalr_scaled_refl_files = {}
             logger.debug("Splitting experiments by wavelength")
@@ -695,9 +726,15 @@ pipeline=dials (supported for pipeline=dials-aimless).
             wl_sort = flex.sort_permutation(wavelengths)
             sorted_dnames_by_wl = [dnames_set[i] for i in wl_sort]
 
+            # set up the export and merge for each wavelength, then run them
+            # all at once: each runs in a directory of its own, so that the
+            # files the programs write by default do not collide
+            jobs = []
             for i, dname in enumerate(sorted_dnames_by_wl):
                 # need to sort by wavelength from low to high
                 nums = fmt % i
+                job_directory = os.path.join(self.get_working_directory(), dname)
+                os.makedirs(job_directory, exist_ok=True)
                 exporter = ExportMtz()
                 exporter.set_working_directory(self.get_working_directory())
                 expt_name = os.path.join(
@@ -715,6 +752,7 @@ pipeline=dials (supported for pipeline=dials-aimless).
                     PhilIndex.params.dials.scale.partiality_threshold
                 )  # 0.4 default
                 auto_logfiler(exporter)
+                exporter.set_working_directory(job_directory)
                 mtz_filename = os.path.join(
                     self.get_working_directory(),
                     scaled_unmerged_mtz_path.rstrip(".mtz") + "_%s.mtz" % dname,
@@ -724,13 +762,6 @@ pipeline=dials (supported for pipeline=dials-aimless).
                     dname
                 ] = mtz_filename
 
-                logger.debug("Exporting %s", mtz_filename)
-                exporter.run()
-                FileHandler.record_data_file(mtz_filename)
-
-                # now convert to .sca format
-                convert_mtz_to_sca(mtz_filename)
-
                 merger = DialsMerge()  # merge but don't truncate
                 merger.set_working_directory(self.get_working_directory())
                 merger.set_experiments_filename(expt_name)
@@ -742,6 +773,7 @@ pipeline=dials (supported for pipeline=dials-aimless).
                     PhilIndex.params.dials.scale.partiality_threshold
                 )
                 auto_logfiler(merger)
+                merger.set_working_directory(job_directory)
                 mtz_filename = os.path.join(
                     self.get_working_directory(),
                     "%s_%s_scaled_%s.mtz"
@@ -751,12 +783,29 @@ pipeline=dials (supported for pipeline=dials-aimless).
                 self._scalr_scaled_reflection_files["mtz"][dname] = mtz_filename
                 merger.set_mtz_filename(mtz_filename)
 
-                logger.debug("Merging %s", mtz_filename)
-                merger.run()
-                FileHandler.record_data_file(mtz_filename)
-
-                # now convert to .sca format
-                convert_mtz_to_sca(mtz_filename)
+                jobs.append((dname, exporter, merger))
+
+            nproc = PhilIndex.params.xia2.settings.multiprocessing.nproc
+            if not isinstance(nproc, int) or nproc < 1:
+                nproc = get_number_cpus()
+            max_workers = max(1, min(nproc, len(jobs)))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = [
+                    pool.submit(
+                        bind_run_context(self._export_and_merge_wavelength),
+                        dname,
+                        exporter,
+                        merger,
+                        highest_suggested_resolution,
+                    )
+                    for dname, exporter, merger in jobs
+                ]
+                for (dname, exporter, merger), future in zip(jobs, futures):
+                    stats = future.result()
+                    FileHandler.record_data_file(exporter.get_mtz_filename())
+                    FileHandler.record_data_file(merger.get_mtz_filename())
+                    if stats is not None:
+                        wavelength_statistics[dname] = stats
 
         ### For non-MAD case, run dials.export and dials.merge on scaled data.
         else:
@@ -831,11 +880,13 @@ pipeline=dials (supported for pipeline=dials-aimless).
 
         if PhilIndex.params.xia2.settings.merging_statistics.source == "cctbx":
             for key in self._scalr_scaled_refl_files:
-                stats = self._compute_scaler_statistics(
-                    self._scalr_scaled_reflection_files["mtz_unmerged"][key],
-                    selected_band=(highest_suggested_resolution, None),
-                    wave=key,
-                )
+                stats = wavelength_statistics.get(key)
+                if stats is None:
+                    stats = self._compute_scaler_statistics(
+                        self._scalr_scaled_reflection_files["mtz_unmerged"][key],
+                        selected_band=(highest_suggested_resolution, None),
+                        wave=key,
+                    )
                 self._scalr_statistics[
                     (self._scalr_pname, self._scalr_xname, key)
                 ] = stats
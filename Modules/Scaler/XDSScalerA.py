@@ -9,9 +9,11 @@ import logging
 import os
 import shutil
 
+from xia2.Driver.BatchDriver import ArrayJobs
 from xia2.Handlers.Citations import Citations
 from xia2.Handlers.Files import FileHandler
 from xia2.Handlers.Phil import PhilIndex
+from xia2.Handlers.RunContext import bind_run_context, run_context
 from xia2.Handlers.Syminfo import Syminfo
 from xia2.lib.bits import auto_logfiler, is_mtz_file, transpose_loggraph
 from xia2.lib.SymmetryLib import lattices_in_order
@@ -123,11 +125,8 @@ class XDSScalerA(Scaler):
         raise RuntimeError("BATCH range not found in %s" % xdsin)
 
     def _hklin_to_batch_range(self, hklin):
-        from iotbx import mtz
-
-        m = mtz.object(hklin)
-        b = m.batches()
-        return b[0].num(), b[-1].num()
+        batches = MtzUtils.batches_from_mtz(hklin)
+        return batches[0], batches[-1]
 
     def _pointless_indexer_jiffy(self, hklin, refiner):
         """A jiffy to centralise the interactions between pointless
@@ -570,16 +569,10 @@ class XDSScalerA(Scaler):
 
         if self._reference:
 
-            from xia2.Driver.DriverFactory import DriverFactory
-
             def run_one_sweep(args):
                 sweep_information = args[0]
                 #  pointless_indexer_jiffy = args[1]
                 #  factory = args[2]
-                job_type = args[3]
-
-                if job_type:
-                    DriverFactory.set_driver_type(job_type)
 
                 intgr = sweep_information["integrater"]
                 hklin = sweep_information["corrected_intensities"]
@@ -693,32 +686,31 @@ class XDSScalerA(Scaler):
             njob = mp_params.njob
 
             if njob > 1:
-                # cache drivertype
-                drivertype = DriverFactory.get_driver_type()
-
                 args = [
-                    (
-                        sweep_information,
-                        self._pointless_indexer_jiffy,
-                        self._factory,
-                        mp_params.type,
-                    )
+                    (sweep_information, self._pointless_indexer_jiffy, self._factory)
                     for sweep_information in self._sweep_information.values()
                 ]
-                results_list = easy_mp.parallel_map(
-                    run_one_sweep,
-                    args,
-                    params=None,
-                    processes=njob,
-                    method="threading",
-                    asynchronous=True,
-                    callback=None,
-                    preserve_order=True,
-                    preserve_exception_message=True,
-                )
-
-                # restore drivertype
-                DriverFactory.set_driver_type(drivertype)
+                # the threads take the driver type from the run context,
+                # leaving that of this thread alone; with a batch system the
+                # jobs for the sweeps are submitted together as array jobs
+                array_jobs = ArrayJobs(len(args), concurrency=njob)
+
+                def run_one_sweep_in_array(args):
+                    with array_jobs.task():
+                        return run_one_sweep(args)
+
+                with run_context(driver_type=mp_params.type, array_jobs=array_jobs):
+                    results_list = easy_mp.parallel_map(
+                        bind_run_context(run_one_sweep_in_array),
+                        args,
+                        params=None,
+                        processes=njob,
+                        method="threading",
+                        asynchronous=True,
+                        callback=None,
+                        preserve_order=True,
+                        preserve_exception_message=True,
+                    )
 
                 # results should be given back in the same order
                 for i, epoch in enumerate(self._sweep_information):
@@ -731,7 +723,6 @@ class XDSScalerA(Scaler):
                             self._sweep_information[epoch],
                             self._pointless_indexer_jiffy,
                             self._factory,
-                            None,
                         )
                     )
 
@@ -2,14 +2,24 @@
 # functions...
 
 
+import concurrent.futures
+import contextlib
 import logging
 import os
 
+from xia2.Handlers.Environment import get_number_cpus
+from xia2.Handlers.Phil import PhilIndex
+from xia2.Handlers.RunContext import bind_run_context
 from xia2.lib.bits import auto_logfiler
 from xia2.Wrappers.CCP4.Pointless import Pointless as _Pointless
 
 logger = logging.getLogger("xia2.Modules.Scaler.XDSScalerHelpers")
 
+# buffer sizes for streaming the (possibly very large) reflection files:
+# smaller for output as there is one output file per sweep
+_buffer_size = 2 ** 20
+_output_buffer_size = 2 ** 18
+
 
 class XDSScalerHelper:
     """A class which contains functions which will help the XDS Scaler
@@ -33,6 +43,20 @@ class XDSScalerHelper:
     def get_working_directory(self):
         return self._working_directory
 
+    @staticmethod
+    def _parse_xscale_ascii_header_record(record, file_map):
+        """Record the input file for the ISET named in this header record,
+        if there is one, in file_map."""
+
+        if b"ISET" in record and b"INPUT_FILE" in record:
+            line = record.decode("latin-1")
+            set = int(line.split()[2].strip())
+            input_file = line.split("=")[2].strip()
+
+            file_map[set] = input_file
+
+            logger.debug("Set %d is from data %s", set, input_file)
+
     @staticmethod
     def parse_xscale_ascii_header(xds_ascii_file):
         """Parse out the input reflection files which contributed to this
@@ -40,65 +64,81 @@ class XDSScalerHelper:
 
         file_map = {}
 
-        with open(xds_ascii_file) as fh:
-            for line in fh.readlines():
-                if not line[0] == "!":
+        with open(xds_ascii_file, "rb") as fh:
+            for record in fh:
+                if not record.startswith(b"!"):
                     break
-
-                if "ISET" in line and "INPUT_FILE" in line:
-                    set = int(line.split()[2].strip())
-                    input_file = line.split("=")[2].strip()
-
-                    file_map[set] = input_file
-
-                    logger.debug("Set %d is from data %s", set, input_file)
+                XDSScalerHelper._parse_xscale_ascii_header_record(record, file_map)
 
         return file_map
 
     def _split_xscale_ascii_file(self, xds_ascii_file, prefix):
         """Split the output of XSCALE to separate reflection files for
-        each run. The output files will be called ${prefix}${input_file}."""
+        each run. The output files will be called ${prefix}${input_file}.
 
-        file_map = self.parse_xscale_ascii_header(xds_ascii_file)
-        file_content = {k: [] for k in file_map}
+        This reads the file once, a line at a time: the header is kept
+        until the first reflection, then the output files are opened and
+        each reflection is written straight to the file for its ISET, so
+        the memory used does not depend on the size of the file."""
 
-        # copy the header to all of the files
-        with open(xds_ascii_file) as fh:
-            for line in fh.readlines():
-                if not line[0] == "!":
-                    break
-
-                for k in file_map:
-                    if "ISET" in line and int(line.split("ISET=")[1].split()[0]) != k:
+        file_map = {}
+        header = []
+        outputs = {}
+
+        # the output file for each value of the ISET column, as it appears
+        # in the file, to save converting it to an integer for every record
+        iset_to_output = {}
+
+        def open_outputs():
+            for k, input_file in file_map.items():
+                outputs[k] = stack.enter_context(
+                    open(
+                        os.path.join(
+                            self.get_working_directory(), "%s%s" % (prefix, input_file)
+                        ),
+                        "wb",
+                        buffering=_output_buffer_size,
+                    )
+                )
+
+            # copy the header to all of the files, with the records for
+            # each ISET only going to the corresponding file
+            for record in header:
+                for k, fout in outputs.items():
+                    if (
+                        b"ISET" in record
+                        and int(record.split(b"ISET=")[1].split()[0]) != k
+                    ):
+                        continue
+                    fout.write(record)
+
+        with contextlib.ExitStack() as stack:
+            with open(xds_ascii_file, "rb", buffering=_buffer_size) as fh:
+                for record in fh:
+                    if record.startswith(b"!"):
+                        if not outputs:
+                            header.append(record)
+                            self._parse_xscale_ascii_header_record(record, file_map)
                         continue
 
-                    file_content[k].append(line)
+                    if not outputs:
+                        open_outputs()
 
-        # next copy the appropriate reflections to each file
-        with open(xds_ascii_file) as fh:
-            for line in fh.readlines():
-                if line[0] == "!":
-                    continue
+                    # FIXME this will not be correct if zero-dose correction
+                    # has been used as this applies an additional record at
+                    # the end... though it should always be #9
+                    iset = record.split(None, 10)[9]
+                    fout = iset_to_output.get(iset)
+                    if fout is None:
+                        fout = iset_to_output[iset] = outputs[int(iset)]
+                    fout.write(record)
+
+            if not outputs:
+                open_outputs()
 
-                # FIXME this will not be correct if zero-dose correction
-                # has been used as this applies an additional record at
-                # the end... though it should always be #9
-                k = int(line.split()[9])
-                file_content[k].append(line)
-
-        # then add the tailer
-        for k in file_map:
-            file_content[k].append("!END_OF_DATA\n")
-
-        # and finally actually write the files
-        for k in file_map:
-            with open(
-                os.path.join(
-                    self.get_working_directory(), "%s%s" % (prefix, file_map[k])
-                ),
-                "w",
-            ) as fh:
-                fh.write("".join(file_content[k]))
+            # then add the tailer
+            for fout in outputs.values():
+                fout.write(b"!END_OF_DATA\n")
 
         return {filename: "%s%s" % (prefix, filename) for filename in file_map.values()}
 
@@ -107,10 +147,15 @@ class XDSScalerHelper:
     ):
         """Split (as per method above) then convert files to MTZ
         format via pointless. The latter step will add the
-        pname / xname / dname things from the dictionary supplied."""
+        pname / xname / dname things from the dictionary supplied.
+
+        The conversions are run at once on up to nproc threads; the wrappers
+        (and so the log files) are set up in order first, so the names do
+        not depend on the order in which the conversions finish."""
 
         data_map = self._split_xscale_ascii_file(input_file, prefix)
 
+        jobs = []
         for token in data_map:
             if token not in project_info:
                 raise RuntimeError("project info for %s not available" % token)
@@ -125,20 +170,44 @@ class XDSScalerHelper:
             p.set_hklout(hklout)
             p.set_project_info(pname, xname, dname)
             p.set_scale_factor(scale_factor)
-            p.xds_to_mtz()
+            jobs.append((token, hklout, p))
+
+        nproc = PhilIndex.params.xia2.settings.multiprocessing.nproc
+        if not isinstance(nproc, int) or nproc < 1:
+            nproc = get_number_cpus()
+        max_workers = max(1, min(nproc, len(jobs)))
+
+        errors = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(bind_run_context(p.xds_to_mtz)) for token, hklout, p in jobs
+            ]
+            for (token, hklout, p), future in zip(jobs, futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append("%s: %s (see %s)" % (token, str(e), p.get_log_file()))
+                    continue
+                data_map[token] = hklout
 
-            data_map[token] = hklout
+        if errors:
+            raise RuntimeError(
+                "conversion to MTZ failed for %d of %d data sets:\n%s"
+                % (len(errors), len(jobs), "\n".join(errors))
+            )
 
         return data_map
 
     def limit_batches(self, input_file, output_file, start, end):
-        with open(input_file) as infile, open(output_file, "w") as outfile:
-            for line in infile.readlines():
-                if line.startswith("!"):
-                    outfile.write(line)
+        with open(input_file, "rb", buffering=_buffer_size) as infile, open(
+            output_file, "wb", buffering=_buffer_size
+        ) as outfile:
+            for record in infile:
+                if record.startswith(b"!"):
+                    outfile.write(record)
                 else:
-                    tokens = line.split()
+                    tokens = record.split()
                     assert len(tokens) == 12
                     z = float(tokens[7])
                     if z >= start and z < end:
-                        outfile.write(line)
+                        outfile.write(record)
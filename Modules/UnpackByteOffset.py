@@ -1,73 +1,105 @@
-import struct
+# Codec for the CBF byte-offset compression: each value is stored as the
+# difference from the previous value, in one byte if it fits in -126..126,
+# otherwise as an escape byte (-128) followed by a two byte difference, and
+# so on through four and eight byte differences.
 
 
-def pack_values(data):
-    current = 0
-    packed = ""
-
-    for d in data:
-        delta = d - current
-        if -127 < delta < 127:
-            packed += struct.pack("b", delta)
-            current = d
-            continue
+import numpy as np
 
-        packed += struct.pack("b", -128)
-        if -32767 < delta < 32767:
-            packed += struct.pack("<h", delta)
-            current = d
-            continue
+_escape = (np.int8(-128), np.int16(-32768), np.int32(-2147483648))
+
+# the escape bytes which precede a difference of each size, and the type in
+# which the difference itself is stored
+_escape_bytes = (
+    b"",
+    b"\x80",
+    b"\x80\x00\x80",
+    b"\x80\x00\x80\x00\x00\x00\x80",
+)
+_value_types = ("<i1", "<i2", "<i4", "<i8")
 
-        packed += struct.pack("<h", -32768)
-        if -2147483647 < delta < 2147483647:
-            packed += struct.pack("<i", delta)
-            current = d
-            continue
 
-        packed += struct.pack("<i", -2147483648)
-        packed += struct.pack("<q", delta)
-        current = d
+def pack_values(data):
+    """Compress the sequence of integers in data, returning bytes."""
+
+    values = np.asarray(data, dtype=np.int64).ravel()
+    deltas = np.diff(values, prepend=np.int64(0))
+
+    # the size class of each difference: 0 => 1 byte, 1 => 2 bytes,
+    # 2 => 4 bytes, 3 => 8 bytes (each other than 0 preceded by escapes)
+    size_class = np.zeros(deltas.shape, dtype=np.int8)
+    size_class[(deltas <= -127) | (deltas >= 127)] = 1
+    size_class[(deltas <= -32767) | (deltas >= 32767)] = 2
+    size_class[(deltas <= -2147483647) | (deltas >= 2147483647)] = 3
+
+    if not size_class.any():
+        # fast path - every difference fits in a single byte
+        return deltas.astype(np.int8).tobytes()
+
+    itemsizes = [np.dtype(value_type).itemsize for value_type in _value_types]
+    nbytes = np.array([len(e) + i for e, i in zip(_escape_bytes, itemsizes)])
+    lengths = nbytes[size_class]
+    offsets = np.cumsum(lengths) - lengths
+    packed = np.zeros(int(lengths.sum()), dtype=np.uint8)
+
+    for cls, escape in enumerate(_escape_bytes):
+        selection = size_class == cls
+        if not selection.any():
+            continue
+        start = offsets[selection]
+        for j, byte in enumerate(escape):
+            packed[start + j] = byte
+        value_bytes = (
+            deltas[selection]
+            .astype(_value_types[cls])
+            .view(np.uint8)
+            .reshape(-1, itemsizes[cls])
+        )
+        for j in range(itemsizes[cls]):
+            packed[start + len(escape) + j] = value_bytes[:, j]
 
-    return packed
+    return packed.tobytes()
 
 
 def unpack_values(data, length):
-    # unpack data stream
+    """Decompress length values from the bytes in data, returning a numpy
+    array of 64-bit integers."""
 
-    values = []
+    raw = np.frombuffer(data, dtype=np.int8)
 
-    pixel = 0
-    ptr = 0
+    # fast path - no escapes at all within the first length bytes
+    if raw.size >= length and not (raw[:length] == _escape[0]).any():
+        return np.cumsum(raw[:length], dtype=np.int64)
 
-    while len(values) < length:
+    # otherwise find the candidate escape bytes in a first pass, then copy
+    # the runs of single byte differences between them in a second pass,
+    # decoding the multi-byte differences at each escape as they come
+    escapes = np.flatnonzero(raw == _escape[0])
+    deltas = np.empty(length, dtype=np.int64)
 
-        delta = struct.unpack("b", data[ptr])[0]
+    n = 0
+    ptr = 0
+    k = 0
+    while n < length:
+        next_escape = escapes[k] if k < escapes.size else raw.size
+        run = min(next_escape - ptr, length - n)
+        deltas[n : n + run] = raw[ptr : ptr + run]
+        n += run
+        ptr += run
+        if n == length:
+            break
+
+        # at an escape byte: work through the wider differences
         ptr += 1
-
-        if delta != -128:
-            pixel += delta
-            values.append(pixel)
-            continue
-
-        delta = struct.unpack("<h", data[ptr : ptr + 2])[0]
-        ptr += 2
-
-        if delta != -32768:
-            pixel += delta
-            values.append(pixel)
-            continue
-
-        delta = struct.unpack("<i", data[ptr : ptr + 4])[0]
-        ptr += 4
-
-        if delta != -2147483648:
-            pixel += delta
-            values.append(pixel)
-            continue
-
-        delta = struct.unpack("<q", data[ptr : ptr + 8])[0]
-        ptr += 8
-        pixel += delta
-        values.append(pixel)
-
-    return values
+        for value_type, escape in zip(_value_types[1:], _escape[1:] + (None,)):
+            delta = np.frombuffer(data, dtype=value_type, count=1, offset=ptr)[0]
+            ptr += np.dtype(value_type).itemsize
+            if delta != escape:
+                break
+        deltas[n] = delta
+        n += 1
+
+        # skip any candidate escapes which were part of the wider values
+        k = int(np.searchsorted(escapes, ptr))
+
+    return np.cumsum(deltas)
@@ -0,0 +1,132 @@
+import random
+import struct
+import time
+
+import numpy as np
+import pytest
+
+from xia2.Modules.UnpackByteOffset import pack_values, unpack_values
+
+
+def _pack_values_reference(data):
+    """The original pixel-by-pixel implementation, for comparison."""
+    current = 0
+    packed = b""
+
+    for d in data:
+        delta = d - current
+        if -127 < delta < 127:
+            packed += struct.pack("b", delta)
+            current = d
+            continue
+
+        packed += struct.pack("b", -128)
+        if -32767 < delta < 32767:
+            packed += struct.pack("<h", delta)
+            current = d
+            continue
+
+        packed += struct.pack("<h", -32768)
+        if -2147483647 < delta < 2147483647:
+            packed += struct.pack("<i", delta)
+            current = d
+            continue
+
+        packed += struct.pack("<i", -2147483648)
+        packed += struct.pack("<q", delta)
+        current = d
+
+    return packed
+
+
+def _unpack_values_reference(data, length):
+    """The original pixel-by-pixel implementation, for comparison."""
+    values = []
+    pixel = 0
+    ptr = 0
+
+    while len(values) < length:
+        delta = struct.unpack("b", data[ptr : ptr + 1])[0]
+        ptr += 1
+        if delta != -128:
+            pixel += delta
+            values.append(pixel)
+            continue
+
+        delta = struct.unpack("<h", data[ptr : ptr + 2])[0]
+        ptr += 2
+        if delta != -32768:
+            pixel += delta
+            values.append(pixel)
+            continue
+
+        delta = struct.unpack("<i", data[ptr : ptr + 4])[0]
+        ptr += 4
+        if delta != -2147483648:
+            pixel += delta
+            values.append(pixel)
+            continue
+
+        delta = struct.unpack("<q", data[ptr : ptr + 8])[0]
+        ptr += 8
+        pixel += delta
+        values.append(pixel)
+
+    return values
+
+
+def _pixels(n, seed=0):
+    """Mostly background with the odd strong or masked pixel, and the
+    boundary cases of each size of difference."""
+    random.seed(seed)
+    values = [random.randint(0, 20) for i in range(n)]
+    for i in random.sample(range(n), n // 50):
+        values[i] = random.choice([-1, -2, -3, 200, 40000, 70000, 2 ** 33])
+    values[:8] = [0, 126, 0, -126, 0, 127, 0, -127]
+    values[8:16] = [0, 32766, 0, 32767, 0, 2147483646, 0, 2147483647]
+    return values
+
+
+@pytest.mark.parametrize(
+    "values",
+    [[], [0], [5, 5, 5, 4], list(range(-300, 300, 7)), _pixels(10000)],
+)
+def test_round_trip_matches_reference(values):
+    packed = pack_values(values)
+    assert isinstance(packed, bytes)
+    assert packed == _pack_values_reference(values)
+    assert list(unpack_values(packed, len(values))) == values
+    assert _unpack_values_reference(packed, len(values)) == values
+
+
+def test_unpack_ignores_trailing_data():
+    values = _pixels(1000)
+    packed = pack_values(values) + b"\x80\x00\x80 trailing padding"
+    assert list(unpack_values(packed, len(values))) == values
+    assert list(unpack_values(pack_values([1, 2, 3]) + b"\x80", 3)) == [1, 2, 3]
+
+
+def test_unpack_numpy_array_input():
+    values = np.array(_pixels(1000), dtype=np.int64).reshape(10, 100)
+    assert (unpack_values(pack_values(values), values.size) == values.ravel()).all()
+
+
+def test_benchmark_against_reference():
+    values = _pixels(200000)
+    packed = pack_values(values)
+
+    t0 = time.perf_counter()
+    unpacked = unpack_values(packed, len(values))
+    repacked = pack_values(unpacked)
+    t_numpy = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    _pack_values_reference(_unpack_values_reference(packed, len(values)))
+    t_reference = time.perf_counter() - t0
+
+    print(
+        "byte offset codec: %.3fs vectorised, %.3fs reference (%.0fx)"
+        % (t_numpy, t_reference, t_reference / t_numpy)
+    )
+    assert repacked == packed
+    assert t_numpy < t_reference
@@ -139,6 +139,11 @@ class Indexer:
     LATTICE_IMPOSSIBLE = "LATTICE_IMPOSSIBLE"
     LATTICE_CORRECT = "LATTICE_CORRECT"
 
+    # whether _index_prepare() can work with the images of a sweep as they
+    # are written, when following data collection - if not, indexing waits
+    # for the last image
+    follows_images = False
+
     def __init__(self):
 
         self._indxr_working_directory = os.getcwd()
@@ -436,6 +441,11 @@ class Indexer:
                     # --------------
 
                     self.set_indexer_prepare_done(True)
+                    if not self.follows_images:
+                        for sweep in self.get_indexer_sweeps():
+                            follower = sweep.get_image_follower()
+                            if follower is not None:
+                                follower.wait_for_all()
                     self._index_prepare()
 
                 # --------------------------------------------
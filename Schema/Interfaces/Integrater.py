@@ -547,6 +547,14 @@ class Integrater(FrameProcessor):
                         )
                     else:
                         logger.notice(banner("Integrating %s" % self._intgr_sweep_name))
+
+                # when following data collection, integration can only start
+                # once the last image has been written
+                sweep = self.get_integrater_sweep()
+                follower = sweep.get_image_follower() if sweep else None
+                if follower is not None:
+                    follower.wait_for_all()
+
                 try:
 
                     # 1698
@@ -61,6 +61,9 @@ import time
 import pathlib
 from xia2.Experts.Filenames import expand_path
 from xia2.Experts.FindImages import (
+    ImageFollower,
+    check_image_files,
+    compact_ranges,
     image2template_directory,
     template_directory_number2image,
 )
@@ -181,6 +184,23 @@ class XSweep:
                 os.path.join(directory, image)
             )
 
+            follower = self.get_image_follower()
+            if follower is not None:
+                # the images are still being written: wait for the first,
+                # as the header is needed to set up the sweep
+                logger.info(
+                    "Following images %d to %d of %s",
+                    self._frames_to_process[0],
+                    self._frames_to_process[1],
+                    self._template,
+                )
+                follower.wait_for(self._frames_to_process[0])
+            elif params.xia2.settings.input.follow.enable:
+                raise RuntimeError(
+                    "cannot follow sweep %s as it is collected: the image range"
+                    " must be given, for images written to separate files" % self._name
+                )
+
             from xia2.Schema import load_imagesets
 
             imagesets = load_imagesets(
@@ -206,25 +226,24 @@ class XSweep:
 
             start, end = self._frames_to_process
 
-            error = False
-
-            if params.general.check_image_files_readable:
-                for j in range(start, end + 1):
-                    if j not in self._images:
-                        logger.debug(
-                            "image %i missing for %s"
-                            % (j, self.get_imageset().get_template())
-                        )
-                        error = True
-                        continue
-                    image_name = self.get_imageset().get_path(j - start)
-                    if not os.access(image_name, os.R_OK):
-                        logger.debug("image %s unreadable" % image_name)
-                        error = True
-                        continue
-
-                if error:
-                    raise RuntimeError("problem with sweep %s" % self._name)
+            if params.general.check_image_files_readable and follower is None:
+                missing, unreadable = check_image_files(
+                    self._imageset, self._images, start, end
+                )
+                problems = []
+                if missing:
+                    problems.append("images %s missing" % compact_ranges(missing))
+                if unreadable:
+                    problems.append("images %s unreadable" % compact_ranges(unreadable))
+                if problems:
+                    logger.debug(
+                        "%s for %s",
+                        " and ".join(problems),
+                        self.get_imageset().get_template(),
+                    )
+                    raise RuntimeError(
+                        "problem with sweep %s: %s" % (self._name, "; ".join(problems))
+                    )
 
             beam_ = self._imageset.get_beam()
             scan = self._imageset.get_scan()
@@ -430,6 +449,25 @@ class XSweep:
     def get_imageset(self):
         return self._imageset
 
+    def get_image_follower(self):
+        """Return an ImageFollower for the images of this sweep if they are
+        to be processed as they are written, else None."""
+
+        params = PhilIndex.params.xia2.settings.input.follow
+        if not params.enable or not self._frames_to_process:
+            return None
+        if "#" not in (self._template or ""):
+            # e.g. HDF5, where the images are not written to separate files
+            return None
+        return ImageFollower(
+            self._template,
+            self._directory,
+            self._frames_to_process[0],
+            self._frames_to_process[1],
+            timeout=params.timeout,
+            poll_interval=params.poll_interval,
+        )
+
     def get_input_imageset(self):
         return self._input_imageset
 
@@ -126,7 +126,12 @@ def load_imagesets(
             from dxtbx.sequence_filenames import locate_files_matching_template_string
 
             params = PhilIndex.get_python_object()
-            read_all_image_headers = params.xia2.settings.read_all_image_headers
+            # the images are read as they are written when following data
+            # collection, so only the first can be assumed to be there yet
+            read_all_image_headers = (
+                params.xia2.settings.read_all_image_headers
+                and not params.xia2.settings.input.follow.enable
+            )
 
             if read_all_image_headers:
                 paths = sorted(
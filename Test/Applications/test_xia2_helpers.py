@@ -0,0 +1,79 @@
+import threading
+import types
+
+from xia2.Applications import xia2_helpers
+from xia2.Applications.xia2_helpers import CoreBudget
+
+
+def test_core_budget_shares_by_weight():
+    budget = CoreBudget(16, max_per_job=12)
+    budget.add_job("long", 3600)
+    budget.add_job("short", 1200)
+    assert budget.get_share("long") == 12
+    assert budget.get_share("short") == 4
+
+    # once the short sweep has finished the long one may use everything
+    # up to the per-job limit
+    budget.finish_job("short")
+    assert budget.get_share("long") == 12
+
+
+def test_core_budget_hands_freed_cores_to_later_stages():
+    budget = CoreBudget(8)
+    for job_id in ("a", "b"):
+        budget.add_job(job_id, 100)
+
+    with budget.cores("a") as nproc_a:
+        assert nproc_a == 4
+        with budget.cores("b") as nproc_b:
+            assert nproc_b == 4
+        budget.finish_job("b")
+    with budget.cores("a") as nproc_a:
+        assert nproc_a == 8
+
+
+def test_core_budget_waits_for_free_cores():
+    budget = CoreBudget(2)
+    budget.add_job("a", 1)
+    budget.add_job("b", 1)
+    budget.add_job("c", 1)
+    started = threading.Event()
+    held = []
+
+    def run_c():
+        with budget.cores("c") as nproc:
+            held.append(nproc)
+            started.set()
+
+    with budget.cores("a"), budget.cores("b"):
+        thread = threading.Thread(target=run_c)
+        thread.start()
+        assert not started.wait(0.1)
+    thread.join()
+    assert held == [1]
+
+
+def test_process_sweeps_with_core_budget_uses_all_cores(monkeypatch):
+    # more sweeps than may be processed at once: the cores are shared
+    # between those running, not all of those queued
+    barrier = threading.Barrier(2, timeout=10)
+    held = []
+
+    def process_one_sweep(args):
+        (job,) = args
+        job_id = (job.crystal_id, job.wavelength_id, job.sweep_id)
+        with job.core_budget.cores(job_id) as nproc:
+            held.append(nproc)
+            barrier.wait()
+        return True, None, job.sweep_id
+
+    monkeypatch.setattr(xia2_helpers, "process_one_sweep", process_one_sweep)
+    jobs = [
+        (types.SimpleNamespace(crystal_id="X", wavelength_id="W", sweep_id=i),)
+        for i in range(8)
+    ]
+    results = xia2_helpers.process_sweeps_with_core_budget(
+        jobs, [100] * 8, njob=2, ncores=16, max_per_job=8
+    )
+    assert [r[2] for r in results] == list(range(8))
+    assert held == [8] * 8
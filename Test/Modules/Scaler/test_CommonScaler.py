@@ -0,0 +1,66 @@
+import pathlib
+import random
+
+import iotbx.merging_statistics
+from cctbx import crystal, miller
+from cctbx.array_family import flex
+
+from xia2.Modules.Scaler.CommonScaler import CommonScaler
+
+
+def _unmerged_intensities():
+    cs = crystal.symmetry((50, 60, 70, 90, 90, 90), "P 21 21 21")
+    p1 = miller.build_set(
+        crystal.symmetry(cs.unit_cell().parameters(), "P 1"),
+        anomalous_flag=True,
+        d_min=2.5,
+    )
+    random.seed(0)
+    indices = flex.miller_index()
+    data = flex.double()
+    sigmas = flex.double()
+    for h in p1.indices():
+        if random.random() < 0.6:
+            for k in range(2):
+                i = random.uniform(1, 1000)
+                indices.append(h)
+                data.append(i)
+                sigmas.append(i ** 0.5)
+    return miller.array(
+        miller.set(cs, indices, anomalous_flag=False), data, sigmas
+    ).set_observation_type_xray_intensity()
+
+
+def test_compute_scaler_statistics_reads_data_once(monkeypatch, tmpdir):
+    i_obs = _unmerged_intensities()
+    calls = []
+
+    def select_data(file_name, data_labels, **kwargs):
+        calls.append(file_name)
+        return i_obs
+
+    monkeypatch.setattr(iotbx.merging_statistics, "select_data", select_data)
+
+    scaler = CommonScaler.__new__(CommonScaler)
+    scaler._scalr_likely_spacegroups = ["P 21 21 21"]
+    scaler._base_path = pathlib.Path(tmpdir.strpath)
+    scaler._scalr_pname = "AUTOMATIC"
+    scaler._scalr_xname = "DEFAULT"
+
+    stats = scaler._compute_scaler_statistics(
+        "scaled_unmerged.mtz", selected_band=(3.0, None), wave="NATIVE"
+    )
+    assert calls == ["scaled_unmerged.mtz"]
+    assert len(stats["Completeness"]) == 4
+    assert "Anomalous completeness" in stats
+    assert tmpdir.join(
+        "LogFiles", "AUTOMATIC_DEFAULT_NATIVE_merging-statistics.json"
+    ).check()
+
+    # the same statistics as loading the data afresh for every view
+    expected = iotbx.merging_statistics.dataset_statistics(
+        i_obs=i_obs.customized_copy(anomalous_flag=True, info=i_obs.info()),
+        anomalous=True,
+        assert_is_not_unique_set_under_symmetry=False,
+    )
+    assert stats["Anomalous multiplicity"][-1] == expected.overall.mean_redundancy
@@ -0,0 +1,233 @@
+import os
+import random
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+from xia2.Modules.Scaler.XDSScalerHelpers import XDSScalerHelper
+
+
+def _write_xscale_ascii(filename, n_sets, n_reflections, seed=0):
+    random.seed(seed)
+    with open(filename, "w") as fh:
+        fh.write("!FORMAT=XDS_ASCII    MERGE=FALSE    FRIEDEL'S_LAW=FALSE\n")
+        fh.write("!SPACE_GROUP_NUMBER=   19\n")
+        for k in range(1, n_sets + 1):
+            fh.write("! ISET= %i INPUT_FILE=SWEEP%i.HKL\n" % (k, k))
+            fh.write("! ISET= %i X-RAY_WAVELENGTH=  0.97950\n" % k)
+        fh.write("!NUMBER_OF_ITEMS_IN_EACH_DATA_RECORD=12\n")
+        fh.write("!END_OF_HEADER\n")
+        for i in range(n_reflections):
+            fh.write(
+                "%6d%6d%6d %10.3E %10.3E %8.1f %8.1f %8.1f %8.5f %3d %4d %7.2f\n"
+                % (
+                    random.randint(-30, 30),
+                    random.randint(-30, 30),
+                    random.randint(0, 40),
+                    random.uniform(-100, 1e5),
+                    random.uniform(1, 500),
+                    random.uniform(0, 2000),
+                    random.uniform(0, 2000),
+                    random.uniform(0, 360),
+                    random.uniform(0, 1),
+                    random.randint(1, n_sets),
+                    random.randint(1, 9),
+                    random.uniform(-180, 180),
+                )
+            )
+        fh.write("!END_OF_DATA\n")
+
+
+def _reference_split(xds_ascii_file, prefix, working_directory):
+    # the original implementation, reading everything into memory
+    file_map = XDSScalerHelper.parse_xscale_ascii_header(xds_ascii_file)
+    file_content = {k: [] for k in file_map}
+    with open(xds_ascii_file) as fh:
+        for line in fh.readlines():
+            if not line[0] == "!":
+                break
+            for k in file_map:
+                if "ISET" in line and int(line.split("ISET=")[1].split()[0]) != k:
+                    continue
+                file_content[k].append(line)
+    with open(xds_ascii_file) as fh:
+        for line in fh.readlines():
+            if line[0] == "!":
+                continue
+            k = int(line.split()[9])
+            file_content[k].append(line)
+    for k in file_map:
+        file_content[k].append("!END_OF_DATA\n")
+    for k in file_map:
+        with open(
+            os.path.join(working_directory, "%s%s" % (prefix, file_map[k])), "w"
+        ) as fh:
+            fh.write("".join(file_content[k]))
+
+
+def test_parse_xscale_ascii_header(tmpdir):
+    xscale_hkl = tmpdir.join("XSCALE.HKL").strpath
+    _write_xscale_ascii(xscale_hkl, 3, 10)
+    assert XDSScalerHelper.parse_xscale_ascii_header(xscale_hkl) == {
+        1: "SWEEP1.HKL",
+        2: "SWEEP2.HKL",
+        3: "SWEEP3.HKL",
+    }
+
+
+def test_split_xscale_ascii_file(tmpdir):
+    xscale_hkl = tmpdir.join("XSCALE.HKL").strpath
+    _write_xscale_ascii(xscale_hkl, 4, 2000)
+    xsh = XDSScalerHelper()
+    xsh.set_working_directory(tmpdir.strpath)
+    data_map = xsh._split_xscale_ascii_file(xscale_hkl, "SCALED_")
+    assert data_map == {
+        "SWEEP%i.HKL" % k: "SCALED_SWEEP%i.HKL" % k for k in range(1, 5)
+    }
+    _reference_split(xscale_hkl, "REFERENCE_", tmpdir.strpath)
+    for k in range(1, 5):
+        assert (
+            tmpdir.join("SCALED_SWEEP%i.HKL" % k).read()
+            == tmpdir.join("REFERENCE_SWEEP%i.HKL" % k).read()
+        )
+    header = tmpdir.join("SCALED_SWEEP2.HKL").readlines()[:6]
+    assert "! ISET= 2 INPUT_FILE=SWEEP2.HKL\n" in header
+    assert "! ISET= 1 INPUT_FILE=SWEEP1.HKL\n" not in header
+
+
+def test_limit_batches(tmpdir):
+    xscale_hkl = tmpdir.join("XSCALE.HKL").strpath
+    _write_xscale_ascii(xscale_hkl, 1, 500)
+    XDSScalerHelper().limit_batches(
+        xscale_hkl, tmpdir.join("limited.HKL").strpath, 90, 180
+    )
+    header = [l for l in tmpdir.join("XSCALE.HKL").readlines() if l[0] == "!"]
+    expected = [
+        l
+        for l in tmpdir.join("XSCALE.HKL").readlines()
+        if l[0] != "!" and 90 <= float(l.split()[7]) < 180
+    ]
+    lines = tmpdir.join("limited.HKL").readlines()
+    assert [l for l in lines if l[0] == "!"] == header
+    assert [l for l in lines if l[0] != "!"] == expected
+
+
+class _FakePointless:
+    """Stands in for the Pointless wrapper, recording how many conversions
+    run at once and failing for the named input files."""
+
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def __init__(self, log_file, fail_for=()):
+        self._log_file = log_file
+        self._fail_for = fail_for
+
+    def set_xdsin(self, xdsin):
+        self._xdsin = xdsin
+
+    def set_hklout(self, hklout):
+        self._hklout = hklout
+
+    def set_project_info(self, pname, xname, dname):
+        pass
+
+    def set_scale_factor(self, scale_factor):
+        pass
+
+    def get_log_file(self):
+        return self._log_file
+
+    def xds_to_mtz(self):
+        with self.lock:
+            _FakePointless.running += 1
+            _FakePointless.max_running = max(self.running, self.max_running)
+        time.sleep(0.2)
+        with self.lock:
+            _FakePointless.running -= 1
+        if os.path.basename(self._xdsin) in self._fail_for:
+            raise RuntimeError("pointless failed")
+        open(self._hklout, "w").close()
+
+
+@pytest.mark.parametrize("nproc", [1, 3])
+def test_split_and_convert_xscale_output(tmpdir, monkeypatch, nproc):
+    from xia2.Handlers.Phil import PhilIndex
+
+    monkeypatch.setattr(PhilIndex.params.xia2.settings.multiprocessing, "nproc", nproc)
+    xscale_hkl = tmpdir.join("XSCALE.HKL").strpath
+    _write_xscale_ascii(xscale_hkl, 4, 100)
+    xsh = XDSScalerHelper()
+    xsh.set_working_directory(tmpdir.strpath)
+    log_files = []
+
+    def fake_pointless(fail_for=()):
+        log_files.append("%i_pointless.log" % (len(log_files) + 1))
+        return _FakePointless(log_files[-1], fail_for)
+
+    monkeypatch.setattr(xsh, "Pointless", fake_pointless)
+    _FakePointless.max_running = 0
+    project_info = {"SWEEP%i.HKL" % k: ("P", "X", "D%i" % k) for k in range(1, 5)}
+    data_map = xsh.split_and_convert_xscale_output(xscale_hkl, "SCALED_", project_info)
+    assert data_map == {
+        "SWEEP%i.HKL" % k: tmpdir.join("SCALED_SWEEP%i.mtz" % k).strpath
+        for k in range(1, 5)
+    }
+    assert all(os.path.exists(hklout) for hklout in data_map.values())
+    assert _FakePointless.max_running == nproc
+
+    # all of the failures are reported together, with their log files
+    monkeypatch.setattr(
+        xsh,
+        "Pointless",
+        lambda: fake_pointless(fail_for=("SCALED_SWEEP2.HKL", "SCALED_SWEEP4.HKL")),
+    )
+    log_files.clear()
+    with pytest.raises(RuntimeError) as e:
+        xsh.split_and_convert_xscale_output(xscale_hkl, "SCALED_", project_info)
+    assert "failed for 2 of 4 data sets" in str(e.value)
+    assert "SWEEP2.HKL: pointless failed (see 2_pointless.log)" in str(e.value)
+    assert "SWEEP4.HKL: pointless failed (see 4_pointless.log)" in str(e.value)
+
+
+def _time_and_peak_memory(func, *args):
+    t0 = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def test_benchmark_against_reference(tmpdir):
+    xscale_hkl = tmpdir.join("XSCALE.HKL").strpath
+    _write_xscale_ascii(xscale_hkl, 20, 200000)
+    xsh = XDSScalerHelper()
+    xsh.set_working_directory(tmpdir.strpath)
+
+    t_streaming, peak_streaming = _time_and_peak_memory(
+        xsh._split_xscale_ascii_file, xscale_hkl, "SCALED_"
+    )
+    t_reference, peak_reference = _time_and_peak_memory(
+        _reference_split, xscale_hkl, "REFERENCE_", tmpdir.strpath
+    )
+
+    # bounded by the I/O buffers rather than the size of the file
+    size = os.path.getsize(xscale_hkl)
+    assert peak_streaming < 8e6
+    assert peak_reference > size
+    print(
+        "%.0f MB: streaming %.2fs peak %.1f MB, reference %.2fs peak %.1f MB"
+        % (
+            size / 1e6,
+            t_streaming,
+            peak_streaming / 1e6,
+            t_reference,
+            peak_reference / 1e6,
+        )
+    )
@@ -0,0 +1,102 @@
+import random
+import time
+
+import pytest
+from cctbx import crystal, miller
+from cctbx.array_family import flex
+
+from xia2.Modules.DeltaCcHalf import DeltaCcHalf
+
+
+def _datasets(n_datasets, n_batches, d_min, seed=0):
+    """Simulated unmerged intensities and batches for n_datasets, each
+    sampling the true intensities with a different amount of noise."""
+    random.seed(seed)
+    cs = crystal.symmetry((40, 50, 60, 90, 90, 90), "P 21 21 21")
+    p1 = miller.build_set(
+        crystal.symmetry(cs.unit_cell().parameters(), "P 1"),
+        anomalous_flag=True,
+        d_min=d_min,
+    )
+    true_i = {}
+    intensities = []
+    batches = []
+    for k in range(n_datasets):
+        noise = random.uniform(0.05, 0.5)
+        indices = flex.miller_index()
+        data = flex.double()
+        sigmas = flex.double()
+        batch = flex.int()
+        for h in p1.indices():
+            if random.random() < 0.3:
+                i = true_i.setdefault(h, random.expovariate(1 / 1000))
+                sigma = noise * i + 10
+                indices.append(h)
+                data.append(random.gauss(i, sigma))
+                sigmas.append(sigma if random.random() > 0.01 else 0)
+                batch.append(random.randint(1, n_batches))
+        ms = miller.set(cs, indices, anomalous_flag=False)
+        intensities.append(
+            miller.array(ms, data, sigmas).set_observation_type_xray_intensity()
+        )
+        batches.append(miller.array(ms, batch))
+    return intensities, batches
+
+
+def _reference_ccs(result):
+    # CC½ excluding each group, rebuilding the data set for every group
+    ccs = flex.double()
+    for (group_start, group_end), test_k in zip(
+        result._group_to_batches, result._group_to_dataset_id
+    ):
+        batches = result.batches[test_k].data()
+        group_sel = (batches >= group_start) & (batches <= group_end)
+        indices_i = flex.miller_index()
+        data_i = flex.double()
+        sigmas_i = flex.double()
+        for k, unmerged in enumerate(result.intensities):
+            if k == test_k:
+                unmerged = unmerged.select(~group_sel)
+            indices_i.extend(unmerged.indices())
+            data_i.extend(unmerged.data())
+            sigmas_i.extend(unmerged.sigmas())
+        unmerged_i = result.intensities[0].customized_copy(
+            indices=indices_i, data=data_i, sigmas=sigmas_i
+        )
+        ccs.append(result._compute_mean_weighted_cc_half(unmerged_i))
+    return ccs
+
+
+@pytest.mark.parametrize("cc_one_half_method", ["sigma_tau", "half_dataset"])
+@pytest.mark.parametrize("group_size", [None, 7])
+def test_delta_cc_half_matches_reference(cc_one_half_method, group_size):
+    intensities, batches = _datasets(5, 30, d_min=3.0)
+    result = DeltaCcHalf(
+        intensities,
+        batches,
+        n_bins=10,
+        cc_one_half_method=cc_one_half_method,
+        group_size=group_size,
+    )
+    assert len(result.cc_half) == (5 if group_size is None else 25)
+    assert list(result.cc_half) == pytest.approx(
+        list(_reference_ccs(result)), abs=1e-10
+    )
+    assert flex.max(flex.abs(result.delta_cc_half)) > 0
+
+
+def test_benchmark_against_reference():
+    intensities, batches = _datasets(20, 50, d_min=2.5)
+    t0 = time.perf_counter()
+    result = DeltaCcHalf(intensities, batches, group_size=10)
+    t_incremental = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    reference = _reference_ccs(result)
+    t_reference = time.perf_counter() - t0
+
+    assert list(result.cc_half) == pytest.approx(list(reference), abs=1e-10)
+    print(
+        "%i groups: incremental %.2fs, rebuilding %.2fs"
+        % (len(reference), t_incremental, t_reference)
+    )
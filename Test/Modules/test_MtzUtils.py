@@ -0,0 +1,84 @@
+import os
+
+import iotbx.mtz
+import pytest
+from cctbx import crystal, miller
+from cctbx.array_family import flex
+
+from xia2.Modules import MtzUtils
+from xia2.Modules.Mtzdump import Mtzdump
+
+
+def _write_mtz(filename, n_batches):
+    """Write an MTZ file with two datasets and n_batches batches."""
+
+    symmetry = crystal.symmetry(
+        unit_cell=(40, 50, 60, 90, 90, 90), space_group_symbol="P 21 21 21"
+    )
+    miller_set = miller.build_set(symmetry, anomalous_flag=False, d_min=3)
+    intensities = miller_set.array(
+        data=flex.double(miller_set.size(), 100),
+        sigmas=flex.double(miller_set.size(), 10),
+    ).set_observation_type_xray_intensity()
+    dataset = intensities.as_mtz_dataset(
+        column_root_label="I",
+        wavelength=0.979,
+        crystal_name="crystal",
+        project_name="project",
+        dataset_name="peak",
+    )
+    dataset.mtz_crystal().add_dataset("remote", 0.9).add_miller_array(
+        intensities, column_root_label="IREMOTE"
+    )
+    mtz_obj = dataset.mtz_object()
+    for j in range(n_batches):
+        mtz_obj.add_batch().set_num(j + 101)
+    mtz_obj.write(filename)
+    return miller_set.size()
+
+
+def test_read_mtz_header(tmp_path):
+    filename = str(tmp_path / "test.mtz")
+    nref = _write_mtz(filename, 5)
+
+    header = MtzUtils.read_mtz_header(filename)
+    mtz_obj = iotbx.mtz.object(filename)
+    assert header.n_reflections == mtz_obj.n_reflections() == nref
+    assert header.space_group_name == mtz_obj.space_group_name()
+    assert header.space_group() == mtz_obj.space_group()
+    assert header.batches == [b.num() for b in mtz_obj.batches()]
+    assert header.column_labels == [c.label() for c in mtz_obj.columns()]
+    assert header.column_types == [c.type() for c in mtz_obj.columns()]
+    assert header.resolution_range == pytest.approx(mtz_obj.max_min_resolution())
+    assert [(d.crystal, d.dataset, d.id) for d in header.datasets] == [
+        ("crystal", "peak", 0),
+        ("crystal", "remote", 1),
+    ]
+
+    assert MtzUtils.space_group_name_from_mtz(filename) == "P 21 21 21"
+    assert MtzUtils.space_group_number_from_mtz(filename) == 19
+    assert MtzUtils.batches_from_mtz(filename) == [101, 102, 103, 104, 105]
+    assert MtzUtils.nref_from_mtz(filename) == nref
+
+    md = Mtzdump()
+    md.set_hklin(filename)
+    md.dump()
+    assert md.get_datasets() == ["project/crystal/peak", "project/crystal/remote"]
+    info = md.get_dataset_info("project/crystal/remote")
+    assert info["spacegroup"] == mtz_obj.space_group_name()
+    assert info["wavelength"] == 0.9
+    assert info["cell"] == (40, 50, 60, 90, 90, 90)
+    assert md.get_batches() == [101, 102, 103, 104, 105]
+    assert md.get_reflections() == nref
+
+
+def test_read_mtz_header_cached(tmp_path):
+    filename = str(tmp_path / "test.mtz")
+    _write_mtz(filename, 5)
+    header = MtzUtils.read_mtz_header(filename)
+    assert MtzUtils.read_mtz_header(filename) is header
+
+    # the header is read again once the file has changed
+    _write_mtz(filename, 3)
+    os.utime(filename, ns=(0, 0))
+    assert MtzUtils.batches_from_mtz(filename) == [101, 102, 103]
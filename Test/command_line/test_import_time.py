@@ -0,0 +1,128 @@
+"""Startup time of the xia2 command line programs, measured with
+python -X importtime: run with -s to see the time taken to import each of
+them (and the slowest of the modules they import directly), or run this
+file as a script for a table of all of them."""
+
+import os
+import pkgutil
+import subprocess
+import sys
+
+import pytest
+
+import xia2.command_line
+
+
+def _is_entry_point(path, name):
+    # leave out the few scripts which do their work on import
+    with open(os.path.join(path, name + ".py")) as fh:
+        return 'if __name__ == "__main__":' in fh.read()
+
+
+entry_points = sorted(
+    name
+    for finder, name, _ in pkgutil.iter_modules(xia2.command_line.__path__)
+    if _is_entry_point(finder.path, name)
+)
+
+# modules which must not be imported just to start up (for xia2 -help or
+# -version, say) as they take a large part of a second or more to import
+heavy_modules = ("cctbx", "dials", "dxtbx", "h5py", "iotbx", "xia2.Schema")
+
+
+def import_times(module):
+    """Import module in a new interpreter, returning a list of (name,
+    depth, cumulative import time in seconds) for every module imported
+    along the way, in the order in which they finished importing."""
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import %s" % module],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    if result.returncode:
+        error = [
+            record
+            for record in result.stderr.strip().split("\n")
+            if not record.startswith("import time:")
+        ]
+        last_line = error[-1] if error else "exit status %d" % result.returncode
+        if "ModuleNotFoundError" in last_line and "xia2" not in last_line:
+            pytest.skip("cannot import %s: %s" % (module, last_line))
+        raise RuntimeError(
+            "import %s failed: %s" % (module, "\n".join(error) or last_line)
+        )
+
+    # import time: self [us] | cumulative | imported package
+    times = []
+    for record in result.stderr.split("\n"):
+        if not record.startswith("import time:") or "imported package" in record:
+            continue
+        _, cumulative, name = record.split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        times.append((name.strip(), depth, int(cumulative) * 1e-6))
+    return times
+
+
+def summarise(module):
+    """The time taken to import module, and the slowest of the modules it
+    imports directly."""
+
+    times = import_times(module)
+    total = next(t for name, depth, t in times if name == module)
+    children = []
+    for name, depth, t in reversed(times):
+        if name == module:
+            children = []
+        elif depth == 1:
+            children.append((t, name))
+    return total, sorted(children, reverse=True)[:3]
+
+
+@pytest.mark.parametrize("name", entry_points)
+def test_import_time(name):
+    module = "xia2.command_line.%s" % name
+    total, slowest = summarise(module)
+    print(
+        "%-32s %8.1f ms  (%s)"
+        % (name, total * 1e3, ", ".join("%s %.1f" % (n, t * 1e3) for t, n in slowest))
+    )
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "xia2.command_line.xia2_main",
+        "xia2.command_line.setup",
+        "xia2.command_line.index",
+        "xia2.Applications.xia2_helpers",
+        "xia2.Handlers.Phil",
+    ],
+)
+def test_lazy_imports(module):
+    baseline = {name for name, depth, t in import_times("sys")}
+    imported = {name for name, depth, t in import_times(module)} - baseline
+    assert not [
+        name
+        for name in imported
+        if any(name == m or name.startswith(m + ".") for m in heavy_modules)
+    ]
+
+
+if __name__ == "__main__":
+    results = []
+    for name in entry_points:
+        try:
+            results.append((summarise("xia2.command_line.%s" % name), name))
+        except (RuntimeError, pytest.skip.Exception) as e:
+            print("%-32s %s" % (name, str(e).strip().split("\n")[-1]))
+    for (total, slowest), name in sorted(results, reverse=True):
+        print(
+            "%-32s %8.1f ms  (%s)"
+            % (
+                name,
+                total * 1e3,
+                ", ".join("%s %.1f" % (n, t * 1e3) for t, n in slowest),
+            )
+        )
@@ -0,0 +1,61 @@
+import base64
+import json
+
+import numpy as np
+import pytest
+from cctbx import crystal, miller
+from cctbx.array_family import flex
+
+from xia2.command_line.plot_multiplicity import master_phil, plot_multiplicity
+
+
+@pytest.fixture
+def intensities():
+    cs = crystal.symmetry((50, 60, 70, 90, 90, 90), "P212121")
+    ms = miller.build_set(cs, anomalous_flag=False, d_min=4)
+    # multiplicities from 0 (missing) to 3
+    indices = flex.miller_index()
+    for i, hkl in enumerate(ms.indices()):
+        indices.extend(flex.miller_index(i % 4, hkl))
+    return miller.array(
+        miller.set(cs, indices, anomalous_flag=False),
+        data=flex.double(indices.size(), 1),
+    )
+
+
+def decode(array):
+    return np.frombuffer(base64.b64decode(array["bdata"]), dtype=array["dtype"])
+
+
+@pytest.mark.parametrize("slice_axis", ["h", "k", "l"])
+def test_plot_multiplicity(intensities, slice_axis, tmp_path):
+    settings = master_phil.extract()
+    settings.size_inches = (5, 5)
+    settings.show_missing = True
+    settings.slice_axis = slice_axis
+    settings.plot.filename = str(tmp_path / "multiplicities.png")
+
+    plots = {}
+    for binary_arrays in (False, True):
+        settings.json.binary_arrays = binary_arrays
+        settings.json.filename = str(tmp_path / ("%s.json" % binary_arrays))
+        plot_multiplicity(intensities, settings)
+        with open(settings.json.filename) as fh:
+            plots[binary_arrays] = json.load(fh)
+    assert (tmp_path / "multiplicities.png").stat().st_size
+
+    missing, present, text = plots[False]["data"]
+    assert missing["name"] == "missing reflections"
+    assert present["name"] == "multiplicity"
+    assert len(missing["x"]) == len(missing["y"]) > 0
+    assert len(present["x"]) == len(present["y"]) == len(present["marker"]["color"])
+    assert set(present["marker"]["color"]) == {1, 2, 3}
+    assert text["text"] == [a for a in "hkl" if a != slice_axis]
+
+    # the same plot with the points as typed arrays
+    for plain, binary in zip(plots[False]["data"], plots[True]["data"][:2]):
+        assert decode(binary["x"]) == pytest.approx(plain["x"], abs=1e-3)
+        assert decode(binary["y"]) == pytest.approx(plain["y"], abs=1e-3)
+    color = plots[True]["data"][1]["marker"]["color"]
+    assert list(decode(color)) == present["marker"]["color"]
+    assert plots[True]["layout"] == plots[False]["layout"]
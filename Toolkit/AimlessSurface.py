@@ -1,45 +1,74 @@
+import functools
 import math
 
 import numpy as np
-import scitbx.math
 
 
 def order_from_nterm(n):
     return {0: 0, 80: 8, 3: 1, 8: 2, 15: 3, 48: 6, 99: 9, 35: 5, 24: 4, 63: 7}[n]
 
 
-def evaluate_1degree(ClmList):
-    d2r = math.pi / 180.0
-    order = order_from_nterm(len(ClmList))
-    lfg = scitbx.math.log_factorial_generator(2 * order + 1)
-    nsssphe = scitbx.math.nss_spherical_harmonics(order, 50000, lfg)
-    Clm = {}
-    idx = 0
+def _associated_legendre(order, x):
+    """Associated Legendre functions P_l^m(x), including the Condon-Shortley
+    phase, for 0 <= m <= l <= order: returns a dict keyed on (l, m)."""
+
+    P = {(0, 0): np.ones_like(x)}
+    s = np.sqrt(np.clip(1.0 - x * x, 0.0, None))
+    for m in range(1, order + 1):
+        P[(m, m)] = -(2 * m - 1) * s * P[(m - 1, m - 1)]
+    for m in range(0, order):
+        P[(m + 1, m)] = (2 * m + 1) * x * P[(m, m)]
+        for l in range(m + 2, order + 1):
+            P[(l, m)] = (
+                (2 * l - 1) * x * P[(l - 1, m)] - (l + m - 1) * P[(l - 2, m)]
+            ) / (l - m)
+    return P
+
+
+@functools.lru_cache(maxsize=None)
+def _basis(order, step=1):
+    """The real spherical harmonic basis for all l = 1..order, m = -l..l
+    (in the order of the Aimless coefficients) evaluated on a grid of
+    theta = 0..180, phi = 0..360 in steps of step degrees: an array of
+    shape (n_theta * n_phi, n_terms), computed once per order and grid."""
+
+    theta = np.radians(np.arange(0, 181, step, dtype=float))
+    phi = np.radians(np.arange(0, 361, step, dtype=float))
+    P = _associated_legendre(order, np.cos(theta))
+
+    # convert from complex to real according to
+    # http://en.wikipedia.org/wiki/Spherical_harmonics#Real_form
+    sqrt2 = math.sqrt(2)
+    columns = []
     for l in range(1, order + 1):
         for m in range(-l, l + 1):
-            Clm[(l, m)] = ClmList[idx]
-            idx += 1
+            am = abs(m)
+            norm = math.sqrt(
+                (2 * l + 1)
+                / (4 * math.pi)
+                * math.factorial(l - am)
+                / math.factorial(l + am)
+            )
+            if m < 0:
+                azimuthal = sqrt2 * (-1) ** am * np.sin(am * phi)
+            elif m == 0:
+                azimuthal = np.ones_like(phi)
+            else:
+                azimuthal = sqrt2 * (-1) ** am * np.cos(am * phi)
+            columns.append(np.outer(norm * P[(l, am)], azimuthal).ravel())
 
-    abscor = np.empty((1 + 180 // 1, 1 + 360 // 1), float, "C")
-    sqrt2 = math.sqrt(2)
-    for t in range(0, 181, 1):
-        for p in range(0, 361, 1):
-            a = 1.0
-            for l in range(1, order + 1):
-                for m in range(-l, l + 1):
-                    # Ylm = nsssphe.spherical_harmonic(l, m, t*d2r, p*d2r)
-                    # Convert from complex to real according to
-                    # http://en.wikipedia.org/wiki/Spherical_harmonics#Real_form
-                    Ylm = nsssphe.spherical_harmonic(l, abs(m), t * d2r, p * d2r)
-                    if m < 0:
-                        a += Clm[(l, m)] * sqrt2 * ((-1) ** m) * Ylm.imag
-                    elif m == 0:
-                        assert Ylm.imag == 0.0
-                        a += Clm[(l, m)] * Ylm.real
-                    else:
-                        a += Clm[(l, m)] * sqrt2 * ((-1) ** m) * Ylm.real
-            abscor[(t // 1, p // 1)] = a
-    return abscor
+    basis = np.stack(columns, axis=1)
+    basis.flags.writeable = False
+    return basis
+
+
+def evaluate_1degree(ClmList):
+    order = order_from_nterm(len(ClmList))
+    shape = (1 + 180 // 1, 1 + 360 // 1)
+    if not order:
+        return np.ones(shape)
+    basis = _basis(order)
+    return 1.0 + (basis @ np.asarray(ClmList, dtype=float)).reshape(shape)
 
 
 def generate_map(abscor, png_filename):
@@ -18,6 +18,9 @@ and Mosflm."""
 import binascii
 import logging
 import math
+import re
+
+import numpy as np
 
 from xia2.Modules.UnpackByteOffset import pack_values, unpack_values
 
@@ -204,6 +207,8 @@ class BackstopMask:
         self._d21 = compute_fit(distances, d21)
         self._d34 = compute_fit(distances, d34)
 
+        self._mask_cache = {}
+
     def calculate_mask(self, header):
         """Calculate the pixel positions for the mask, given the image
         header."""
@@ -229,13 +234,31 @@ class BackstopMask:
 
         return p1, p2, p3, p4
 
+    def mask_array(self, header):
+        """Return a boolean array of shape (slow, fast) for the image
+        described by header, True for the pixels behind the backstop. The
+        mask is computed once for each distance and image size."""
+
+        nx, ny = map(int, header["size"])
+        key = (header["distance"], nx, ny)
+        if key not in self._mask_cache:
+            mask = self.rectangle(header).mask(nx, ny)
+            mask.flags.writeable = False
+            self._mask_cache[key] = mask
+        return self._mask_cache[key]
+
+    def untrusted_polygon(self, header):
+        """Return the vertices of the mask as a flat list of integer pixel
+        coordinates, as for untrusted.polygon in dials.generate_mask."""
+
+        return [int(round(v)) for p in self.calculate_mask(header) for v in p]
+
     def apply_mask_xds(self, header, cbf_in, cbf_out):
         """Apply the calculated backstop mask to a BKGINIT.cbf - do this
         immediately after the INIT step."""
 
-        r = self.rectangle(header)
-
-        data = open(cbf_in, "rb").read()
+        with open(cbf_in, "rb") as fh:
+            data = fh.read()
 
         start_tag = binascii.unhexlify("0c1a04d5")
 
@@ -246,37 +269,44 @@ class BackstopMask:
         fast = 0
         slow = 0
         length = 0
+        size = None
 
-        for record in cbf_header.split("\n"):
+        for record in cbf_header.decode("latin-1").split("\n"):
             if "X-Binary-Size-Fastest-Dimension" in record:
                 fast = int(record.split()[-1])
             elif "X-Binary-Size-Second-Dimension" in record:
                 slow = int(record.split()[-1])
             elif "X-Binary-Number-of-Elements" in record:
                 length = int(record.split()[-1])
+            elif record.startswith("X-Binary-Size:"):
+                size = int(record.split()[-1])
 
         assert length == fast * slow
         assert fast == int(header["size"][0])
         assert slow == int(header["size"][1])
 
-        values = unpack_values(data[data_offset:], length)
-
-        # or perhaps mask it out a little more cleverly
-
-        limits = r.limits()
-
-        for x in range(int(limits[0]), int(limits[1]) + 1):
-            for y in range(int(limits[2]), int(limits[3]) + 1):
-                j = y * fast + x
-                if r.is_inside((x + 0.5, y + 0.5)):
-                    values[j] = -3
-
-        # and write out the updated file
-
-        result = cbf_header + start_tag + pack_values(values)
-
-        with open(cbf_out, "w") as fh:
-            fh.write(result)
+        # unpack_values reads straight from the file contents, without
+        # making a copy of the compressed data
+        values = unpack_values(memoryview(data)[data_offset:], length)
+        values[self.mask_array(header).ravel()] = -3
+
+        packed = pack_values(values)
+
+        # keep everything after the binary section, updating its size
+        trailer = data[data_offset + size :] if size is not None else b""
+        if size is not None:
+            cbf_header = re.sub(
+                br"X-Binary-Size:\s*\d+",
+                b"X-Binary-Size: %d" % len(packed),
+                cbf_header,
+                count=1,
+            )
+
+        with open(cbf_out, "wb") as fh:
+            fh.write(cbf_header)
+            fh.write(start_tag)
+            fh.write(packed)
+            fh.write(trailer)
 
     def rectangle(self, header):
         """Return a configured rectangle object to test whether pixels are
@@ -332,6 +362,34 @@ class rectangle:
 
         return min(xs), max(xs), min(ys), max(ys)
 
+    def mask(self, nx, ny):
+        """Return a boolean array of shape (ny, nx), True for the pixels with
+        centres inside the rectangle, as for is_inside() - only pixels
+        within the limits() of the rectangle are considered."""
+
+        result = np.zeros((ny, nx), dtype=bool)
+
+        limits = self.limits()
+        x0, x1 = max(int(limits[0]), 0), min(int(limits[1]), nx - 1)
+        y0, y1 = max(int(limits[2]), 0), min(int(limits[3]), ny - 1)
+        if x0 > x1 or y0 > y1:
+            return result
+
+        x = np.arange(x0, x1 + 1) + 0.5
+        y = (np.arange(y0, y1 + 1) + 0.5)[:, np.newaxis]
+
+        inside = np.ones((y1 - y0 + 1, x1 - x0 + 1), dtype=bool)
+        for (a, b, c), sign in (
+            (self._l12, self._in12),
+            (self._l23, self._in23),
+            (self._l34, self._in34),
+            (self._l41, self._in41),
+        ):
+            inside &= sign * (a * x + b * y + c) >= 0.0
+
+        result[y0 : y1 + 1, x0 : x1 + 1] = inside
+        return result
+
     def is_inside(self, p):
         if self._in12 * self._evaluate(self._l12, p) < 0.0:
             return False
@@ -0,0 +1,54 @@
+import math
+import random
+
+import pytest
+import scitbx.math
+
+from xia2.Toolkit.AimlessSurface import _basis, evaluate_1degree
+
+
+def _reference(ClmList, order, t, p):
+    # the spherical harmonic sum as originally evaluated point by point
+    lfg = scitbx.math.log_factorial_generator(2 * order + 1)
+    nsssphe = scitbx.math.nss_spherical_harmonics(order, 50000, lfg)
+    d2r = math.pi / 180.0
+    sqrt2 = math.sqrt(2)
+    a = 1.0
+    idx = 0
+    for l in range(1, order + 1):
+        for m in range(-l, l + 1):
+            Ylm = nsssphe.spherical_harmonic(l, abs(m), t * d2r, p * d2r)
+            if m < 0:
+                a += ClmList[idx] * sqrt2 * ((-1) ** m) * Ylm.imag
+            elif m == 0:
+                a += ClmList[idx] * Ylm.real
+            else:
+                a += ClmList[idx] * sqrt2 * ((-1) ** m) * Ylm.real
+            idx += 1
+    return a
+
+
+@pytest.mark.parametrize("order", [1, 2, 4, 6])
+def test_evaluate_1degree_matches_spherical_harmonics(order):
+    random.seed(order)
+    nterms = (order + 1) ** 2 - 1
+    coefficients = [random.uniform(-0.1, 0.1) for i in range(nterms)]
+    abscor = evaluate_1degree(coefficients)
+    assert abscor.shape == (181, 361)
+    points = [(0, 0), (180, 360), (90, 180)] + [
+        (random.randint(0, 180), random.randint(0, 360)) for i in range(20)
+    ]
+    for t, p in points:
+        assert abscor[t, p] == pytest.approx(
+            _reference(coefficients, order, t, p), abs=1e-10
+        )
+
+
+def test_basis_cached_per_order():
+    assert _basis(2) is _basis(2)
+    assert _basis(2).shape == (181 * 361, 8)
+    assert not _basis(2).flags.writeable
+
+
+def test_evaluate_1degree_no_coefficients():
+    assert (evaluate_1degree([]) == 1.0).all()
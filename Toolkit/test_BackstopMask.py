@@ -0,0 +1,64 @@
+import binascii
+
+import numpy as np
+
+from xia2.Modules.UnpackByteOffset import pack_values, unpack_values
+from xia2.Toolkit.BackstopMask import BackstopMask, rectangle
+
+
+def test_rectangle_mask_matches_is_inside():
+    r = rectangle((0.0, 40.3), (52.7, 45.1), (55.2, 58.9), (0.0, 61.4))
+    nx, ny = 80, 70
+    mask = r.mask(nx, ny)
+    assert mask.shape == (ny, nx)
+    expected = np.zeros((ny, nx), dtype=bool)
+    limits = r.limits()
+    for x in range(int(limits[0]), int(limits[1]) + 1):
+        for y in range(int(limits[2]), int(limits[3]) + 1):
+            expected[y, x] = r.is_inside((x + 0.5, y + 0.5))
+    assert expected.any()
+    assert (mask == expected).all()
+
+
+def _backstop(tmpdir):
+    site_file = tmpdir.join("backstop.dat")
+    site_file.write(
+        "150 0 40 50 45 52 55 0 60\n" "250 0 42 48 46 50 54 0 58 extra comments\n"
+    )
+    return BackstopMask(site_file.strpath)
+
+
+def test_apply_mask_xds(tmpdir):
+    backstop = _backstop(tmpdir)
+    header = {"distance": 200.0, "size": (80, 70)}
+
+    values = np.arange(80 * 70) % 17
+    packed = pack_values(values)
+    cbf_header = (
+        b"###CBF: VERSION 1.5\r\n"
+        b"X-Binary-Size: %d\r\n"
+        b"X-Binary-Number-of-Elements: 5600\r\n"
+        b"X-Binary-Size-Fastest-Dimension: 80\r\n"
+        b"X-Binary-Size-Second-Dimension: 70\r\n\r\n" % len(packed)
+    )
+    trailer = b"\r\n--CIF-BINARY-FORMAT-SECTION----\r\n;\r\n"
+    start_tag = binascii.unhexlify("0c1a04d5")
+    tmpdir.join("BKGINIT.sav").write_binary(cbf_header + start_tag + packed + trailer)
+
+    backstop.apply_mask_xds(
+        header, tmpdir.join("BKGINIT.sav").strpath, tmpdir.join("BKGINIT.cbf").strpath
+    )
+
+    data = tmpdir.join("BKGINIT.cbf").read_binary()
+    assert data.endswith(trailer)
+    offset = data.find(start_tag) + 4
+    masked = unpack_values(data[offset:], values.size).reshape(70, 80)
+    mask = backstop.mask_array(header)
+    assert mask.any()
+    assert (masked[mask] == -3).all()
+    assert (masked[~mask] == values.reshape(70, 80)[~mask]).all()
+    assert b"X-Binary-Size: %d\r\n" % len(pack_values(masked)) in data
+
+    # the mask is reused for the same geometry
+    assert backstop.mask_array(header) is mask
+    assert len(backstop.untrusted_polygon(header)) == 8
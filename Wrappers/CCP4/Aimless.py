@@ -22,6 +22,9 @@ def Aimless(DriverType=None, absorption_correction=None, decay_correction=None):
             # generic things
             CCP4DriverInstance.__class__.__init__(self)
 
+            # the output is read through once the program has finished
+            self.set_output_buffer(None)
+
             self.set_executable(os.path.join(os.environ.get("CBIN", ""), "aimless"))
 
             if not os.path.exists(self.get_executable()):
@@ -180,6 +183,39 @@ def Aimless(DriverType=None, absorption_correction=None, decay_correction=None):
                     raise RuntimeError("data not scaled")
             return os.path.join(self.get_working_directory(), self._new_scales_file)
 
+        def _declare_output_files(self, unmerged_together=False):
+            """Declare every file which aimless will write, so that the
+            results may be cached. These are named after hklout and the
+            datasets of the runs, so if any dataset name is unknown nothing
+            is declared and the results are not cached."""
+
+            datasets = []
+            for run in self._runs:
+                if not run[5] and run[4] not in datasets:
+                    datasets.append(run[4])
+            if not datasets or None in datasets:
+                return
+
+            # with more than one dataset each is written to its own files
+            root = os.path.splitext(self.get_hklout())[0]
+            if len(datasets) == 1:
+                suffixes = [""]
+            else:
+                suffixes = ["_%s" % dname for dname in datasets]
+            if unmerged_together:
+                self.add_output_file("%s_unmerged.mtz" % root)
+            for suffix in suffixes:
+                for extension in (".mtz", ".sca") if self._scalepack else (".mtz",):
+                    self.add_output_file(root + suffix + extension)
+                    if not unmerged_together:
+                        self.add_output_file(root + "_unmerged" + suffix + extension)
+
+            self.add_output_file("%d_aimless.xml" % self.get_xpid())
+            if self._new_scales_file:
+                self.add_output_file(self._new_scales_file)
+            if self._scales_file:
+                self.add_input_file(self._scales_file)
+
         def set_bfactor(self, bfactor=True, brotation=None):
             """Switch on/off bfactor refinement, optionally with the
             spacing for the bfactor refinement (in degrees.)"""
@@ -472,6 +508,9 @@ def Aimless(DriverType=None, absorption_correction=None, decay_correction=None):
                 self.get_working_directory(), "%d_aimless.xml" % self.get_xpid()
             )
 
+            self._declare_output_files(
+                unmerged_together=self._chef_unmerged and not self._scalepack
+            )
             self.start()
 
             nproc = PhilIndex.params.xia2.settings.multiprocessing.nproc
@@ -665,6 +704,7 @@ def Aimless(DriverType=None, absorption_correction=None, decay_correction=None):
                     )
                 )
 
+            self._declare_output_files()
             self.start()
 
             self._xmlout = os.path.join(
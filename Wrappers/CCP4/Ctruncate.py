@@ -1,6 +1,7 @@
 import logging
 import os
 
+from xia2.Decorators.CCP4Decorator import LoggraphParser
 from xia2.Driver.DriverFactory import DriverFactory
 from xia2.Handlers.Citations import Citations
 from xia2.lib.bits import transpose_loggraph
@@ -38,6 +39,19 @@ def Ctruncate(DriverType=None):
 
             self._xmlout = None
 
+            self._nref = 0
+            self._loggraph = {}
+            self._loggraph_parser = LoggraphParser()
+            self.add_output_parser(self._parse_output)
+            self.add_output_parser(self._loggraph_parser)
+
+        def _parse_output(self, record):
+            if "Number of reflections:" in record:
+                self._nref = int(record.split()[-1])
+
+            if "Estimate of Wilson B factor:" in record:
+                self._b_factor = float(record.split(":")[1].split()[0])
+
         def set_hklin(self, hklin):
             self._hklin = hklin
 
@@ -98,16 +112,7 @@ def Ctruncate(DriverType=None):
                 logger.debug(str(e))
                 raise RuntimeError("ctruncate failure")
 
-            nref = 0
-
-            for record in self.get_all_output():
-                if "Number of reflections:" in record:
-                    nref = int(record.split()[-1])
-
-                if "Estimate of Wilson B factor:" in record:
-                    self._b_factor = float(record.split(":")[1].split()[0])
-
-            self._nref_in, self._nref_out = nref, nref
+            self._nref_in, self._nref_out = self._nref, self._nref
             self._nabsent = 0
 
             moments = None
@@ -143,53 +148,10 @@ def Ctruncate(DriverType=None):
             return self._nabsent
 
         def parse_ccp4_loggraph(self):
-            """Look through the standard output of the program for
-            CCP4 loggraph text. When this is found store it in a
-            local dictionary to allow exploration."""
-
-            # reset the loggraph store
-            self._loggraph = {}
-
-            output = self.get_all_output()
-
-            for i in range(len(output)):
-                line = output[i]
-                if "$TABLE" in line:
-
-                    n_dollar = line.count("$$")
-
-                    current = line.split(":")[1].replace(">", "").strip()
-                    self._loggraph[current] = {}
-                    self._loggraph[current]["columns"] = []
-                    self._loggraph[current]["data"] = []
-
-                    loggraph_info = ""
-
-                    while n_dollar < 4:
-                        n_dollar += line.count("$$")
-                        loggraph_info += line
-
-                        if n_dollar == 4:
-                            break
-
-                        i += 1
-                        line = output[i]
-
-                    tokens = loggraph_info.split("$$")
-                    self._loggraph[current]["columns"] = tokens[1].split()
-
-                    if len(tokens) < 4:
-                        raise RuntimeError('loggraph "%s" broken' % current)
-
-                    data = tokens[3].split("\n")
-
-                    columns = len(self._loggraph[current]["columns"])
-
-                    for record in data:
-                        record = record.split()
-                        if len(record) == columns:
-                            self._loggraph[current]["data"].append(record)
+            """Get the CCP4 loggraph tables found in the standard output of
+            the program, as a dictionary to allow exploration."""
 
+            self._loggraph = self._loggraph_parser.get_tables()
             return self._loggraph
 
     return CtruncateWrapper()
@@ -29,9 +29,14 @@ def Matthews_coef(DriverType=None):
             # results
 
             self._solvent = 0.0
+            self.add_output_parser(self._parse_output)
 
             return
 
+        def _parse_output(self, line):
+            if "Assuming protein density" in line:
+                self._solvent = 0.01 * float(line.split()[-1])
+
         # setters follow
 
         def set_nmol(self, nmol):
@@ -67,12 +72,6 @@ def Matthews_coef(DriverType=None):
             self.check_for_errors()
             self.check_ccp4_errors()
 
-            # get the useful information out from here...
-
-            for line in self.get_all_output():
-                if "Assuming protein density" in line:
-                    self._solvent = 0.01 * float(line.split()[-1])
-
             return
 
         def get_solvent(self):
@@ -49,8 +49,6 @@ def Mtz2various(DriverType=None):
 
             self.close_wait()
 
-            self.get_all_output()
-
             try:
                 self.check_for_errors()
                 self.check_ccp4_errors()
@@ -82,8 +80,6 @@ def Mtz2various(DriverType=None):
 
             self.close_wait()
 
-            self.get_all_output()
-
             try:
                 self.check_for_errors()
                 self.check_ccp4_errors()
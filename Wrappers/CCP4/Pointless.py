@@ -50,6 +50,9 @@ def Pointless(DriverType=None):
             # generic things
             CCP4DriverInstance.__class__.__init__(self)
 
+            # the output is read through once the program has finished
+            self.set_output_buffer(None)
+
             self.set_executable(os.path.join(os.environ.get("CBIN", ""), "pointless"))
 
             self._input_laue_group = None
@@ -126,6 +129,7 @@ def Pointless(DriverType=None):
 
             self.add_command_line("-c")
             self.check_hklin()
+            self.add_output_file(summedlist)
 
             self.start()
             self.input("output summedlist %s" % summedlist)
@@ -148,6 +152,7 @@ def Pointless(DriverType=None):
 
             self.check_hklin()
             self.check_hklout()
+            self.add_output_file(self.get_hklout())
 
             self.add_command_line("-c")
 
@@ -164,6 +169,8 @@ def Pointless(DriverType=None):
                 raise RuntimeError("XDSIN not set")
 
             self.check_hklout()
+            self.add_input_file(self._xdsin)
+            self.add_output_file(self.get_hklout())
 
             # -c for copy - just convert the file to MTZ multirecord
             self.add_command_line("-c")
@@ -216,6 +223,9 @@ def Pointless(DriverType=None):
 
             self.add_command_line("xmlout")
             self.add_command_line("%d_pointless.xml" % self.get_xpid())
+            self.add_output_file("%d_pointless.xml" % self.get_xpid())
+            if self.get_hklout():
+                self.add_output_file(self.get_hklout())
 
             if self._hklref:
                 self.add_command_line("hklref")
@@ -506,9 +516,13 @@ def Pointless(DriverType=None):
 
             self.add_command_line("xmlout")
             self.add_command_line("%d_pointless.xml" % self.get_xpid())
+            self.add_output_file("%d_pointless.xml" % self.get_xpid())
 
             self.add_command_line("hklout")
             self.add_command_line("pointless.mtz")
+            self.add_output_file("pointless.mtz")
+            if self.get_hklout():
+                self.add_output_file(self.get_hklout())
 
             self.start()
 
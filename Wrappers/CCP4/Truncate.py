@@ -29,6 +29,9 @@ def Truncate(DriverType=None):
             # generic things
             CCP4DriverInstance.__class__.__init__(self)
 
+            # the output is read through once the program has finished
+            self.set_output_buffer(None)
+
             self.set_executable(os.path.join(os.environ.get("CBIN", ""), "truncate"))
 
             self._anomalous = False
@@ -13,6 +13,9 @@ def CheckIndexingSymmetry(DriverType=None):
     class CheckIndexingSymmetryWrapper(DriverInstance.__class__):
         def __init__(self):
             DriverInstance.__class__.__init__(self)
+
+            # the output is read through once the program has finished
+            self.set_output_buffer(None)
             self.set_executable("dials.check_indexing_symmetry")
 
             self._experiments_filename = None
@@ -16,6 +16,11 @@ def EstimateGain(DriverType=None):
             self._sweep_filename = None
             self._kernel_size = None
             self._gain = None
+            self.add_output_parser(self._parse_output)
+
+        def _parse_output(self, line):
+            if "Estimated gain:" in line:
+                self._gain = float(line.split(":")[-1].strip())
 
         def set_sweep_filename(self, sweep_filename):
             self._sweep_filename = sweep_filename
@@ -37,8 +42,4 @@ def EstimateGain(DriverType=None):
             self.close_wait()
             self.check_for_errors()
 
-            for line in self.get_all_output():
-                if "Estimated gain:" in line:
-                    self._gain = float(line.split(":")[-1].strip())
-
     return EstimateGainWrapper()
@@ -39,6 +39,19 @@ def EstimateResolution(DriverType=None):
             self._resolution_misigma = None
             self._html = None
             self._json = None
+            self.add_output_parser(self._parse_output)
+
+        def _parse_output(self, record):
+            if "Resolution rmerge" in record:
+                self._resolution_rmerge = float(record.split()[-1])
+            if "Resolution completeness" in record:
+                self._resolution_completeness = float(record.split()[-1])
+            if "Resolution cc_half" in record:
+                self._resolution_cc_half = float(record.split()[-1])
+            if "Resolution I/sig" in record:
+                self._resolution_isigma = float(record.split()[-1])
+            if "Resolution Mn(I/sig)" in record:
+                self._resolution_misigma = float(record.split()[-1])
 
         def set_reflections(self, filename):
             self._reflections = filename
@@ -139,16 +152,5 @@ def EstimateResolution(DriverType=None):
 
             self.start()
             self.close_wait()
-            for record in self.get_all_output():
-                if "Resolution rmerge" in record:
-                    self._resolution_rmerge = float(record.split()[-1])
-                if "Resolution completeness" in record:
-                    self._resolution_completeness = float(record.split()[-1])
-                if "Resolution cc_half" in record:
-                    self._resolution_cc_half = float(record.split()[-1])
-                if "Resolution I/sig" in record:
-                    self._resolution_isigma = float(record.split()[-1])
-                if "Resolution Mn(I/sig)" in record:
-                    self._resolution_misigma = float(record.split()[-1])
 
     return EstimateResolutionWrapper()
@@ -20,6 +20,9 @@ def ExportSpotXDS(DriverType=None, params=None):
         def __init__(self, params=None):
             super().__init__()
 
+            # the output is printed once the program has finished
+            self.set_output_buffer(None)
+
             # phil parameters
 
             if not params:
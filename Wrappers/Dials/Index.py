@@ -55,6 +55,15 @@ def Index(DriverType=None):
             self._outlier_algorithm = None
             self._close_to_spindle_cutoff = None
 
+            self._no_suitable_lattice = False
+            self.add_output_parser(self._parse_output)
+
+        def _parse_output(self, record):
+            if "No suitable lattice could be found" in record:
+                self._no_suitable_lattice = True
+            if "Too few reflections to parameterise" in record:
+                logger.debug(record.strip())
+
         def add_sweep_filename(self, sweep_filename):
             self._sweep_filenames.append(sweep_filename)
 
@@ -197,6 +206,7 @@ def Index(DriverType=None):
             self.add_command_line("output.experiments=%s" % self._experiment_filename)
             self.add_command_line("output.reflections=%s" % self._indexed_filename)
 
+            self._no_suitable_lattice = False
             self.start()
             self.close_wait()
 
@@ -204,31 +214,26 @@ def Index(DriverType=None):
                 self._indexed_filename
             ):
                 # Indexing failed
-                with open(self.get_log_file()) as fh:
-                    if "No suitable lattice could be found" in fh.read():
-                        raise libtbx.utils.Sorry(
-                            "No suitable indexing solution could be found.\n\n"
-                            "You can view the reciprocal space with:\n"
-                            "dials.reciprocal_lattice_viewer %s"
-                            % " ".join(
-                                os.path.normpath(
-                                    os.path.join(self.get_working_directory(), p)
-                                )
-                                for p in self._sweep_filenames + self._spot_filenames
+                if self._no_suitable_lattice:
+                    raise libtbx.utils.Sorry(
+                        "No suitable indexing solution could be found.\n\n"
+                        "You can view the reciprocal space with:\n"
+                        "dials.reciprocal_lattice_viewer %s"
+                        % " ".join(
+                            os.path.normpath(
+                                os.path.join(self.get_working_directory(), p)
                             )
+                            for p in self._sweep_filenames + self._spot_filenames
                         )
-                    else:
-                        raise RuntimeError(
-                            "dials.index failed, see log file for more details: %s"
-                            % self.get_log_file()
-                        )
+                    )
+                else:
+                    raise RuntimeError(
+                        "dials.index failed, see log file for more details: %s"
+                        % self.get_log_file()
+                    )
 
             self.check_for_errors()
 
-            for record in self.get_all_output():
-                if "Too few reflections to parameterise" in record:
-                    logger.debug(record.strip())
-
             self._experiment_list = load.experiment_list(self._experiment_filename)
             self._reflections = flex.reflection_table.from_file(self._indexed_filename)
 
@@ -51,6 +51,18 @@ def Integrate(DriverType=None):
 
             self._integration_report = {}
 
+            # the message (of three lines) if there were too few reflections
+            # for profile modelling
+            self._profile_modelling_error = []
+            self.add_output_parser(self._parse_output)
+
+        def _parse_output(self, record):
+            if self._profile_modelling_error:
+                if len(self._profile_modelling_error) < 3:
+                    self._profile_modelling_error.append(record.strip())
+            elif "Too few reflections for profile modelling" in record:
+                self._profile_modelling_error.append(record.strip())
+
         def get_per_image_statistics(self):
             return self._per_image_statistics
 
@@ -203,17 +215,17 @@ def Integrate(DriverType=None):
                     "gaussian_rs.min_spots.overall=%d" % self._min_spots_overall
                 )
 
+            self._profile_modelling_error = []
             self.start()
             self.close_wait()
 
-            dials_output = self.get_all_output()
-            for n, record in enumerate(dials_output):
-                if "Too few reflections for profile modelling" in record:
-                    raise DIALSIntegrateError(
-                        "%s\n%s, %s\nsee %%s for more details"
-                        % tuple(dials_output[n + i].strip() for i in (0, 1, 2))
-                        % self.get_log_file()
-                    )
+            if self._profile_modelling_error:
+                message = (self._profile_modelling_error + ["", ""])[:3]
+                raise DIALSIntegrateError(
+                    "%s\n%s, %s\nsee %%s for more details"
+                    % tuple(message)
+                    % self.get_log_file()
+                )
 
             self.check_for_errors()
 
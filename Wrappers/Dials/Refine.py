@@ -37,6 +37,13 @@ def Refine(DriverType=None):
             self.tie_to_target = []
             self.tie_to_group = []
 
+            self._too_few_reflections = None
+            self.add_output_parser(self._parse_output)
+
+        def _parse_output(self, record):
+            if "Sorry: Too few reflections to" in record:
+                self._too_few_reflections = record.strip()
+
         def set_experiments_filename(self, experiments_filename):
             self._experiments_filename = experiments_filename
 
@@ -158,6 +165,7 @@ def Refine(DriverType=None):
             if self._phil_file is not None:
                 self.add_command_line(self._phil_file)
 
+            self._too_few_reflections = None
             self.start()
             self.close_wait()
 
@@ -168,9 +176,8 @@ def Refine(DriverType=None):
                     "DIALS did not refine the data, see log file for more details:  %s"
                     % self.get_log_file()
                 )
-            for record in self.get_all_output():
-                if "Sorry: Too few reflections to" in record:
-                    raise RuntimeError(record.strip())
+            if self._too_few_reflections:
+                raise RuntimeError(self._too_few_reflections)
 
             self.check_for_errors()
 
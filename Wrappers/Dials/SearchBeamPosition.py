@@ -22,6 +22,7 @@ def SearchBeamPosition(DriverType=None):
             self._optimized_filename = None
             self._phil_file = None
             self._image_range = None
+            self._nproc = None
 
         def set_sweep_filename(self, sweep_filename):
             self._sweep_filename = sweep_filename
@@ -35,6 +36,9 @@ def SearchBeamPosition(DriverType=None):
         def set_image_range(self, image_range):
             self._image_range = image_range
 
+        def set_nproc(self, nproc):
+            self._nproc = nproc
+
         def get_optimized_experiments_filename(self):
             return self._optimized_filename
 
@@ -44,7 +48,7 @@ def SearchBeamPosition(DriverType=None):
             self.clear_command_line()
             self.add_command_line(self._sweep_filename)
             self.add_command_line(self._spot_filename)
-            nproc = PhilIndex.params.xia2.settings.multiprocessing.nproc
+            nproc = self._nproc or PhilIndex.params.xia2.settings.multiprocessing.nproc
             self.set_cpu_threads(nproc)
             self.add_command_line("nproc=%i" % nproc)
             if self._image_range:
@@ -62,8 +66,6 @@ def SearchBeamPosition(DriverType=None):
             self.close_wait()
             self.check_for_errors()
 
-            self.get_all_output()
-
             assert os.path.exists(self._optimized_filename), self._optimized_filename
 
     return SearchBeamPositionWrapper()
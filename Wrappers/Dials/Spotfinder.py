@@ -33,6 +33,12 @@ def Spotfinder(DriverType=None):
             self._write_hot_mask = False
             self._hot_mask_prefix = None
             self._gain = None
+            self._nproc = None
+            self.add_output_parser(self._parse_output)
+
+        def _parse_output(self, record):
+            if record.startswith("Saved") and "reflections to" in record:
+                self._nspots = int(record.split()[1])
 
         def set_input_sweep_filename(self, sweep_filename):
             self._input_sweep_filename = sweep_filename
@@ -88,6 +94,9 @@ def Spotfinder(DriverType=None):
         def set_gain(self, gain):
             self._gain = gain
 
+        def set_nproc(self, nproc):
+            self._nproc = nproc
+
         def run(self):
             logger.debug("Running dials.find_spots")
 
@@ -98,7 +107,7 @@ def Spotfinder(DriverType=None):
                     "output.experiments=%s" % self._output_sweep_filename
                 )
             self.add_command_line("output.reflections=%s" % self._input_spot_filename)
-            nproc = PhilIndex.params.xia2.settings.multiprocessing.nproc
+            nproc = self._nproc or PhilIndex.params.xia2.settings.multiprocessing.nproc
             njob = PhilIndex.params.xia2.settings.multiprocessing.njob
             mp_mode = PhilIndex.params.xia2.settings.multiprocessing.mode
             mp_type = PhilIndex.params.xia2.settings.multiprocessing.type
@@ -142,8 +151,4 @@ def Spotfinder(DriverType=None):
             self.close_wait()
             self.check_for_errors()
 
-            for record in self.get_all_output():
-                if record.startswith("Saved") and "reflections to" in record:
-                    self._nspots = int(record.split()[1])
-
     return SpotfinderWrapper()
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+from xia2.Wrappers.Dials.EstimateResolution import EstimateResolution
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs a shell script")
+def test_estimate_resolution_output(tmp_path, monkeypatch):
+    # stand in for dials.estimate_resolution, which prints its results
+    script = tmp_path / "dials.estimate_resolution"
+    script.write_text("#!/bin/sh\necho 'Resolution cc_half:       1.53'\n")
+    os.chmod(str(script), 0o755)
+    monkeypatch.setenv("PATH", str(tmp_path), prepend=os.pathsep)
+
+    estimater = EstimateResolution()
+    assert estimater.get_json() is None
+    estimater.set_working_directory(str(tmp_path))
+    estimater.set_hklin("scaled.mtz")
+    estimater.run()
+    assert estimater.get_resolution_cc_half() == 1.53
+    assert estimater.get_json() == os.path.join(
+        str(tmp_path), "%d_dials.estimate_resolution.json" % estimater.get_xpid()
+    )
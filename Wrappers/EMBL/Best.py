@@ -12,6 +12,9 @@ def BestStrategy(DriverType=None):
         def __init__(self):
             DriverInstance.__class__.__init__(self)
 
+            # the output is read through once the program has finished
+            self.set_output_buffer(None)
+
             self.set_executable("best")
 
             # Input parameters - lower case per frame
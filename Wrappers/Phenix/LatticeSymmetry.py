@@ -14,6 +14,9 @@ def LatticeSymmetry(DriverType=None):
         def __init__(self):
             DriverInstance.__class__.__init__(self)
 
+            # the output is read through once the program has finished
+            self.set_output_buffer(None)
+
             self.set_executable("iotbx.lattice_symmetry")
 
             if "phaser-1.3" in self.get_executable():
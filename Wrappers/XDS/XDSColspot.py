@@ -1,7 +1,7 @@
 import os
-import shutil
 
 from xia2.Driver.DriverFactory import DriverFactory
+from xia2.Driver.Staging import stage_file
 from xia2.Handlers.Phil import PhilIndex
 
 # interfaces that this inherits from ...
@@ -132,11 +132,12 @@ def XDSColspot(DriverType=None, params=None):
             xds_inp.close()
 
             # copy the input file...
-            shutil.copyfile(
+            stage_file(
                 os.path.join(self.get_working_directory(), "XDS.INP"),
                 os.path.join(
                     self.get_working_directory(), "%d_COLSPOT.INP" % self.get_xpid()
                 ),
+                link=False,
             )
 
             # write the input data files...
@@ -145,19 +146,26 @@ def XDSColspot(DriverType=None, params=None):
                 src = self._input_data_files[file_name]
                 dst = os.path.join(self.get_working_directory(), file_name)
                 if src != dst:
-                    shutil.copyfile(src, dst)
-
+                    stage_file(
+                        src, dst, link=file_name not in self._output_data_files_list
+                    )
+                self.add_input_file(dst)
+
+            self.add_input_file("XDS.INP")
+            for file_name in ["COLSPOT.LP"] + self._output_data_files_list:
+                self.add_output_file(file_name)
             self.start()
             self.close_wait()
 
             xds_check_version_supported(self.get_all_output())
 
             # copy the LP file
-            shutil.copyfile(
+            stage_file(
                 os.path.join(self.get_working_directory(), "COLSPOT.LP"),
                 os.path.join(
                     self.get_working_directory(), "%d_COLSPOT.LP" % self.get_xpid()
                 ),
+                link=False,
             )
 
             # gather the output files
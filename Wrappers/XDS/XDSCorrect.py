@@ -1,9 +1,9 @@
 import logging
 import os
-import shutil
 
 from cctbx.uctbx import unit_cell
 from xia2.Driver.DriverFactory import DriverFactory
+from xia2.Driver.Staging import stage_file
 from xia2.Handlers.Phil import PhilIndex
 
 # interfaces that this inherits from ...
@@ -288,11 +288,12 @@ def XDSCorrect(DriverType=None, params=None):
             xds_inp.close()
 
             # copy the input file...
-            shutil.copyfile(
+            stage_file(
                 os.path.join(self.get_working_directory(), "XDS.INP"),
                 os.path.join(
                     self.get_working_directory(), "%d_CORRECT.INP" % self.get_xpid()
                 ),
+                link=False,
             )
 
             # write the input data files...
@@ -301,8 +302,20 @@ def XDSCorrect(DriverType=None, params=None):
                 src = self._input_data_files[file_name]
                 dst = os.path.join(self.get_working_directory(), file_name)
                 if src != dst:
-                    shutil.copyfile(src, dst)
-
+                    stage_file(
+                        src, dst, link=file_name not in self._output_data_files_list
+                    )
+                self.add_input_file(dst)
+
+            self.add_input_file("XDS.INP")
+            for file_name in [
+                "CORRECT.LP",
+                "XDS_ASCII.HKL",
+                "ABSORP.cbf",
+                "DECAY.cbf",
+                "MODPIX.cbf",
+            ] + self._output_data_files_list:
+                self.add_output_file(file_name)
             self.start()
             self.close_wait()
 
@@ -314,11 +327,12 @@ def XDSCorrect(DriverType=None, params=None):
             #   !!! ERROR !!! ILLEGAL SPACE GROUP NUMBER OR UNIT CELL
 
             # copy the LP file
-            shutil.copyfile(
+            stage_file(
                 os.path.join(self.get_working_directory(), "CORRECT.LP"),
                 os.path.join(
                     self.get_working_directory(), "%d_CORRECT.LP" % self.get_xpid()
                 ),
+                link=False,
             )
 
             # gather the output files
@@ -1,8 +1,8 @@
 import logging
 import os
-import shutil
 
 from xia2.Driver.DriverFactory import DriverFactory
+from xia2.Driver.Staging import stage_file
 
 # interfaces that this inherits from ...
 from xia2.Schema.Interfaces.FrameProcessor import FrameProcessor
@@ -134,11 +134,12 @@ def XDSDefpix(DriverType=None):
             xds_inp.close()
 
             # copy the input file...
-            shutil.copyfile(
+            stage_file(
                 os.path.join(self.get_working_directory(), "XDS.INP"),
                 os.path.join(
                     self.get_working_directory(), "%d_DEFPIX.INP" % self.get_xpid()
                 ),
+                link=False,
             )
 
             # write the input data files...
@@ -147,19 +148,26 @@ def XDSDefpix(DriverType=None):
                 src = self._input_data_files[file_name]
                 dst = os.path.join(self.get_working_directory(), file_name)
                 if src != dst:
-                    shutil.copyfile(src, dst)
-
+                    stage_file(
+                        src, dst, link=file_name not in self._output_data_files_list
+                    )
+                self.add_input_file(dst)
+
+            self.add_input_file("XDS.INP")
+            for file_name in ["DEFPIX.LP"] + self._output_data_files_list:
+                self.add_output_file(file_name)
             self.start()
             self.close_wait()
 
             xds_check_version_supported(self.get_all_output())
 
             # copy the LP file
-            shutil.copyfile(
+            stage_file(
                 os.path.join(self.get_working_directory(), "DEFPIX.LP"),
                 os.path.join(
                     self.get_working_directory(), "%d_DEFPIX.LP" % self.get_xpid()
                 ),
+                link=False,
             )
 
             # check the resolution asked for is achievable (if set)
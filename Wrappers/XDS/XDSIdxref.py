@@ -1,9 +1,9 @@
 import logging
 import math
 import os
-import shutil
 
 from xia2.Driver.DriverFactory import DriverFactory
+from xia2.Driver.Staging import stage_file
 from xia2.Experts.LatticeExpert import SortLattices, s2l
 
 # helpful expertise from elsewhere
@@ -314,11 +314,12 @@ def XDSIdxref(DriverType=None, params=None):
             xds_inp.close()
 
             # copy the input file...
-            shutil.copyfile(
+            stage_file(
                 os.path.join(self.get_working_directory(), "XDS.INP"),
                 os.path.join(
                     self.get_working_directory(), "%d_IDXREF.INP" % self.get_xpid()
                 ),
+                link=False,
             )
 
             # write the input data files...
@@ -326,8 +327,14 @@ def XDSIdxref(DriverType=None, params=None):
                 src = self._input_data_files[file_name]
                 dst = os.path.join(self.get_working_directory(), file_name)
                 if src != dst:
-                    shutil.copyfile(src, dst)
+                    stage_file(
+                        src, dst, link=file_name not in self._output_data_files_list
+                    )
+                self.add_input_file(dst)
 
+            self.add_input_file("XDS.INP")
+            for file_name in ["IDXREF.LP"] + self._output_data_files_list:
+                self.add_output_file(file_name)
             self.start()
             self.close_wait()
 
@@ -343,11 +350,12 @@ def XDSIdxref(DriverType=None, params=None):
 
         def continue_from_error(self):
             # copy the LP file
-            shutil.copyfile(
+            stage_file(
                 os.path.join(self.get_working_directory(), "IDXREF.LP"),
                 os.path.join(
                     self.get_working_directory(), "%d_IDXREF.LP" % self.get_xpid()
                 ),
+                link=False,
             )
 
             # parse the output
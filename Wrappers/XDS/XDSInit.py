@@ -1,7 +1,7 @@
 import os
-import shutil
 
 from xia2.Driver.DriverFactory import DriverFactory
+from xia2.Driver.Staging import stage_file
 
 # interfaces that this inherits from ...
 from xia2.Schema.Interfaces.FrameProcessor import FrameProcessor
@@ -120,11 +120,12 @@ def XDSInit(DriverType=None, params=None):
             xds_inp.close()
 
             # copy the input file...
-            shutil.copyfile(
+            stage_file(
                 os.path.join(self.get_working_directory(), "XDS.INP"),
                 os.path.join(
                     self.get_working_directory(), "%d_INIT.INP" % self.get_xpid()
                 ),
+                link=False,
             )
 
             # write the input data files...
@@ -133,8 +134,14 @@ def XDSInit(DriverType=None, params=None):
                 src = self._input_data_files[file_name]
                 dst = os.path.join(self.get_working_directory(), file_name)
                 if src != dst:
-                    shutil.copyfile(src, dst)
+                    stage_file(
+                        src, dst, link=file_name not in self._output_data_files_list
+                    )
+                self.add_input_file(dst)
 
+            self.add_input_file("XDS.INP")
+            for file_name in ["INIT.LP"] + self._output_data_files_list:
+                self.add_output_file(file_name)
             self.start()
             self.close_wait()
 
@@ -143,11 +150,12 @@ def XDSInit(DriverType=None, params=None):
             # check the job status here
 
             # copy the LP file
-            shutil.copyfile(
+            stage_file(
                 os.path.join(self.get_working_directory(), "INIT.LP"),
                 os.path.join(
                     self.get_working_directory(), "%d_INIT.LP" % self.get_xpid()
                 ),
+                link=False,
             )
 
             # gather the output files
@@ -1,11 +1,11 @@
 import copy
 import logging
 import os
-import shutil
 
 from libtbx import Auto
 
 from xia2.Driver.DriverFactory import DriverFactory
+from xia2.Driver.Staging import stage_file
 from xia2.Handlers.Phil import PhilIndex
 
 # interfaces that this inherits from ...
@@ -273,11 +273,12 @@ def XDSIntegrate(DriverType=None, params=None):
             xds_inp.close()
 
             # copy the input file...
-            shutil.copyfile(
+            stage_file(
                 os.path.join(self.get_working_directory(), "XDS.INP"),
                 os.path.join(
                     self.get_working_directory(), "%d_INTEGRATE.INP" % self.get_xpid()
                 ),
+                link=False,
             )
 
             # write the input data files...
@@ -286,8 +287,17 @@ def XDSIntegrate(DriverType=None, params=None):
                 src = self._input_data_files[file_name]
                 dst = os.path.join(self.get_working_directory(), file_name)
                 if src != dst:
-                    shutil.copyfile(src, dst)
-
+                    stage_file(
+                        src, dst, link=file_name not in self._output_data_files_list
+                    )
+                self.add_input_file(dst)
+
+            self.add_input_file("XDS.INP")
+            for file_name in [
+                "INTEGRATE.LP",
+                "INTEGRATE.HKL",
+            ] + self._output_data_files_list:
+                self.add_output_file(file_name)
             self.start()
             self.close_wait()
 
@@ -299,11 +309,12 @@ def XDSIntegrate(DriverType=None, params=None):
             #   !!! ERROR !!! "STRONGHKL": ASSERT VIOLATION
 
             # copy the LP file
-            shutil.copyfile(
+            stage_file(
                 os.path.join(self.get_working_directory(), "INTEGRATE.LP"),
                 os.path.join(
                     self.get_working_directory(), "%d_INTEGRATE.LP" % self.get_xpid()
                 ),
+                link=False,
             )
 
             # gather the output files
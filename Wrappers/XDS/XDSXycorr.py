@@ -1,7 +1,7 @@
 import os
-import shutil
 
 from xia2.Driver.DriverFactory import DriverFactory
+from xia2.Driver.Staging import stage_file
 
 # interfaces that this inherits from ...
 from xia2.Schema.Interfaces.FrameProcessor import FrameProcessor
@@ -125,11 +125,12 @@ def XDSXycorr(DriverType=None):
             xds_inp.close()
 
             # copy the input file...
-            shutil.copyfile(
+            stage_file(
                 os.path.join(self.get_working_directory(), "XDS.INP"),
                 os.path.join(
                     self.get_working_directory(), "%d_XYCORR.INP" % self.get_xpid()
                 ),
+                link=False,
             )
 
             # write the input data files...
@@ -138,8 +139,14 @@ def XDSXycorr(DriverType=None):
                 src = self._input_data_files[file_name]
                 dst = os.path.join(self.get_working_directory(), file_name)
                 if src != dst:
-                    shutil.copyfile(src, dst)
-
+                    stage_file(
+                        src, dst, link=file_name not in self._output_data_files_list
+                    )
+                self.add_input_file(dst)
+
+            self.add_input_file("XDS.INP")
+            for file_name in ["XYCORR.LP"] + self._output_data_files_list:
+                self.add_output_file(file_name)
             self.start()
             self.close_wait()
 
@@ -149,11 +156,12 @@ def XDSXycorr(DriverType=None):
             xds_check_error(self.get_all_output())
 
             # copy the LP file
-            shutil.copyfile(
+            stage_file(
                 os.path.join(self.get_working_directory(), "XYCORR.LP"),
                 os.path.join(
                     self.get_working_directory(), "%d_XYCORR.LP" % self.get_xpid()
                 ),
+                link=False,
             )
 
             # gather the output files
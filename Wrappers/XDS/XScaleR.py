@@ -1,9 +1,9 @@
 import copy
 import logging
 import os
-import shutil
 
 from xia2.Driver.DriverFactory import DriverFactory
+from xia2.Driver.Staging import stage_file
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Wrappers.XDS.XDS import xds_check_error, get_xds_version
 from xia2.Wrappers.XDS.XScaleHelpers import get_correlation_coefficients_and_group
@@ -224,22 +224,31 @@ def XScaleR(
             self._write_xscale_inp()
 
             # copy the input file...
-            shutil.copyfile(
+            stage_file(
                 os.path.join(self.get_working_directory(), "XSCALE.INP"),
                 os.path.join(
                     self.get_working_directory(), "%d_XSCALE.INP" % self.get_xpid()
                 ),
+                link=False,
             )
 
+            self.add_input_file("XSCALE.INP")
+            for hkl in self._input_reflection_files:
+                self.add_input_file(hkl)
+            self.add_output_file("XSCALE.LP")
+            for hkl in self._output_reflection_files.values():
+                self.add_output_file(hkl)
+
             self.start()
             self.close_wait()
 
             # copy the LP file
-            shutil.copyfile(
+            stage_file(
                 os.path.join(self.get_working_directory(), "XSCALE.LP"),
                 os.path.join(
                     self.get_working_directory(), "%d_XSCALE.LP" % self.get_xpid()
                 ),
+                link=False,
             )
 
             # now look at XSCALE.LP
@@ -11,6 +11,9 @@ def FrenchWilson(DriverType=None):
         def __init__(self):
             super().__init__()
 
+            # the output is read through once the program has finished
+            self.set_output_buffer(None)
+
             self._executable = "cctbx_FrenchWilson"
             self._outbuffer = []
 
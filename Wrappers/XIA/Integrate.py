@@ -1,4 +1,5 @@
 import logging
+import os
 
 from xia2.Driver.DriverFactory import DriverFactory
 
@@ -19,6 +20,21 @@ def Integrate(DriverType=None):
             self._njob = None
             self._mp_mode = None
             self._phil_file = None
+            self._continue_from_previous_job = False
+            self._error = None
+            self.add_output_parser(self._parse_output)
+
+        def _parse_output(self, line):
+            if "Status: error" in line and self._error is None:
+                self._error = line.split("error")[-1].strip()
+
+        def set_stop_after(self, stop_after):
+            """Run only as far as "index" or "integrate"."""
+            assert stop_after in ("index", "integrate")
+            self.set_executable("xia2.%s" % stop_after)
+
+        def set_continue_from_previous_job(self, continue_from_previous_job=True):
+            self._continue_from_previous_job = continue_from_previous_job
 
         def add_command_line_args(self, args):
             self._argv.extend(args)
@@ -36,7 +52,7 @@ def Integrate(DriverType=None):
             self._phil_file = phil_file
 
         def run(self):
-            logger.debug("Running xia2.integrate")
+            logger.debug("Running %s", os.path.basename(self.get_executable()))
 
             self.clear_command_line()
 
@@ -55,13 +71,18 @@ def Integrate(DriverType=None):
             if self._mp_mode is not None:
                 self.add_command_line("multiprocessing.mode=%s" % self._mp_mode)
 
+            if self._continue_from_previous_job:
+                self.add_command_line(
+                    "xia2.settings.developmental.continue_from_previous_job=True"
+                )
+
             self.add_command_line("failover=False")
 
+            self._error = None
             self.start()
             self.close_wait()
             self.check_for_errors()
-            for line in self.get_all_output():
-                if "Status: error" in line:
-                    raise RuntimeError(line.split("error")[-1].strip())
+            if self._error is not None:
+                raise RuntimeError(self._error)
 
     return IntegrateWrapper()
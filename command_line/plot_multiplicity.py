@@ -1,8 +1,10 @@
 # LIBTBX_PRE_DISPATCHER_INCLUDE_SH export PHENIX_GUI_ENVIRONMENT=1
 
 
+import base64
 import json
 import sys
+from math import sqrt
 
 import iotbx.phil
 from cctbx.miller.display import render_2d, scene
@@ -12,7 +14,89 @@ from iotbx.reflection_file_reader import any_reflection_file
 from scitbx.array_family import flex
 
 
-class MultiplicityViewPng(render_2d):
+def plotly_array(values, dtype):
+    """Encode values as a plotly.js typed array (base64 of the raw little
+    endian data, understood by plotly.js >= 2.28), far more compact than a
+    list of numbers for the many points in a multiplicity plot."""
+    data = values.as_numpy_array().astype("<" + dtype)
+    return {"dtype": dtype, "bdata": base64.b64encode(data.tobytes()).decode()}
+
+
+class MultiplicityView(render_2d):
+    """Renders a slice through a scene as render_2d.render() does, but
+    computing the positions, sizes and colours of all of the circles at
+    once instead of with a draw_open_circle() or draw_filled_circle() call
+    for every reflection."""
+
+    def render_points(self, canvas):
+        assert self.settings.slice_mode
+        if self.settings.slice_axis == "h":
+            i_x, i_y = 1, 2
+            axes = ("k", "l")
+        elif self.settings.slice_axis == "k":
+            i_x, i_y = 0, 2
+            axes = ("h", "l")
+        else:
+            i_x, i_y = 0, 1
+            axes = ("h", "k")
+        center_x, center_y, r = self.get_center_and_radius()
+        x_max = self.scene.axes[i_x][i_x] * 100.0
+        y_max = self.scene.axes[i_y][i_y] * 100.0
+        if self.settings.show_axes:
+            x_end = self.scene.axes[i_x][i_x], self.scene.axes[i_x][i_y]
+            y_end = self.scene.axes[i_y][i_x], self.scene.axes[i_y][i_y]
+            x_len = sqrt(x_end[0] ** 2 + x_end[1] ** 2)
+            y_len = sqrt(y_end[0] ** 2 + y_end[1] ** 2)
+            x_scale = (r + 10) / x_len
+            y_scale = (r + 10) / y_len
+            x_end = (x_end[0] * x_scale, x_end[1] * x_scale)
+            y_end = (y_end[0] * y_scale, y_end[1] * y_scale)
+            self.draw_line(
+                canvas, center_x, center_y, center_x + x_end[0], center_y - x_end[1]
+            )
+            self.draw_line(
+                canvas, center_x, center_y, center_x + y_end[0], center_y - y_end[1]
+            )
+            self.draw_text(
+                canvas, axes[0], center_x + x_end[0] - 6, center_y - x_end[1] - 20
+            )
+            self.draw_text(
+                canvas, axes[1], center_x + y_end[0] + 6, center_y - y_end[1]
+            )
+
+        max_radius = self.scene.max_radius * r / max(x_max, y_max)
+        max_radius *= self.settings.scale
+        r_scale = (1 / self.scene.d_min) * self.get_scale_factor()
+        hkl = self.scene.points.parts()
+        x = float(center_x) + float(r) * hkl[i_x] / r_scale
+        y = float(center_y) - float(r) * hkl[i_y] / r_scale
+        if self.settings.uniform_size:
+            radii = flex.double(x.size(), max_radius)
+        else:
+            radii = self.scene.radii * float(r) / max(x_max, y_max)
+            radii.set_selected(radii < 0.5, 0.5)
+        radii *= self.settings.scale
+
+        # missing reflections are drawn as open circles in the foreground
+        # colour, systematic absences as open circles in their own
+        missing = self.scene.missing_flags
+        is_open = missing | self.scene.sys_absent_flags
+        colors = self.scene.colors.deep_copy()
+        colors.set_selected(missing, self._foreground)
+        is_filled = ~is_open
+        self._open_circle_points = flex.vec2_double(
+            x.select(is_open), y.select(is_open)
+        )
+        self._open_circle_radii = 2 * radii.select(is_open)
+        self._open_circle_colors = colors.select(is_open)
+        self._filled_circle_points = flex.vec2_double(
+            x.select(is_filled), y.select(is_filled)
+        )
+        self._filled_circle_radii = 2 * radii.select(is_filled)
+        self._filled_circle_colors = colors.select(is_filled)
+
+
+class MultiplicityViewPng(MultiplicityView):
     def __init__(self, scene, settings=None):
         import matplotlib
 
@@ -21,13 +105,6 @@ class MultiplicityViewPng(render_2d):
 
         render_2d.__init__(self, scene, settings)
 
-        self._open_circle_points = flex.vec2_double()
-        self._open_circle_radii = []
-        self._open_circle_colors = []
-        self._filled_circle_points = flex.vec2_double()
-        self._filled_circle_radii = []
-        self._filled_circle_colors = []
-
         self.fig, self.ax = pyplot.subplots(figsize=self.settings.size_inches)
         self.render(self.ax)
         pyplot.close()
@@ -41,31 +118,19 @@ class MultiplicityViewPng(render_2d):
     def draw_text(self, ax, text, x, y):
         ax.text(x, y, text, color=self._foreground, size=self.settings.font_size)
 
-    def draw_open_circle(self, ax, x, y, radius, color=None):
-        self._open_circle_points.append((x, y))
-        self._open_circle_radii.append(2 * radius)
-        if color is None:
-            color = self._foreground
-        self._open_circle_colors.append(color)
-
-    def draw_filled_circle(self, ax, x, y, radius, color):
-        self._filled_circle_points.append((x, y))
-        self._filled_circle_radii.append(2 * radius)
-        self._filled_circle_colors.append(color)
-
     def render(self, ax):
         from matplotlib import pyplot
         from matplotlib import colors
 
-        render_2d.render(self, ax)
+        self.render_points(ax)
         if self._open_circle_points.size():
             x, y = self._open_circle_points.parts()
             ax.scatter(
                 x.as_numpy_array(),
                 y.as_numpy_array(),
-                s=self._open_circle_radii,
+                s=self._open_circle_radii.as_numpy_array(),
                 marker="o",
-                edgecolors=self._open_circle_colors,
+                edgecolors=self._open_circle_colors.as_numpy_array(),
                 facecolors=None,
             )
         if self._filled_circle_points.size():
@@ -92,7 +157,7 @@ class MultiplicityViewPng(render_2d):
             im = ax.scatter(
                 x.as_numpy_array(),
                 y.as_numpy_array(),
-                s=self._filled_circle_radii,
+                s=self._filled_circle_radii.as_numpy_array(),
                 marker="o",
                 c=data.select(self.scene.slice_selection).as_numpy_array(),
                 edgecolors="none",
@@ -119,16 +184,10 @@ class MultiplicityViewPng(render_2d):
         )
 
 
-class MultiplicityViewJson(render_2d):
+class MultiplicityViewJson(MultiplicityView):
     def __init__(self, scene, settings=None):
         render_2d.__init__(self, scene, settings)
 
-        self._open_circle_points = flex.vec2_double()
-        self._open_circle_radii = []
-        self._open_circle_colors = []
-        self._filled_circle_points = flex.vec2_double()
-        self._filled_circle_radii = []
-        self._filled_circle_colors = []
         self._text = {"x": [], "y": [], "text": []}
         self._lines = []
         json_d = self.render(None)
@@ -137,8 +196,9 @@ class MultiplicityViewJson(render_2d):
             indent = None
         else:
             indent = 2
+        # json.dumps() can use the C encoder, json.dump() never does
         with open(self.settings.json.filename, "w") as fh:
-            json.dump(json_d, fh, indent=indent)
+            fh.write(json.dumps(json_d, indent=indent))
 
     def GetSize(self):
         return 1600, 1600  # size in pixels
@@ -151,28 +211,21 @@ class MultiplicityViewJson(render_2d):
         self._text["y"].append(y)
         self._text["text"].append(text)
 
-    def draw_open_circle(self, ax, x, y, radius, color=None):
-        self._open_circle_points.append((x, y))
-        self._open_circle_radii.append(2 * radius)
-        if color is None:
-            color = self._foreground
-        self._open_circle_colors.append(color)
-
-    def draw_filled_circle(self, ax, x, y, radius, color):
-        self._filled_circle_points.append((x, y))
-        self._filled_circle_radii.append(2 * radius)
-        self._filled_circle_colors.append(color)
+    def as_array(self, values, dtype):
+        if self.settings.json.binary_arrays:
+            return plotly_array(values, dtype)
+        return list(values)
 
     def render(self, ax):
-        render_2d.render(self, ax)
+        self.render_points(ax)
         data = []
         if self._open_circle_points.size():
             x, y = self._open_circle_points.parts()
             z = self._open_circle_colors
             data.append(
                 {
-                    "x": list(x.round(1)),
-                    "y": list(y.round(1)),
+                    "x": self.as_array(x.round(1), "f4"),
+                    "y": self.as_array(y.round(1), "f4"),
                     #'z': list(z),
                     "type": "scatter",
                     "mode": "markers",
@@ -213,7 +266,7 @@ class MultiplicityViewJson(render_2d):
                 "mono": None,
             }
 
-            color = list(z)
+            color = self.as_array(z, "u1" if flex.max(z) < 256 else "u4")
             colorscale = cmap_d.get(
                 self.settings.color_scheme, self.settings.color_scheme
             )
@@ -224,8 +277,8 @@ class MultiplicityViewJson(render_2d):
 
             data.append(
                 {
-                    "x": list(x.round(1)),
-                    "y": list(y.round(1)),
+                    "x": self.as_array(x.round(1), "f4"),
+                    "y": self.as_array(y.round(1), "f4"),
                     #'z': list(z),
                     "type": "scatter",
                     "mode": "markers",
@@ -313,6 +366,10 @@ json {
     .type = path
   compact = True
     .type = bool
+  binary_arrays = False
+    .type = bool
+    .help = "Write the coordinates and multiplicities of the points as"
+            "base64-encoded typed arrays, which need plotly.js >= 2.28"
 }
 size_inches = 20,20
   .type = floats(size=2, value_min=0)
@@ -364,15 +421,15 @@ def plot_multiplicity(miller_array, settings):
     settings.expand_anomalous = True
     settings.slice_mode = True
 
+    # the same slice is drawn in both, so only work it out once
+    if settings.plot.filename is not None or settings.json.filename is not None:
+        slice_scene = scene(miller_array, settings, merge=True)
+
     if settings.plot.filename is not None:
-        MultiplicityViewPng(
-            scene(miller_array, settings, merge=True), settings=settings
-        )
+        MultiplicityViewPng(slice_scene, settings=settings)
 
     if settings.json.filename is not None:
-        MultiplicityViewJson(
-            scene(miller_array, settings, merge=True), settings=settings
-        )
+        MultiplicityViewJson(slice_scene, settings=settings)
 
 
 if __name__ == "__main__":
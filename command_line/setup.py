@@ -3,8 +3,6 @@ import os
 import sys
 import traceback
 
-from dials.util import Sorry
-from dials.util.version import dials_version
 import xia2.Driver.timing
 import xia2.Handlers.Streams
 import xia2.XIA2Version
@@ -21,6 +19,8 @@ logger = logging.getLogger("xia2.command_line.setup")
 
 def xia2_setup():
     """Actually process something..."""
+    from dials.util.version import dials_version
+
     Citations.cite("xia2")
 
     # print versions of related software
@@ -56,6 +56,8 @@ def run():
         sys.exit()
 
     if "-version" in sys.argv or "--version" in sys.argv:
+        from dials.util.version import dials_version
+
         print(xia2.XIA2Version.Version)
         print(dials_version())
         ccp4_version = get_ccp4_version()
@@ -63,6 +65,8 @@ def run():
             print("CCP4 %s" % ccp4_version)
         sys.exit()
 
+    from dials.util import Sorry
+
     xia2.Handlers.Streams.setup_logging(logfile="xia2.txt", debugfile="xia2-debug.txt")
 
     try:
@@ -68,6 +68,7 @@ def run():
                 sweeps[0]._get_integrater().get_integrated_experiments()
             )
             align_crystal.set_working_directory(wd)
+            align_crystal.set_output_buffer(None)
             auto_logfiler(align_crystal)
             align_crystal.set_json_filename(
                 "%i_align_crystal.json" % align_crystal.get_xpid()
@@ -10,13 +10,9 @@ import sys
 import time
 import traceback
 
-from dials.util import Sorry
-from dials.util.version import dials_version
-from libtbx import group_args
 import xia2.Driver.timing
 import xia2.Handlers.Streams
 import xia2.XIA2Version
-from xia2.Applications.xia2_helpers import process_one_sweep
 from xia2.Applications.xia2_main import (
     check_environment,
     get_command_line,
@@ -25,8 +21,10 @@ from xia2.Applications.xia2_main import (
 )
 from xia2.Handlers.Citations import Citations
 from xia2.Handlers.Files import cleanup
-from xia2.Schema.XProject import XProject
-from xia2.Schema.XSweep import XSweep
+
+# dials, dxtbx and the xia2 Schema are imported where they are first needed,
+# so that xia2 -help and -version (and programs importing from here) start
+# quickly
 
 logger = logging.getLogger("xia2.command_line.xia2_main")
 
@@ -42,6 +40,13 @@ def get_ccp4_version():
 
 def xia2_main(stop_after=None):
     """Actually process something..."""
+    from dials.util.version import dials_version
+    from libtbx import group_args
+
+    from xia2.Applications.xia2_helpers import process_sweeps_with_core_budget
+    from xia2.Schema.XProject import XProject
+    from xia2.Schema.XSweep import XSweep
+
     Citations.cite("xia2")
 
     # print versions of related software
@@ -145,6 +150,7 @@ def xia2_main(stop_after=None):
             driver_type = mp_params.type
             command_line_args = CommandLine.get_argv()[1:]
             jobs = []
+            weights = []
             for crystal_id in crystals:
                 for wavelength_id in crystals[crystal_id].get_wavelength_names():
                     wavelength = crystals[crystal_id].get_xwavelength(wavelength_id)
@@ -153,6 +159,10 @@ def xia2_main(stop_after=None):
                         sweep._get_indexer()
                         sweep._get_refiner()
                         sweep._get_integrater()
+                        start, end = (
+                            sweep.get_frames_to_process() or sweep.get_image_range()
+                        )
+                        weights.append(end - start + 1)
                         jobs.append(
                             (
                                 group_args(
@@ -177,20 +187,16 @@ def xia2_main(stop_after=None):
                 if (i_job % njob) == 0:
                     arg[0].driver_type = default_driver_type
 
-            nproc = mp_params.nproc
-            qsub_command = mp_params.qsub_command or "qsub"
-            qsub_command = "%s -V -cwd -pe smp %d" % (qsub_command, nproc)
+            # njob and nproc are upper bounds: the total number of cores is
+            # shared out between the sweeps according to their size
+            ncores = njob * mp_params.nproc
+            if driver_type not in ("qsub", "slurm", "pbs"):
+                from xia2.Handlers.Environment import get_number_cpus
 
-            from libtbx import easy_mp
+                ncores = min(ncores, get_number_cpus())
 
-            results = easy_mp.parallel_map(
-                process_one_sweep,
-                jobs,
-                processes=njob,
-                method="multiprocessing",
-                qsub_command=qsub_command,
-                preserve_order=True,
-                preserve_exception_message=True,
+            results = process_sweeps_with_core_budget(
+                jobs, weights, njob=njob, ncores=ncores, max_per_job=mp_params.nproc
             )
 
             # Hack to update sweep with the serialized indexers/refiners/integraters
@@ -307,6 +313,8 @@ def run():
         sys.exit()
 
     if "-version" in sys.argv or "--version" in sys.argv:
+        from dials.util.version import dials_version
+
         print(xia2.XIA2Version.Version)
         print(dials_version())
         ccp4_version = get_ccp4_version()
@@ -314,6 +322,8 @@ def run():
             print("CCP4 %s" % ccp4_version)
         sys.exit()
 
+    from dials.util import Sorry
+
     xia2.Handlers.Streams.setup_logging(logfile="xia2.txt", debugfile="xia2-debug.txt")
 
     try:
@@ -7,6 +7,8 @@ import os
 
 from multiprocessing import Lock, Value
 
+from xia2.Handlers.RunContext import get_run_context
+
 logger = logging.getLogger("xia2.lib.bits")
 
 
@@ -64,8 +66,11 @@ _run_number = Counter(0)
 
 
 def _get_number():
-    global _run_number
-    return _run_number.increment()
+    """The next log file number for the current run context."""
+    run_number = get_run_context().run_number
+    if run_number is None:
+        run_number = _run_number
+    return run_number.increment()
 
 
 ###### END MESSY CODE ######
@@ -0,0 +1,20 @@
+import hashlib
+import os
+
+# digests of files already seen by this process, keyed on the path, size
+# and modification time of the file
+_digest_cache = {}
+
+
+def file_digest(filename):
+    """Return the SHA-256 digest of the contents of filename."""
+
+    st = os.stat(filename)
+    key = (os.path.abspath(filename), st.st_size, st.st_mtime_ns)
+    if key not in _digest_cache:
+        digest = hashlib.sha256()
+        with open(filename, "rb") as fh:
+            for block in iter(lambda: fh.read(2 ** 20), b""):
+                digest.update(block)
+        _digest_cache[key] = digest.hexdigest()
+    return _digest_cache[key]